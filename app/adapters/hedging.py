@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+from app.config import settings
+from app import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies per agent."""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: dict[str, deque] = {}
+
+    def record(self, agent: str, seconds: float) -> None:
+        samples = self._samples.get(agent)
+        if samples is None:
+            samples = self._samples[agent] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(self, agent: str, pct: float, min_samples: int) -> float | None:
+        """Nearest-rank percentile, or None until the agent has min_samples observations."""
+        samples = self._samples.get(agent)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        rank = max(1, min(len(ordered), -(-len(ordered) * pct // 100)))
+        return ordered[int(rank) - 1]
+
+class HedgeBudget:
+    """Token bucket: every primary call earns `ratio` tokens, every hedge spends one.
+
+    Hedges therefore stay under `ratio` of primary traffic, plus at most `burst` after a quiet spell.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def earn(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class Hedger:
+    """Send a duplicate of a slow LLM call and keep whichever copy answers first.
+
+    The hedge goes out once the primary has run longer than the agent's recent
+    llm_hedge_percentile latency. Until an agent has llm_hedge_min_samples latencies it is
+    never hedged.
+    """
+
+    def __init__(self):
+        self.latencies = LatencyTracker(settings.llm_hedge_window)
+        self.budget = HedgeBudget(settings.llm_hedge_budget_ratio, settings.llm_hedge_budget_burst)
+        self._stats = {"calls": 0, "hedges_issued": 0, "hedges_won": 0, "budget_exhausted": 0}
+
+    def hedge_delay(self, agent: str) -> float | None:
+        delay = self.latencies.percentile(agent, settings.llm_hedge_percentile, settings.llm_hedge_min_samples)
+        if delay is None:
+            return None
+        return max(delay, settings.llm_hedge_min_delay_ms / 1000)
+
+    async def run(self, agent: str | None, call: Callable[[], Awaitable[Any]]) -> Any:
+        agent = agent or "unknown"
+        self._stats["calls"] += 1
+        self.budget.earn()
+        start = time.perf_counter()
+        primary = asyncio.create_task(call())
+        tasks = {primary}
+        try:
+            delay = self.hedge_delay(agent)
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                if self.budget.try_spend():
+                    tasks.add(asyncio.create_task(call()))
+                    self._stats["hedges_issued"] += 1
+                    metrics.LLM_HEDGES.inc(agent=agent, outcome="issued")
+                    tracing.current_span().set(hedged_after_ms=round(delay * 1000, 1))
+                    logger.info("Hedging %s call after %.0f ms", agent, delay * 1000)
+                else:
+                    self._stats["budget_exhausted"] += 1
+            return await self._first_success(agent, primary, tasks, start)
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            # Wait for the cancelled copy so its in-flight slot and connection are released before returning
+            await asyncio.gather(*losers, return_exceptions=True)
+
+    async def _first_success(self, agent: str, primary: asyncio.Task, tasks: set, start: float) -> Any:
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Prefer the primary when both finish in the same tick
+            for task in sorted(done, key=lambda task: task is not primary):
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                # A primary beaten by its hedge is only known to be at least this slow
+                self.latencies.record(agent, time.perf_counter() - start)
+                if task is not primary:
+                    self._stats["hedges_won"] += 1
+                    metrics.LLM_HEDGES.inc(agent=agent, outcome="won")
+                    tracing.current_span().set(hedge_won=True)
+                return task.result()
+        raise error
+
+    def stats(self) -> dict:
+        issued = self._stats["hedges_issued"]
+        return {
+            **self._stats,
+            "hedge_rate": round(issued / self._stats["calls"], 4) if self._stats["calls"] else 0.0,
+            "win_rate": round(self._stats["hedges_won"] / issued, 4) if issued else 0.0,
+            "budget_tokens": round(self.budget.tokens, 3),
+        }
+
+_hedger: Hedger | None = None
+
+def get_hedger() -> Hedger:
+    global _hedger
+    if _hedger is None:
+        _hedger = Hedger()
+    return _hedger
+
+def reset() -> None:
+    """Drop learned latencies and the budget, e.g. after the hedging settings change."""
+    global _hedger
+    _hedger = None
+
+def get_stats() -> dict:
+    return {"enabled": settings.llm_hedging_enabled, **get_hedger().stats()}
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+def make_key(model: str, temperature: float, top_p: float, prompt: str) -> str:
+    """Content address of a completion request."""
+    raw = json.dumps([model, float(temperature), float(top_p), prompt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """In-memory LRU with TTL in front of an optional SQLite store shared by all workers."""
+
+    def __init__(self, max_entries: int, ttl_s: float, db_path: str = "", disabled_agents: list[str] | None = None):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.db_path = db_path
+        self.disabled_agents = set(disabled_agents or [])
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "warm_loaded": 0,
+        }
+        self._agent_stats: dict[str, dict[str, int]] = {}
+
+        if db_path:
+            self._open_db()
+            self._warm_start()
+
+    def _open_db(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        # WAL lets several uvicorn workers read while one writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires_at ON llm_cache (expires_at)")
+
+    def _warm_start(self) -> None:
+        """Load the most recent live entries so a restart doesn't start cold."""
+        now = time.time()
+        with self._db_lock:
+            self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            rows = self._db.execute(
+                "SELECT key, value, expires_at FROM llm_cache ORDER BY created_at DESC LIMIT ?",
+                (self.max_entries,),
+            ).fetchall()
+        # Oldest first so the newest rows end up most-recently-used
+        for key, value, expires_at in reversed(rows):
+            self._memory[key] = (value, expires_at)
+        self._stats["warm_loaded"] = len(rows)
+        logger.info("LLM cache warm start: %s entries from %s", len(rows), self.db_path)
+
+    def is_enabled(self, agent: str | None) -> bool:
+        return agent not in self.disabled_agents
+
+    def set_agent_enabled(self, agent: str, enabled: bool) -> None:
+        if enabled:
+            self.disabled_agents.discard(agent)
+        else:
+            self.disabled_agents.add(agent)
+
+    def _record(self, agent: str | None, outcome: str) -> None:
+        agent_stats = self._agent_stats.setdefault(agent or "unknown", {"hits": 0, "misses": 0})
+        agent_stats[outcome] += 1
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_get(self, key: str) -> tuple[str, float] | None:
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+
+    def _disk_set(self, key: str, value: str, created_at: float, expires_at: float) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, value, created_at, expires_at),
+            )
+
+    async def get(self, key: str, agent: str | None = None) -> str | None:
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                self._record(agent, "hits")
+                return value
+            del self._memory[key]
+            self._stats["expirations"] += 1
+
+        if self._db is not None:
+            row = await asyncio.to_thread(self._disk_get, key)
+            if row is not None:
+                value, expires_at = row
+                self._remember(key, value, expires_at)
+                self._stats["disk_hits"] += 1
+                self._record(agent, "hits")
+                return value
+
+        self._stats["misses"] += 1
+        self._record(agent, "misses")
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        created_at = time.time()
+        expires_at = created_at + self.ttl_s
+        self._remember(key, value, expires_at)
+        self._stats["writes"] += 1
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, value, created_at, expires_at)
+
+    def stats(self) -> dict:
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "db_path": self.db_path or None,
+            "disabled_agents": sorted(self.disabled_agents),
+            "by_agent": self._agent_stats,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+_cache: LLMCache | None = None
+
+def init_cache() -> LLMCache | None:
+    """Create the process-wide cache from settings; returns None when caching is off."""
+    global _cache
+    if _cache is None and settings.llm_cache_enabled:
+        _cache = LLMCache(
+            max_entries=settings.llm_cache_max_entries,
+            ttl_s=settings.llm_cache_ttl_s,
+            db_path=settings.llm_cache_db_path,
+            disabled_agents=settings.llm_cache_disabled_agents,
+        )
+    return _cache
+
+def close_cache() -> None:
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+
+def get_stats() -> dict:
+    cache = init_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
@@ -1,29 +1,319 @@
+import time
+from contextlib import aclosing
+from types import SimpleNamespace
+from typing import AsyncIterator, Callable
 import openai
+import httpx
 import logging
 from app.config import settings
+from app.adapters import hedging, llm_cache, resilience, scheduler
+from app import logs, metrics, tracing
 
 logger = logging.getLogger(__name__)
 
-async def chat(prompt: str, model: str, temperature: float, top_p: float, timeout_s: int) -> str:
-    logger.info(f"OpenAI Chat Request - Model: {model}, Temperature: {temperature}, Top_p: {top_p}")
-    logger.debug(f"OpenAI Chat Prompt: {prompt[:200]}...")  # Log first 200 chars
-    
-    try:
-        client = openai.AsyncClient(api_key=settings.openai_api_key)
-        response = await client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            top_p=top_p,
-            timeout=timeout_s,
+# One pooled client per process, opened in the FastAPI lifespan and shared by every agent
+_client: openai.AsyncOpenAI | None = None
+# Admits requests by priority class within openai_max_in_flight and the per-model rate limits
+_scheduler: scheduler.Scheduler | None = None
+
+_stats = {
+    "requests": 0,
+    "connections_opened": 0,
+    "tls_handshakes": 0,
+    "in_flight": 0,
+    "clients_created": 0,
+}
+
+async def _trace(event_name: str, info: dict) -> None:
+    """httpcore trace hook: a TCP connect only happens when no pooled connection was reusable."""
+    if event_name == "connection.connect_tcp.complete":
+        _stats["connections_opened"] += 1
+    elif event_name == "connection.start_tls.complete":
+        _stats["tls_handshakes"] += 1
+
+async def _on_request(request: httpx.Request) -> None:
+    _stats["requests"] += 1
+    # Runs once per HTTP attempt, SDK retries included, inside the caller's llm span
+    tracing.current_span().add("attempts")
+    request.extensions["trace"] = _trace
+
+def init_client() -> openai.AsyncOpenAI:
+    """Create the shared client and request scheduler if they don't exist yet."""
+    global _client, _scheduler
+    if _client is None:
+        http_client = openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings.openai_max_connections,
+                max_keepalive_connections=settings.openai_max_keepalive_connections,
+                keepalive_expiry=settings.openai_keepalive_expiry_s,
+            ),
+            event_hooks={"request": [_on_request]},
+        )
+        _client = openai.AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url or None,
+            http_client=http_client,
+            # Retries happen in resilience.call, where the circuit breaker sees every failure
+            max_retries=0,
         )
-        
+        _scheduler = scheduler.Scheduler(settings.openai_max_in_flight)
+        _stats["clients_created"] += 1
+        logger.info(
+            f"OpenAI client initialised - max_connections: {settings.openai_max_connections}, "
+            f"max_in_flight: {settings.openai_max_in_flight}"
+        )
+    return _client
+
+async def close_client() -> None:
+    """Close the shared client and release its pooled connections."""
+    global _client, _scheduler
+    if _client is not None:
+        await _client.close()
+        logger.info("OpenAI client closed")
+    _client = None
+    _scheduler = None
+
+def get_stats() -> dict:
+    """Connection pool counters; connections_reused is every request that skipped a TCP connect."""
+    return {
+        **_stats,
+        "connections_reused": max(_stats["requests"] - _stats["connections_opened"], 0),
+        "max_in_flight": settings.openai_max_in_flight,
+    }
+
+def get_scheduler_stats() -> dict:
+    """Per priority class: requests queued now, admitted, shed, and how long admitted ones waited."""
+    init_client()
+    return _scheduler.stats()
+
+# Known failure outputs the agents are prompted to emit; caching one would replay the failure for a day
+FAILURE_PREFIXES = ("INVALID INPUT", "INCOMPLETE")
+
+def _should_cache(content: str | None, cache_if: Callable[[str], bool] | None) -> bool:
+    if not content or content.lstrip().startswith(FAILURE_PREFIXES):
+        return False
+    return cache_if is None or cache_if(content)
+
+def _record_usage(agent: str | None, model: str, usage) -> None:
+    if usage is None:
+        return
+    agent = agent or "unknown"
+    metrics.LLM_TOKENS.inc(usage.prompt_tokens or 0, agent=agent, model=model, kind="prompt")
+    metrics.LLM_TOKENS.inc(usage.completion_tokens or 0, agent=agent, model=model, kind="completion")
+
+def _estimate_usage(prompt: str, content: str) -> SimpleNamespace:
+    """~4 chars per token, for a stream closed before its usage chunk (stop_when, or an abandoned stream)."""
+    prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens)
+
+async def chat_until(prompt: str, model: str, temperature: float, top_p: float, timeout_s: int,
+                     agent: str | None = None, cache_if: Callable[[str], bool] | None = None,
+                     stop_when: Callable[[str], bool] | None = None) -> str:
+    """chat() that returns as soon as stop_when accepts a delta, without waiting for trailing text.
+
+    Hedged like chat(): a duplicate stream is opened when the whole read runs past the agent's
+    recent latency, and the slower one is closed. Falls back to a plain chat() when
+    settings.llm_stream_json_enabled is off.
+    """
+    if not settings.llm_stream_json_enabled or stop_when is None:
+        return await chat(prompt=prompt, model=model, temperature=temperature, top_p=top_p, timeout_s=timeout_s,
+                          agent=agent, cache_if=cache_if)
+
+    async def read() -> str:
+        parts = []
+        async with aclosing(chat_stream(prompt=prompt, model=model, temperature=temperature, top_p=top_p,
+                                        timeout_s=timeout_s, agent=agent, cache_if=cache_if,
+                                        stop_when=stop_when)) as deltas:
+            async for delta in deltas:
+                parts.append(delta)
+        return "".join(parts)
+
+    if settings.llm_hedging_enabled:
+        return await hedging.get_hedger().run(agent, read)
+    return await read()
+
+def _error_outcome(error: Exception) -> str:
+    if isinstance(error, scheduler.SchedulerRejectedError):
+        return "shed"
+    return "circuit_open" if isinstance(error, resilience.CircuitOpenError) else "error"
+
+async def _cache_lookup(prompt: str, model: str, temperature: float, top_p: float, agent: str | None):
+    """Return (cache, key, cached_content); key is None when caching is off for this agent."""
+    cache = llm_cache.init_cache()
+    if cache is None or not cache.is_enabled(agent):
+        return cache, None, None
+    cache_key = llm_cache.make_key(model, temperature, top_p, prompt)
+    cached = await cache.get(cache_key, agent)
+    if cached is not None:
+        logger.info("OpenAI Chat cache hit - Agent: %s, Key: %s", agent, cache_key[:12])
+    return cache, cache_key, cached
+
+async def chat(prompt: str, model: str, temperature: float, top_p: float, timeout_s: int, agent: str | None = None,
+               cache_if: Callable[[str], bool] | None = None) -> str:
+    """Single completion. Only responses that pass cache_if (and aren't a known failure) are cached."""
+    logger.info("OpenAI Chat Request - Agent: %s, Model: %s, Temperature: %s, Top_p: %s", agent, model, temperature, top_p)
+    logger.debug("OpenAI Chat Prompt: %s", logs.payload(prompt, 200))
+
+    with tracing.span("llm", agent=agent, model=model, bytes_in=len(prompt.encode("utf-8"))) as span:
+        return await _chat(prompt, model, temperature, top_p, timeout_s, agent, cache_if, span)
+
+async def _chat(prompt: str, model: str, temperature: float, top_p: float, timeout_s: int, agent: str | None,
+                cache_if: Callable[[str], bool] | None, span) -> str:
+    cache, cache_key, cached = await _cache_lookup(prompt, model, temperature, top_p, agent)
+    if cached is not None:
+        metrics.LLM_REQUESTS.inc(agent=agent or "unknown", outcome="cache_hit")
+        span.set(cache_hit=True, bytes_out=len(cached.encode("utf-8")))
+        return cached
+
+    client = init_client()
+    admission = _scheduler
+    tokens = scheduler.estimate_tokens(prompt)
+
+    async def create(seconds_left: float):
+        # Every attempt (retry or hedge) is a request of its own against the rate limits
+        grant = await admission.acquire(model, tokens)
+        span.set(queue_wait_ms=round(grant.waited_s * 1000, 3), priority=grant.priority)
+        _stats["in_flight"] += 1
+        metrics.LLM_IN_FLIGHT.inc()
+        used_tokens = None
+        try:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                top_p=top_p,
+                timeout=seconds_left,
+            )
+            used_tokens = getattr(getattr(response, "usage", None), "total_tokens", None)
+            return response
+        finally:
+            _stats["in_flight"] -= 1
+            metrics.LLM_IN_FLIGHT.dec()
+            admission.release(grant, used_tokens)
+
+    async def attempt(seconds_left: float):
+        if settings.llm_hedging_enabled:
+            return await hedging.get_hedger().run(agent, lambda: create(seconds_left))
+        return await create(seconds_left)
+
+    try:
+        # timeout_s bounds the whole call, retries and backoff included
+        response = await resilience.call(model, agent, attempt, timeout_s)
+
+        metrics.LLM_REQUESTS.inc(agent=agent or "unknown", outcome="ok")
+        _record_usage(agent, model, getattr(response, "usage", None))
         content = response.choices[0].message.content
-        logger.info(f"OpenAI Chat Response received - Length: {len(content) if content else 0} chars")
-        logger.debug(f"OpenAI Chat Response: {content[:500]}...")  # Log first 500 chars
-        
+        span.set(bytes_out=len(content.encode("utf-8")) if content else 0)
+        logger.info("OpenAI Chat Response received - Length: %s chars", len(content) if content else 0)
+        logger.debug("OpenAI Chat Response: %s", logs.payload(content))
+
+        if cache_key is not None and _should_cache(content, cache_if):
+            await cache.set(cache_key, content)
+
         return content
-        
+
     except Exception as e:
-        logger.error(f"OpenAI Chat Error: {str(e)}")
-        raise 
\ No newline at end of file
+        metrics.LLM_REQUESTS.inc(agent=agent or "unknown", outcome=_error_outcome(e))
+        logger.error("OpenAI Chat Error: %s", e)
+        raise
+
+async def chat_stream(prompt: str, model: str, temperature: float, top_p: float, timeout_s: int,
+                      agent: str | None = None, cache_if: Callable[[str], bool] | None = None,
+                      stop_when: Callable[[str], bool] | None = None) -> AsyncIterator[str]:
+    """Like chat(), but yields content deltas as the model produces them.
+
+    A cache hit is yielded as a single chunk; a completed stream is written back to the cache.
+    stop_when is called with each delta; once it returns True the stream ends there and the
+    upstream request is closed, and the text so far counts as the completed response.
+    """
+    logger.info("OpenAI Chat Stream Request - Agent: %s, Model: %s, Temperature: %s, Top_p: %s", agent, model, temperature, top_p)
+
+    span = tracing.span("llm_stream", agent=agent, model=model, bytes_in=len(prompt.encode("utf-8")))
+    with span:
+        cache, cache_key, cached = await _cache_lookup(prompt, model, temperature, top_p, agent)
+    if cached is not None:
+        metrics.LLM_REQUESTS.inc(agent=agent or "unknown", outcome="cache_hit")
+        span.set(cache_hit=True, bytes_out=len(cached.encode("utf-8")))
+        yield cached
+        return
+
+    client = init_client()
+    admission = _scheduler
+    tokens = scheduler.estimate_tokens(prompt)
+
+    async def open_stream(seconds_left: float):
+        # Like create() in _chat, every attempt is admitted on its own; the one that opens the stream
+        # keeps its grant until the stream is closed
+        grant = await admission.acquire(model, tokens)
+        span.set(queue_wait_ms=round(grant.waited_s * 1000, 3), priority=grant.priority)
+        _stats["in_flight"] += 1
+        metrics.LLM_IN_FLIGHT.inc()
+        try:
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                top_p=top_p,
+                timeout=seconds_left,
+                stream=True,
+                # The final chunk then carries usage, with no choices
+                stream_options={"include_usage": True},
+            )
+        except BaseException:
+            _stats["in_flight"] -= 1
+            metrics.LLM_IN_FLIGHT.dec()
+            admission.release(grant)
+            raise
+        return stream, grant
+
+    parts = []
+    try:
+        queued = time.perf_counter()
+        # Only the request runs inside the span: a generator can't hold a context across yields
+        with span:
+            # Only opening the stream is retried; once deltas are yielded there is no going back
+            stream, grant = await resilience.call(model, agent, open_stream, timeout_s)
+        span.set(first_chunk_ms=round((time.perf_counter() - queued) * 1000, 3))
+        used_tokens = None
+        usage_seen = False
+        try:
+            try:
+                async for chunk in stream:
+                    usage = getattr(chunk, "usage", None)
+                    if usage is not None:
+                        usage_seen = True
+                        _record_usage(agent, model, usage)
+                        used_tokens = getattr(usage, "total_tokens", used_tokens)
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        stop = stop_when is not None and stop_when(delta)
+                        yield delta
+                        if stop:
+                            span.set(stopped_early=True)
+                            break
+            finally:
+                # Runs on aclose() too, so an abandoned stream hands its connection back at once
+                await stream.close()
+                if not usage_seen:
+                    # Stopped before the final usage chunk: count what was sent and received so far
+                    usage = _estimate_usage(prompt, "".join(parts))
+                    _record_usage(agent, model, usage)
+                    used_tokens = usage.total_tokens
+        finally:
+            _stats["in_flight"] -= 1
+            metrics.LLM_IN_FLIGHT.dec()
+            admission.release(grant, used_tokens)
+
+    except Exception as e:
+        metrics.LLM_REQUESTS.inc(agent=agent or "unknown", outcome=_error_outcome(e))
+        logger.error("OpenAI Chat Stream Error: %s", e)
+        raise
+
+    metrics.LLM_REQUESTS.inc(agent=agent or "unknown", outcome="ok")
+    content = "".join(parts)
+    span.set(bytes_out=len(content.encode("utf-8")), total_ms=round((time.perf_counter() - queued) * 1000, 3))
+    logger.info("OpenAI Chat Stream completed - Length: %s chars", len(content))
+    if cache_key is not None and _should_cache(content, cache_if):
+        await cache.set(cache_key, content)
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable
+import openai
+from app.config import settings
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worth another attempt: the provider was slow, overloaded or briefly unreachable
+TRANSIENT_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+class LLMUnavailableError(Exception):
+    """The model can't answer right now: its circuit is open or every retry failed transiently."""
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+def is_transient(error: BaseException) -> bool:
+    return isinstance(error, TRANSIENT_ERRORS)
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    ceiling = min(settings.llm_retry_max_delay_s, settings.llm_retry_base_delay_s * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+class CircuitBreaker:
+    """Per-model breaker: closed -> open after N consecutive transient failures -> half-open probe.
+
+    While open, calls fail immediately with CircuitOpenError instead of holding a request
+    handler for the full timeout. After llm_breaker_reset_s one probe call is let through;
+    its success closes the circuit, its failure re-opens it.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {"opened": 0, "rejected": 0}
+
+    def before_call(self) -> None:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < settings.llm_breaker_reset_s:
+                self._reject()
+            self.state = "half_open"
+            logger.info("Circuit for %s half-open, letting a probe through", self.model)
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self._reject()
+            self._probe_in_flight = True
+
+    def _reject(self) -> None:
+        self._stats["rejected"] += 1
+        raise CircuitOpenError(f"circuit open for {self.model}")
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Circuit for %s closed", self.model)
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        metrics.LLM_CIRCUIT_OPEN.set(0, model=self.model)
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= settings.llm_breaker_failure_threshold:
+            if self.state != "open":
+                self._stats["opened"] += 1
+                logger.warning("Circuit for %s opened after %s consecutive failures", self.model, self.consecutive_failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            metrics.LLM_CIRCUIT_OPEN.set(1, model=self.model)
+
+    def release(self) -> None:
+        """A call that ended without a verdict (cancelled, or a non-transient error) frees the probe slot."""
+        self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.consecutive_failures, **self._stats}
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+def get_breaker(model: str) -> CircuitBreaker:
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = _breakers[model] = CircuitBreaker(model)
+    return breaker
+
+def reset() -> None:
+    _breakers.clear()
+
+def get_stats() -> dict:
+    return {model: breaker.stats() for model, breaker in _breakers.items()}
+
+async def call(model: str, agent: str | None, attempt: Callable[[float], Awaitable[Any]], timeout_s: float) -> Any:
+    """Run attempt(seconds_left) behind the model's circuit breaker, retrying transient errors with jittered backoff.
+
+    All attempts and backoffs share one timeout_s deadline: each attempt is passed (and cut off
+    at) the time left, so retries never hold the caller longer than a single call used to.
+    Raises CircuitOpenError without calling out while the circuit is open, and
+    LLMUnavailableError once the retries or the time are used up. Other errors propagate unchanged.
+    """
+    breaker = get_breaker(model)
+    deadline = time.monotonic() + timeout_s
+    for retry in range(settings.llm_max_retries + 1):
+        breaker.before_call()
+        remaining = deadline - time.monotonic()
+        try:
+            result = await asyncio.wait_for(attempt(remaining), remaining)
+        except Exception as e:
+            if not is_transient(e):
+                breaker.release()
+                raise
+            breaker.record_failure()
+            delay = backoff_delay(retry)
+            if retry == settings.llm_max_retries or breaker.state == "open" or time.monotonic() + delay >= deadline:
+                raise LLMUnavailableError(f"{model} unavailable after {retry + 1} attempt(s): {e}") from e
+            metrics.LLM_RETRIES.inc(agent=agent or "unknown")
+            logger.warning("Transient %s from %s, retry %s in %.2fs", type(e).__name__, model, retry + 1, delay)
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return result
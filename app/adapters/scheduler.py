@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+from app.adapters.resilience import LLMUnavailableError
+from app.config import settings
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most urgent first: a slider update someone is watching, a first analysis, /v1/batch
+INTERACTIVE = "interactive"
+ANALYSIS = "analysis"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, ANALYSIS, BATCH)
+
+_priority: ContextVar[str] = ContextVar("llm_priority", default=ANALYSIS)
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """LLM calls made inside the block (and tasks created in it) queue in the `name` class."""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown priority class {name!r}, expected one of {PRIORITIES}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> str:
+    return _priority.get()
+
+def estimate_tokens(prompt: str) -> int:
+    """Tokens a request is charged up front: ~4 chars per prompt token plus the expected completion."""
+    return len(prompt) // 4 + settings.llm_completion_tokens_estimate
+
+class SchedulerRejectedError(LLMUnavailableError):
+    """The request was shed before reaching OpenAI: its class queue was full or it would miss its deadline."""
+
+class TokenBucket:
+    """Refills `per_minute` units a minute up to a minute's worth; per_minute <= 0 means unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 = now). Anything above capacity only waits for a full bucket."""
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        missing = min(amount, self.capacity) - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        # May go negative: a request larger than the bucket, or usage above the estimate, is paid back by waiting
+        if self.rate > 0:
+            self.tokens -= amount
+
+class _Waiter:
+    def __init__(self, model: str, tokens: int, priority: str, deadline: float, future: asyncio.Future):
+        self.model = model
+        self.tokens = tokens
+        self.priority = priority
+        self.deadline = deadline
+        self.future = future
+        self.enqueued = time.monotonic()
+
+class Grant:
+    """An admitted request: holds an in-flight slot until Scheduler.release()."""
+
+    def __init__(self, model: str, tokens: int, priority: str, waited_s: float):
+        self.model = model
+        self.tokens = tokens
+        self.priority = priority
+        self.waited_s = waited_s
+
+class _ModelLimits:
+    def __init__(self, model: str):
+        self.rpm = TokenBucket(settings.llm_rpm_limits.get(model, settings.llm_rpm_limits.get("*", 0)))
+        self.tpm = TokenBucket(settings.llm_tpm_limits.get(model, settings.llm_tpm_limits.get("*", 0)))
+
+    def delay(self, tokens: int, now: float) -> float:
+        return max(self.rpm.delay(1, now), self.tpm.delay(tokens, now))
+
+class Scheduler:
+    """Admits LLM requests by priority class within an in-flight limit and per-model RPM / TPM buckets.
+
+    Each class has a bounded FIFO queue. A free slot always goes to the most urgent class that
+    has a request its model's buckets can afford; a waiting request holds back less urgent ones
+    for the same model, so small batch calls can't drain the buckets under an interactive one.
+    A request that can't be admitted before its class's max wait is dropped as soon as that is
+    known, instead of being sent when nobody is waiting for the answer any more.
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._queues: dict[str, deque[_Waiter]] = {name: deque() for name in PRIORITIES}
+        self._limits: dict[str, _ModelLimits] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._stats = {
+            name: {"granted": 0, "rejected_full": 0, "dropped_deadline": 0, "wait_s_total": 0.0, "wait_s_max": 0.0}
+            for name in PRIORITIES
+        }
+
+    def _model_limits(self, model: str) -> _ModelLimits:
+        limits = self._limits.get(model)
+        if limits is None:
+            limits = self._limits[model] = _ModelLimits(model)
+        return limits
+
+    async def acquire(self, model: str, tokens: int, priority: str | None = None) -> Grant:
+        """Wait for a slot and budget for `model`; raises SchedulerRejectedError when the request is shed."""
+        priority = priority or current_priority()
+        queue = self._queues[priority]
+        if len(queue) >= settings.llm_queue_max_depth.get(priority, 0):
+            self._drop(priority, "full")
+            raise SchedulerRejectedError(f"{priority} LLM queue is full ({len(queue)} waiting)")
+
+        now = time.monotonic()
+        waiter = _Waiter(model, tokens, priority, now + settings.llm_queue_max_wait_s.get(priority, 0.0),
+                         asyncio.get_running_loop().create_future())
+        queue.append(waiter)
+        metrics.LLM_QUEUE_DEPTH.inc(priority=priority)
+        self._dispatch()
+        try:
+            # The deadline itself is enforced by _dispatch; this only stops waiting on a stuck slot
+            await asyncio.wait_for(asyncio.shield(waiter.future), max(waiter.deadline - now, 0) + 0.001)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                self._dequeue(waiter)
+                self._drop(priority, "deadline")
+                waiter.future.set_exception(SchedulerRejectedError(f"{priority} LLM request waited past its deadline"))
+        except BaseException:
+            # Cancelled, e.g. a hedge that lost: give back whatever the waiter got
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self.release(waiter.future.result())
+            elif not waiter.future.done():
+                self._dequeue(waiter)
+                waiter.future.cancel()
+            raise
+        return waiter.future.result()
+
+    def release(self, grant: Grant, used_tokens: int | None = None) -> None:
+        """Free the grant's slot; actual usage, when known, corrects the up-front token estimate."""
+        self.in_flight -= 1
+        if used_tokens is not None:
+            self._model_limits(grant.model).tpm.take(used_tokens - grant.tokens)
+        self._dispatch()
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        try:
+            self._queues[waiter.priority].remove(waiter)
+        except ValueError:
+            return
+        metrics.LLM_QUEUE_DEPTH.dec(priority=waiter.priority)
+
+    def _drop(self, priority: str, reason: str) -> None:
+        self._stats[priority]["rejected_full" if reason == "full" else "dropped_deadline"] += 1
+        metrics.LLM_QUEUE_DROPPED.inc(priority=priority, reason=reason)
+        logger.warning("Shed %s LLM request (%s)", priority, reason)
+
+    def _dispatch(self) -> None:
+        """Admit every queued request that can run now, most urgent class first, and re-arm the timer."""
+        now = time.monotonic()
+        next_check = None
+        held_models: set[str] = set()
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            skipped = []
+            while queue and self.in_flight < self.max_in_flight:
+                waiter = queue[0]
+                if waiter.model in held_models:
+                    skipped.append(queue.popleft())
+                    continue
+                limits = self._model_limits(waiter.model)
+                delay = limits.delay(waiter.tokens, now)
+                if delay == 0:
+                    queue.popleft()
+                    metrics.LLM_QUEUE_DEPTH.dec(priority=priority)
+                    limits.rpm.take(1)
+                    limits.tpm.take(waiter.tokens)
+                    self.in_flight += 1
+                    self._grant(waiter, now)
+                elif now + delay > waiter.deadline:
+                    queue.popleft()
+                    metrics.LLM_QUEUE_DEPTH.dec(priority=priority)
+                    self._drop(priority, "deadline")
+                    waiter.future.set_exception(SchedulerRejectedError(
+                        f"{waiter.model} rate limit frees up in {delay:.1f}s, after the {priority} deadline"
+                    ))
+                else:
+                    held_models.add(waiter.model)
+                    next_check = delay if next_check is None else min(next_check, delay)
+                    skipped.append(queue.popleft())
+            # Requests passed over for a held model keep their place at the front, in order
+            queue.extendleft(reversed(skipped))
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if next_check is not None:
+            self._timer = asyncio.get_running_loop().call_later(next_check, self._dispatch)
+
+    def _grant(self, waiter: _Waiter, now: float) -> None:
+        waited = now - waiter.enqueued
+        stats = self._stats[waiter.priority]
+        stats["granted"] += 1
+        stats["wait_s_total"] += waited
+        stats["wait_s_max"] = max(stats["wait_s_max"], waited)
+        metrics.LLM_QUEUE_WAIT.observe(waited, priority=waiter.priority)
+        waiter.future.set_result(Grant(waiter.model, waiter.tokens, waiter.priority, waited))
+
+    def stats(self) -> dict:
+        classes = {}
+        for name, stats in self._stats.items():
+            classes[name] = {
+                "queued": len(self._queues[name]),
+                "granted": stats["granted"],
+                "rejected_full": stats["rejected_full"],
+                "dropped_deadline": stats["dropped_deadline"],
+                "avg_wait_ms": round(stats["wait_s_total"] / stats["granted"] * 1000, 3) if stats["granted"] else 0.0,
+                "max_wait_ms": round(stats["wait_s_max"] * 1000, 3),
+            }
+        return {"in_flight": self.in_flight, "max_in_flight": self.max_in_flight, "classes": classes}
@@ -1,66 +1,25 @@
+import asyncio
 import json
 import logging
-import re
-from typing import Any, List, Dict
+from contextlib import aclosing
+from typing import Any, AsyncIterator, List, Dict
+from pydantic import ValidationError
 from app.agents.base import BaseAgent, InvalidInputError
 from app.agents.configs import ENTERPRISE_AI_COST_ARCHITECT
 from app.agents.solution_arch import SolutionArchitectAgent
 from app.agents.intake import IntakeAgent
 from app.agents.model_scorer import ModelScorerAgent
 from app.agents.recommender import RecommenderAgent
-from app.agents import cost_engine, roi_calc
+from app.agents import cost_engine, roi_calc, scoring
+from app.agents.json_utils import extract_json_from_text
+from app.agents.pipeline import Pipeline, PipelineResult, Stage, StageMemo
+from app.adapters.resilience import LLMUnavailableError
+from app.config import settings
+from app import catalog, logs, metrics, recommendations, sessions, singleflight
 from app.schemas import WorkloadParams, CostModel, RankedModel, ROIAnalysis, StructuredResponse
 
 logger = logging.getLogger(__name__)
 
-def extract_json_from_text(text: str) -> dict:
-    """Extract JSON object from text that might contain extra content."""
-    try:
-        # First, try parsing the entire text as JSON
-        result = json.loads(text.strip())
-        logger.info(f"Successfully parsed JSON directly from response")
-        return result
-    except json.JSONDecodeError:
-        logger.info("Direct JSON parsing failed, attempting to extract JSON from text")
-        
-        # Remove markdown fences if present
-        cleaned_text = text
-        if "```json" in text:
-            # Extract content between ```json and ```
-            json_match = re.search(r'```json\s*(.*?)\s*```', text, re.DOTALL)
-            if json_match:
-                cleaned_text = json_match.group(1).strip()
-                logger.info(f"Removed markdown fences, extracted: {cleaned_text[:200]}...")
-                try:
-                    result = json.loads(cleaned_text)
-                    logger.info(f"Successfully parsed JSON after removing markdown fences")
-                    return result
-                except json.JSONDecodeError:
-                    logger.info("Failed to parse JSON after removing markdown fences, continuing with regex")
-        
-        # If that fails, try to find JSON block within the text
-        try:
-            # PRIORITY 1: Look for JSON array starting with [ and ending with ]
-            array_match = re.search(r'\[.*?\]', cleaned_text, re.DOTALL)
-            if array_match:
-                json_str = array_match.group()
-                logger.info(f"Found JSON array: {json_str[:200]}...")
-                return json.loads(json_str)
-            
-            # PRIORITY 2: Look for JSON object starting with { and ending with }
-            json_match = re.search(r'\{.*?\}', cleaned_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                logger.info(f"Found JSON object: {json_str[:200]}...")
-                return json.loads(json_str)
-                
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to extract JSON from text: {e}")
-            
-        # If still no luck, raise the original error
-        logger.error(f"No valid JSON found in text: '{text[:200]}...'")
-        raise json.JSONDecodeError(f"No valid JSON found in text", text, 0)
-
 def is_greeting_or_casual_message(message: str) -> bool:
     """Check if the message is a greeting or casual message that needs a service introduction."""
     message_lower = message.lower().strip()
@@ -118,6 +77,7 @@ Just describe your business process that you want to automate with AI. For examp
 
 def generate_helpful_guidance() -> str:
     """Generate helpful guidance when the system can't process the user's request."""
+    metrics.HELPFUL_GUIDANCE.inc()
     return """🤔 **I need more details to help you with AI cost optimization!**
 
 Please describe your business automation need more clearly. Here are some examples:
@@ -145,6 +105,36 @@ Please describe your business automation need more clearly. Here are some exampl
 
 **Try again with a clear business automation scenario!** 🚀"""
 
+CRITICAL_WORKLOAD_KEYS = ["calls_per_day", "avg_input_tokens", "avg_output_tokens", "latency_sla_ms"]
+
+# Workload fields each deterministic stage reads; a parameter update reuses a stage's memoized output
+# unless one of these (or an upstream stage's output) changed. latency_sla_ms, say, never reruns the Cost Engine.
+COST_ENGINE_FIELDS = ("calls_per_day", "avg_input_tokens", "avg_output_tokens", "region", "compliance_constraints")
+NATIVE_SCORER_FIELDS = ("avg_input_tokens", "avg_output_tokens", "latency_sla_ms")
+# The LLM scorer sees the whole workload in its prompt
+LLM_SCORER_FIELDS = tuple(WorkloadParams.model_fields)
+ROI_FIELDS = ("current_model", "calls_per_day", "avg_input_tokens", "avg_output_tokens")
+
+def _catalog_version() -> str:
+    return catalog.get_catalog().version
+
+def _scorer_version() -> tuple:
+    return (settings.model_scorer_mode, settings.scorer_cost_weight, settings.scorer_latency_weight,
+            settings.scorer_violation_penalty)
+
+# Everything except the recommender: what a deferred or streamed response has before the LLM writes
+ANALYSIS_STAGES = ["roi_calc", "pareto_frontier"]
+
+# Interactive stream event emitted when each pipeline stage completes
+STAGE_EVENTS = {
+    "solution_architect": "solution_architect",
+    "intake": "workload_params",
+    "cost_engine": "cost_table",
+    "model_scorer": "ranked_models",
+    "pareto_frontier": "pareto_frontier",
+    "roi_calc": "roi_analysis",
+}
+
 class EnterpriseAICostArchitect(BaseAgent):
     def __init__(self):
         self.config = ENTERPRISE_AI_COST_ARCHITECT
@@ -152,411 +142,397 @@ class EnterpriseAICostArchitect(BaseAgent):
         self.intake_agent = IntakeAgent()
         self.model_scorer = ModelScorerAgent()
         self.recommender = RecommenderAgent()
+        self.pipeline = self._build_pipeline()
+    
+    def _build_pipeline(self) -> Pipeline:
+        """STEP 0-5 as a stage graph. precheck runs alongside the Intake LLM call and fails fast."""
+        return Pipeline([
+            Stage("solution_architect", self._stage_solution_architect, deps=["message"]),
+            Stage("workload_json", self._stage_workload_json, deps=["message", "solution_architect"]),
+            Stage("precheck", self._stage_precheck, deps=["workload_json"]),
+            Stage("intake", self._stage_intake, deps=["workload_json"]),
+            Stage("cost_engine", self._stage_cost_engine, deps=["intake", "precheck"],
+                  reads={"intake": COST_ENGINE_FIELDS, "precheck": ()}, version=_catalog_version),
+            Stage("model_scorer", self._stage_model_scorer, deps=["intake", "cost_engine"],
+                  reads={"intake": LLM_SCORER_FIELDS if settings.model_scorer_mode == "llm" else NATIVE_SCORER_FIELDS},
+                  version=_scorer_version),
+            Stage("pareto_frontier", self._stage_pareto_frontier, deps=["cost_engine"], reads={}),
+            Stage("roi_calc", self._stage_roi_calc, deps=["intake", "model_scorer"],
+                  reads={"intake": ROI_FIELDS}, version=_catalog_version),
+            Stage("recommender", self._stage_recommender, deps=["intake", "model_scorer", "roi_calc"]),
+        ])
     
     def _is_valid_workload_json(self, message: str) -> bool:
         """Check if message is valid workload JSON with required keys."""
         try:
             data = json.loads(message)
             is_valid = all(key in data for key in ["calls_per_day", "avg_input_tokens", "avg_output_tokens"])
-            logger.info(f"Workload JSON validation: {is_valid}")
+            logger.info("Workload JSON validation: %s", is_valid)
             if is_valid:
-                logger.debug(f"Valid workload JSON: {data}")
+                logger.debug("Valid workload JSON: %s", logs.payload(data))
             return is_valid
         except (json.JSONDecodeError, TypeError) as e:
-            logger.info(f"Message is not valid JSON: {e}")
+            logger.info("Message is not valid JSON: %s", e)
             return False
     
-    async def run_interactive(self, message: Any = None, modified_workload: dict = None, original_data: dict = None) -> StructuredResponse:
-        """Execute workflow and return structured data for interactive mode."""
-        logger.info(f"=== EnterpriseAICostArchitect INTERACTIVE START ===")
-        
-        # If we have modified workload, restart from appropriate step
-        if modified_workload and original_data:
-            return await self._restart_from_modified_workload(modified_workload, original_data)
+    async def _rank_models(self, validated_workload: dict, cost_table: list) -> list:
+        """Rank models natively, or via the Model Scorer LLM when model_scorer_mode is 'llm'."""
+        scorer_payload = {"workload": validated_workload, "cost_table": cost_table}
         
-        # Check for greeting or casual messages first
-        if is_greeting_or_casual_message(str(message)):
-            logger.info("Detected greeting/casual message - returning service introduction")
-            return StructuredResponse(
-                solution_architect=None,
-                workload_params=None,
-                cost_table=None,
-                ranked_models=None,
-                roi_analysis=None,
-                final_recommendation=generate_service_introduction()
+        async def native() -> list:
+            return await scoring.run(
+                scorer_payload,
+                cost_weight=settings.scorer_cost_weight,
+                latency_weight=settings.scorer_latency_weight,
+                violation_penalty=settings.scorer_violation_penalty,
             )
         
-        # Otherwise, run full workflow with proper error handling
-        try:
-            return await self._run_full_workflow_structured(message)
-        except Exception as e:
-            error_msg = str(e)
-            logger.error(f"Interactive workflow error: {error_msg}")
-            
-            # Return helpful guidance for various error scenarios
-            if any(error_type in error_msg.lower() for error_type in ["invalid input", "failed to parse", "validation failed", "empty response"]):
-                guidance_msg = generate_helpful_guidance()
-            else:
-                guidance_msg = generate_helpful_guidance()
-            
-            return StructuredResponse(
-                solution_architect=None,
-                workload_params=None,
-                cost_table=None,
-                ranked_models=None,
-                roi_analysis=None,
-                final_recommendation=guidance_msg
-            )
-    
-    async def _restart_from_modified_workload(self, modified_workload: dict, original_data: dict) -> StructuredResponse:
-        """Restart workflow from cost engine with modified workload parameters."""
-        logger.info("=== RESTARTING WITH MODIFIED WORKLOAD ===")
-        logger.info(f"Modified workload: {modified_workload}")
+        if settings.model_scorer_mode != "llm":
+            return await native()
+        
+        scorer_input = json.dumps(scorer_payload)
+        logger.info("Scorer input payload size: %s chars", len(scorer_input))
+        logger.debug("Scorer input payload: %s", logs.payload(scorer_input))
         
-        # Start from STEP 2: Cost Engine with modified workload
         try:
-            cost_table = await cost_engine.run(modified_workload)
-            logger.info(f"Cost table generated: {len(cost_table)} models")
-        except InvalidInputError as e:
-            logger.error(f"CostEngine error: {e}")
-            return StructuredResponse(
-                solution_architect=None,
-                workload_params=None,
-                cost_table=None,
-                ranked_models=None,
-                roi_analysis=None,
-                final_recommendation=generate_helpful_guidance()
-            )
-        except Exception as e:
-            logger.error(f"CostEngine unexpected error: {e}")
-            return StructuredResponse(
-                solution_architect=None,
-                workload_params=None,
-                cost_table=None,
-                ranked_models=None,
-                roi_analysis=None,
-                final_recommendation=generate_helpful_guidance()
-            )
+            scorer_response = await self.model_scorer.run(scorer_input)
+        except LLMUnavailableError:
+            # Same formula as the Model Scorer prompt, so the ranking doesn't depend on the provider being up
+            metrics.LLM_FALLBACKS.inc(agent="model_scorer")
+            logger.warning("Model Scorer LLM unavailable - ranking natively")
+            return await native()
+        logger.info("Scorer response: %s", logs.payload(scorer_response, 300))
+        
+        if isinstance(scorer_response, str) and scorer_response.startswith("INVALID INPUT –"):
+            raise InvalidInputError(scorer_response)
         
-        # Continue with STEP 3-5 using new cost table
+        ranked_models = extract_json_from_text(scorer_response)
+        if not isinstance(ranked_models, list):
+            return ranked_models
         try:
-            return await self._run_from_model_scorer(modified_workload, cost_table, original_data.get("solution_architect"))
-        except Exception as e:
-            logger.error(f"Error in model scorer workflow: {e}")
-            return StructuredResponse(
-                solution_architect=original_data.get("solution_architect"),
-                workload_params=WorkloadParams(**modified_workload) if modified_workload else None,
-                cost_table=[CostModel(**model) for model in cost_table] if cost_table else None,
-                ranked_models=None,
-                roi_analysis=None,
-                final_recommendation=generate_helpful_guidance()
-            )
+            # The one ranking that doesn't come from our own code: validate and normalize it here
+            return [RankedModel(**model).model_dump() for model in ranked_models]
+        except (TypeError, ValidationError) as e:
+            raise Exception(f"Model Scorer returned invalid models: {e}")
     
-    async def _run_from_model_scorer(self, validated_workload: dict, cost_table: list, solution_architect_data: dict = None) -> StructuredResponse:
-        """Run from Model Scorer step onwards."""
+    async def _stage_solution_architect(self, inputs: dict) -> dict | None:
+        """STEP 0: draft the solution with the Solution Architect unless the message is already workload JSON."""
+        message = inputs["message"]
+        logger.info("=== STEP 0: Checking workload JSON validity ===")
+        if self._is_valid_workload_json(str(message)):
+            logger.info("Message is valid workload JSON - skipping Solution Architect")
+            return None
         
-        # STEP 3: Model Scorer
-        scorer_payload = {"workload": validated_workload, "cost_table": cost_table}
-        scorer_input = json.dumps(scorer_payload)
+        arch_response = await self.solution_architect.run(message)
+        logger.info("Solution Architect response: %s", logs.payload(arch_response, 300))
+        
+        if isinstance(arch_response, str) and arch_response.startswith("INVALID INPUT –"):
+            raise InvalidInputError(arch_response)
+        
+        if not arch_response:
+            raise Exception("Solution Architect returned empty response")
         
         try:
-            scorer_response = await self.model_scorer.run(scorer_input)
-            ranked_models = extract_json_from_text(scorer_response)
-            
-            # Validate ranked_models
-            if not isinstance(ranked_models, list) or not ranked_models:
-                raise Exception("Model Scorer returned invalid data")
-            
-            if isinstance(ranked_models[0], str) and "INVALID INPUT" in ranked_models[0]:
-                raise Exception(f"Model Scorer error: {ranked_models[0]}")
-        except Exception as e:
-            logger.error(f"Model Scorer error: {e}")
-            return StructuredResponse(
-                solution_architect=solution_architect_data,
-                workload_params=WorkloadParams(**validated_workload),
-                cost_table=[CostModel(**model) for model in cost_table],
-                ranked_models=None,
-                roi_analysis=None,
-                final_recommendation=generate_helpful_guidance()
-            )
+            arch_data = extract_json_from_text(str(arch_response))
+        except json.JSONDecodeError:
+            raise Exception("Failed to parse Solution Architect response")
+        
+        # Echo architecture back to user (this would be logged/shown in a real app)
+        architecture = arch_data.get("architecture", [])
+        architecture_summary = " → ".join(architecture) if architecture else "No architecture provided"
+        logger.info("Architecture echo: AI Solution drafted: %s → %s", arch_data.get('opt_task', ''), architecture_summary)
+        return arch_data
+    
+    async def _stage_workload_json(self, inputs: dict) -> dict:
+        arch_data = inputs["solution_architect"]
+        if arch_data is not None:
+            return arch_data.get("workload", {})
+        return json.loads(str(inputs["message"]))
+    
+    async def _stage_precheck(self, inputs: dict) -> bool:
+        """Deterministic check run next to Intake so a hopeless workload skips the wait.
+        
+        Only rejects what Intake could never repair: a workload that isn't an object, or a
+        critical key given as a number that isn't positive. Missing keys and values like
+        1000.0 or "12,000" are left for Intake to ask about or normalize.
+        """
+        workload_json = inputs["workload_json"]
+        if not isinstance(workload_json, dict):
+            raise InvalidInputError("INVALID INPUT – workload must be a JSON object")
+        for key in CRITICAL_WORKLOAD_KEYS:
+            value = workload_json.get(key)
+            if isinstance(value, str):
+                try:
+                    value = float(value.replace(",", "").replace("_", "").strip())
+                except ValueError:
+                    continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value <= 0:
+                raise InvalidInputError(f"INVALID INPUT – invalid {key}")
+        return True
+    
+    async def _stage_intake(self, inputs: dict) -> dict:
+        """STEP 1: validate the workload JSON with the Intake & Clarifier."""
+        logger.info("=== STEP 1: Intake & Clarifier ===")
+        intake_response = await self.intake_agent.run(json.dumps(inputs["workload_json"]))
+        logger.info("Intake response: %s", logs.payload(intake_response, 300))
         
-        # STEP 4: ROI Calculator
-        roi_payload = {
-            "workload": validated_workload,
-            "ranked_models": ranked_models,
-            "current_model": validated_workload.get("current_model", "")
-        }
+        if isinstance(intake_response, str) and intake_response.startswith("INVALID INPUT –"):
+            raise InvalidInputError(intake_response)
         
         try:
-            roi_report = await roi_calc.run(roi_payload)
-        except Exception as e:
-            logger.error(f"ROI Calculator error: {e}")
-            return StructuredResponse(
-                solution_architect=solution_architect_data,
-                workload_params=WorkloadParams(**validated_workload),
-                cost_table=[CostModel(**model) for model in cost_table],
-                ranked_models=[RankedModel(**model) for model in ranked_models],
-                roi_analysis=None,
-                final_recommendation=generate_helpful_guidance()
-            )
+            return extract_json_from_text(intake_response)
+        except json.JSONDecodeError:
+            raise Exception("Failed to parse Intake response")
+    
+    async def _stage_cost_engine(self, inputs: dict) -> list:
+        """STEP 2: Cost Engine."""
+        logger.info("=== STEP 2: Cost Engine ===")
+        cost_table = await cost_engine.run(inputs["intake"])
+        logger.info("Cost table generated: %s models", len(cost_table))
+        return cost_table
+    
+    async def _stage_model_scorer(self, inputs: dict) -> list:
+        """STEP 3: Model Scorer, with the output checked before anything downstream trusts it."""
+        logger.info("=== STEP 3: Model Scorer (%s) ===", settings.model_scorer_mode)
+        ranked_models = await self._rank_models(inputs["intake"], inputs["cost_engine"])
         
-        # STEP 5: Recommendation Synthesizer
-        final_payload = {
+        if not isinstance(ranked_models, list) or not ranked_models:
+            raise Exception("Model Scorer returned invalid data")
+        
+        for i, model in enumerate(ranked_models):
+            if not isinstance(model, dict) or not all(key in model for key in ["model_name", "monthly_cost"]):
+                raise Exception(f"Model Scorer returned invalid model object at index {i}: {model}")
+        
+        logger.info("Ranked models: %s models", len(ranked_models))
+        return ranked_models
+    
+    async def _stage_pareto_frontier(self, inputs: dict) -> list:
+        """Every non-dominated cost / latency / context option, next to the ranking."""
+        return scoring.pareto_frontier(inputs["cost_engine"])
+    
+    async def _stage_roi_calc(self, inputs: dict) -> dict:
+        """STEP 4: ROI & Payback Calculator."""
+        logger.info("=== STEP 4: ROI & Payback Calculator ===")
+        validated_workload = inputs["intake"]
+        ranked_models = inputs["model_scorer"]
+        current_model = validated_workload.get("current_model", "")
+        if current_model and all(model.get("model_name") != current_model for model in ranked_models):
+            # Filtered out by region/compliance, but it is still the spend the savings are measured against
+            baseline = cost_engine.current_model_row(validated_workload)
+            if baseline is not None:
+                ranked_models = ranked_models + [baseline]
+        return await roi_calc.run({
             "workload": validated_workload,
-            "current_model": roi_report.get("current_model", ""),
             "ranked_models": ranked_models,
+            "current_model": current_model
+        })
+    
+    def _recommender_input(self, outputs: dict) -> str:
+        roi_report = outputs["roi_calc"]
+        return json.dumps({
+            "workload": outputs["intake"],
+            "current_model": roi_report.get("current_model", ""),
+            "ranked_models": outputs["model_scorer"],
             "roi": roi_report
-        }
-        final_input = json.dumps(final_payload)
-        
-        try:
-            final_response = await self.recommender.run(final_input)
-        except Exception as e:
-            logger.error(f"Recommendation Synthesizer error: {e}")
-            return StructuredResponse(
-                solution_architect=solution_architect_data,
-                workload_params=WorkloadParams(**validated_workload),
-                cost_table=[CostModel(**model) for model in cost_table],
-                ranked_models=[RankedModel(**model) for model in ranked_models],
-                roi_analysis=ROIAnalysis(**roi_report),
-                final_recommendation=generate_helpful_guidance()
-            )
+        })
+    
+    async def _stage_recommender(self, inputs: dict) -> str:
+        """STEP 5: Recommendation Synthesizer."""
+        logger.info("=== STEP 5: Recommendation Synthesizer ===")
+        final_response = await self.recommender.run(self._recommender_input(inputs))
+        logger.info("Final response: %s", logs.payload(final_response, 300))
         
-        # Build successful structured response
+        if isinstance(final_response, str) and final_response.startswith("INVALID INPUT –"):
+            raise InvalidInputError(final_response)
+        return final_response
+    
+    def _structured_response(self, result: PipelineResult) -> StructuredResponse:
+        """Everything the pipeline produced; helpful guidance stands in for the recommendation after a failure."""
+        outputs = result.outputs
+        workload = outputs.get("intake")
+        cost_table = outputs.get("cost_engine")
+        ranked_models = outputs.get("model_scorer")
+        roi_report = outputs.get("roi_calc")
+        frontier = outputs.get("pareto_frontier")
         return StructuredResponse(
-            solution_architect=solution_architect_data,
-            workload_params=WorkloadParams(**validated_workload),
-            cost_table=[CostModel(**model) for model in cost_table],
-            ranked_models=[RankedModel(**model) for model in ranked_models],
-            roi_analysis=ROIAnalysis(**roi_report),
-            final_recommendation=final_response
+            solution_architect=outputs.get("solution_architect"),
+            workload_params=WorkloadParams(**workload) if workload else None,
+            cost_table=[CostModel(**model) for model in cost_table] if cost_table else None,
+            ranked_models=[RankedModel(**model) for model in ranked_models] if ranked_models else None,
+            pareto_frontier=[CostModel(**model) for model in frontier] if frontier else None,
+            roi_analysis=ROIAnalysis(**roi_report) if roi_report else None,
+            final_recommendation=outputs.get("recommender") if result.ok else generate_helpful_guidance(),
+            stage_timings_ms=result.timings_ms,
         )
     
-    async def _run_full_workflow_structured(self, message: Any) -> StructuredResponse:
-        """Run full workflow and return structured data."""
-        
-        solution_architect_data = None
+    async def run_interactive(self, message: Any = None, modified_workload: dict = None, original_data: dict = None,
+                              defer_recommendation: bool = False, revision_id: str = None,
+                              session_id: str = None, workload_changes: dict = None) -> StructuredResponse:
+        """Execute workflow and return structured data for interactive mode.
+        
+        A parameter update resumes the pipeline at the Cost Engine with everything upstream
+        taken from the modified workload. With defer_recommendation, the response returns as
+        soon as the deterministic stages finish; final_recommendation is produced in the
+        background under the returned revision_id. revision_id names the revision being
+        replaced so its job can be cancelled.
+        
+        Every analysis with a workload is kept as a session (response.session_id). An update can
+        then send session_id and only workload_changes instead of original_data; an unknown or
+        expired session without original_data raises SessionNotFoundError.
+        """
+        logger.info("=== EnterpriseAICostArchitect INTERACTIVE START ===")
+        
+        memo = None
+        # A client that only resends original_data still carries its session in it: reuse that, don't open another
+        session_id = session_id or (original_data or {}).get("session_id")
+        if session_id:
+            session = sessions.get_store().get(session_id)
+            if session is not None:
+                modified_workload = {**session.workload, **(modified_workload or {}), **(workload_changes or {})}
+                original_data = {"solution_architect": session.solution_architect}
+                memo = session.memo
+            elif not (modified_workload and original_data):
+                raise sessions.SessionNotFoundError(session_id)
+            else:
+                session_id = None
+        # A new session inherits the memo of the run that created it, so its first update already reuses stages
+        memo = memo or StageMemo(settings.stage_memo_max_entries)
+        
+        response = await self._run_interactive(message, modified_workload, original_data, defer_recommendation,
+                                               revision_id, memo)
+        if response.workload_params is not None:
+            workload = response.workload_params.model_dump()
+            if session_id:
+                sessions.get_store().update(session_id, workload)
+            else:
+                session_id = sessions.get_store().create(response.solution_architect, workload, memo)
+            response.session_id = session_id
+        return response
+    
+    async def _run_interactive(self, message: Any, modified_workload: dict | None, original_data: dict | None,
+                               defer_recommendation: bool, revision_id: str | None,
+                               memo: StageMemo) -> StructuredResponse:
+        if modified_workload and original_data:
+            logger.info("Modified workload: %s", logs.payload(modified_workload))
+            flight_key = singleflight.make_key("update", modified_workload, original_data.get("solution_architect"))
+            cached = {
+                "message": None,
+                "solution_architect": original_data.get("solution_architect"),
+                "workload_json": modified_workload,
+                "precheck": True,
+                "intake": modified_workload,
+            }
+        elif is_greeting_or_casual_message(str(message)):
+            logger.info("Detected greeting/casual message - returning service introduction")
+            return StructuredResponse(final_recommendation=generate_service_introduction())
+        else:
+            flight_key = singleflight.make_key("interactive", singleflight.normalize_message(message))
+            cached = {"message": message}
         
-        # STEP 0: Check workload JSON or call Solution Architect
-        if not self._is_valid_workload_json(str(message)):
-            arch_response = await self.solution_architect.run(message)
-            
-            if isinstance(arch_response, str) and arch_response.startswith("INVALID INPUT –"):
-                raise Exception("Invalid input from user")
+        if not defer_recommendation:
+            async def analyze() -> StructuredResponse:
+                return self._structured_response(await self.pipeline.run(cached, memo=memo))
             
-            if not arch_response:
-                raise Exception("Solution Architect returned empty response")
-            
-            try:
-                arch_data = extract_json_from_text(str(arch_response))
-                solution_architect_data = arch_data
-                workload_json = arch_data.get("workload", {})
-            except (json.JSONDecodeError, KeyError) as e:
-                raise Exception("Failed to parse Solution Architect response")
-        else:
-            workload_json = json.loads(str(message))
+            # Deferred runs aren't coalesced: each one owns a revision and may cancel its predecessor
+            if not settings.singleflight_enabled:
+                return await analyze()
+            return (await singleflight.get_group().do(flight_key, analyze)).model_copy()
         
-        # STEP 1: Intake & Clarifier
-        intake_input = json.dumps(workload_json)
-        intake_response = await self.intake_agent.run(intake_input)
+        result = await self.pipeline.run(cached, targets=ANALYSIS_STAGES, memo=memo)
+        if not result.ok:
+            return self._structured_response(result)
         
-        if isinstance(intake_response, str) and intake_response.startswith("INVALID INPUT –"):
-            raise Exception("Intake validation failed")
+        upstream = dict(result.outputs)
         
-        try:
-            validated_workload = extract_json_from_text(intake_response)
-        except json.JSONDecodeError as e:
-            raise Exception("Failed to parse Intake response")
+        async def produce_recommendation() -> str:
+            recommendation = await self.pipeline.run(upstream, targets=["recommender"])
+            recommendation.raise_for_failure()
+            return recommendation.outputs["recommender"]
         
-        # STEP 2: Cost Engine
-        try:
-            cost_table = await cost_engine.run(validated_workload)
-        except InvalidInputError as e:
-            raise Exception(f"CostEngine error: {e}")
+        new_revision_id = recommendations.get_store().submit(
+            produce_recommendation, generate_helpful_guidance, supersedes=revision_id
+        )
+        logger.info("Recommendation deferred under revision %s", new_revision_id)
+        response = self._structured_response(result)
+        response.revision_id = new_revision_id
+        response.recommendation_status = "pending"
+        return response
+    
+    async def stream_interactive(self, message: Any) -> AsyncIterator[tuple]:
+        """Yield (event, data) as each interactive stage completes, then the recommendation token by token.
         
-        # Continue from Model Scorer
-        return await self._run_from_model_scorer(validated_workload, cost_table, solution_architect_data)
-
-    # Keep the original run method for backward compatibility
-    async def run(self, message: Any) -> Any:
-        """Execute the full STEP 0-5 workflow per ENTERPRISE_AI_COST_ARCHITECT instructions."""
-        logger.info(f"=== EnterpriseAICostArchitect START ===")
-        logger.info(f"Input message: {str(message)[:200]}...")
+        Events: solution_architect, workload_params, cost_table, ranked_models, roi_analysis,
+        recommendation_delta (repeated), final_recommendation, done. A failing stage yields a
+        single error event carrying helpful guidance and ends the stream.
+        """
+        logger.info("=== EnterpriseAICostArchitect STREAM START ===")
         
-        # Check for greeting or casual messages first
         if is_greeting_or_casual_message(str(message)):
-            logger.info("Detected greeting/casual message - returning service introduction")
-            return generate_service_introduction()
+            yield "final_recommendation", generate_service_introduction()
+            yield "done", {}
+            return
         
-        # STEP 0: Check if user's first message is valid workload JSON
-        logger.info("=== STEP 0: Checking workload JSON validity ===")
-        if not self._is_valid_workload_json(str(message)):
-            logger.info("Message is NOT valid workload JSON - calling Solution Architect")
-            
-            # Pass raw message to Solution Architect – OPT Extractor
-            arch_response = await self.solution_architect.run(message)
-            logger.info(f"Solution Architect response type: {type(arch_response)}")
-            logger.info(f"Solution Architect response: {str(arch_response)[:300]}...")
-            
-            # Check for INVALID INPUT error
-            if isinstance(arch_response, str) and arch_response.startswith("INVALID INPUT –"):
-                logger.error(f"Solution Architect returned error: {arch_response}")
-                return generate_helpful_guidance()
-            
-            # Check if response is empty or None
-            if not arch_response:
-                logger.error("Solution Architect returned empty response")
-                return generate_helpful_guidance()
-            
-            try:
-                # Extract opt_task, architecture, workload from response
-                logger.info("Attempting to parse Solution Architect JSON response")
-                arch_data = extract_json_from_text(str(arch_response))
-                logger.info(f"Parsed architecture data: {arch_data}")
-                
-                opt_task = arch_data.get("opt_task", "")
-                architecture = arch_data.get("architecture", [])
-                workload = arch_data.get("workload", {})
-                
-                logger.info(f"Extracted - opt_task: {opt_task}")
-                logger.info(f"Extracted - architecture: {architecture}")
-                logger.info(f"Extracted - workload: {workload}")
-                
-                # Echo architecture back to user (this would be logged/shown in a real app)
-                architecture_summary = " → ".join(architecture) if architecture else "No architecture provided"
-                echo_message = f"AI Solution drafted: {opt_task} → {architecture_summary}"
-                logger.info(f"Architecture echo: {echo_message}")
-                
-                # Continue to STEP 1 with workload JSON
-                workload_json = workload
-                
-            except (json.JSONDecodeError, KeyError) as e:
-                logger.error(f"Failed to parse Solution Architect response: {e}")
-                logger.error(f"Raw response: '{arch_response}'")
-                return generate_helpful_guidance()
-        else:
-            # Message is already valid workload JSON
-            logger.info("Message is valid workload JSON - skipping Solution Architect")
-            try:
-                workload_json = json.loads(str(message))
-                logger.info(f"Parsed workload JSON: {workload_json}")
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse workload JSON: {e}")
-                return generate_helpful_guidance()
-        
-        # STEP 1: Send workload JSON to Intake & Clarifier
-        logger.info("=== STEP 1: Intake & Clarifier ===")
-        intake_input = json.dumps(workload_json)
-        logger.info(f"Intake input: {intake_input}")
+        events: asyncio.Queue = asyncio.Queue()
         
-        intake_response = await self.intake_agent.run(intake_input)
-        logger.info(f"Intake response: {str(intake_response)[:300]}...")
+        def publish(stage: str, output: Any) -> None:
+            if stage in STAGE_EVENTS and output is not None:
+                events.put_nowait((STAGE_EVENTS[stage], output))
         
-        # Check for INVALID INPUT error
-        if isinstance(intake_response, str) and intake_response.startswith("INVALID INPUT –"):
-            logger.error(f"Intake returned error: {intake_response}")
-            return generate_helpful_guidance()
+        async def drive() -> PipelineResult:
+            try:
+                return await self.pipeline.run({"message": message}, targets=ANALYSIS_STAGES, on_stage_complete=publish)
+            finally:
+                events.put_nowait(None)
         
+        run_task = asyncio.create_task(drive())
         try:
-            validated_workload = extract_json_from_text(intake_response)
-            logger.info(f"Validated workload: {validated_workload}")
-            logger.info(f"Validated workload keys: {list(validated_workload.keys())}")
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse Intake response: {e}")
-            return generate_helpful_guidance()
-        
-        # STEP 2: Pass workload JSON to CostEngine
-        logger.info("=== STEP 2: Cost Engine ===")
+            while (item := await events.get()) is not None:
+                yield item
+            result = await run_task
+        finally:
+            # The client may disconnect mid-stream
+            if not run_task.done():
+                run_task.cancel()
+        
+        if not result.ok:
+            yield "error", {"final_recommendation": generate_helpful_guidance()}
+            return
+        
+        parts = []
         try:
-            cost_table = await cost_engine.run(validated_workload)
-            logger.info(f"Cost table generated: {len(cost_table)} models")
-            logger.debug(f"Cost table: {cost_table}")
-        except InvalidInputError as e:
-            logger.error(f"CostEngine error: {e}")
-            return generate_helpful_guidance()
-        
-        # STEP 3: Send { "workload":…, "cost_table":… } to Model Scorer
-        logger.info("=== STEP 3: Model Scorer ===")
-        scorer_payload = {
-            "workload": validated_workload,
-            "cost_table": cost_table
-        }
-        scorer_input = json.dumps(scorer_payload)
-        logger.info(f"Scorer input payload size: {len(scorer_input)} chars")
-        logger.debug(f"Scorer input payload: {scorer_input}")
+            # aclosing: a client disconnect releases the in-flight slot and upstream stream right away
+            async with aclosing(self.recommender.stream(self._recommender_input(result.outputs))) as deltas:
+                async for delta in deltas:
+                    parts.append(delta)
+                    yield "recommendation_delta", delta
+        except Exception as e:
+            logger.error("Streaming recommendation error: %s", e)
+            yield "error", {"final_recommendation": generate_helpful_guidance()}
+            return
         
-        scorer_response = await self.model_scorer.run(scorer_input)
-        logger.info(f"Scorer response: {str(scorer_response)[:300]}...")
+        yield "final_recommendation", "".join(parts)
+        yield "done", {}
+
+    # Keep the original run method for backward compatibility
+    async def run(self, message: Any) -> Any:
+        """Execute the full STEP 0-5 workflow per ENTERPRISE_AI_COST_ARCHITECT instructions."""
+        logger.info("=== EnterpriseAICostArchitect START ===")
+        logger.info("Input message: %s", logs.payload(message, 200))
         
-        # Check for INVALID INPUT error
-        if isinstance(scorer_response, str) and scorer_response.startswith("INVALID INPUT –"):
-            logger.error(f"Model Scorer returned error: {scorer_response}")
-            return generate_helpful_guidance()
+        # Check for greeting or casual messages first
+        if is_greeting_or_casual_message(str(message)):
+            logger.info("Detected greeting/casual message - returning service introduction")
+            return generate_service_introduction()
         
-        try:
-            ranked_models = extract_json_from_text(scorer_response)
-            logger.info(f"Ranked models: {len(ranked_models)} models")
-            logger.debug(f"Ranked models: {ranked_models}")
-            
-            # Validate that ranked_models contains valid model objects, not error strings
-            if not isinstance(ranked_models, list) or not ranked_models:
-                logger.error("Model Scorer returned empty or invalid array")
-                return generate_helpful_guidance()
-            
-            # Check if first element is an error string
-            if isinstance(ranked_models[0], str) and "INVALID INPUT" in ranked_models[0]:
-                logger.error(f"Model Scorer returned error in array: {ranked_models[0]}")
+        async def analyze() -> str:
+            result = await self.pipeline.run({"message": message})
+            if not result.ok:
                 return generate_helpful_guidance()
             
-            # Validate that elements are model objects with required fields
-            for i, model in enumerate(ranked_models):
-                if not isinstance(model, dict) or not all(key in model for key in ["model_name", "monthly_cost"]):
-                    logger.error(f"Model Scorer returned invalid model object at index {i}: {model}")
-                    return generate_helpful_guidance()
-                    
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse Model Scorer response: {e}")
-            return generate_helpful_guidance()
-        
-        # STEP 4: Send to ROI & Payback Calculator
-        logger.info("=== STEP 4: ROI & Payback Calculator ===")
-        roi_payload = {
-            "workload": validated_workload,
-            "ranked_models": ranked_models,
-            "current_model": validated_workload.get("current_model", "")
-        }
-        logger.info(f"ROI payload current_model: {roi_payload['current_model']}")
-        
-        try:
-            roi_report = await roi_calc.run(roi_payload)
-            logger.info(f"ROI report: {roi_report}")
-        except InvalidInputError as e:
-            logger.error(f"ROI Calculator error: {e}")
-            return generate_helpful_guidance()
-        except Exception as e:
-            logger.error(f"ROI Calculator unexpected error: {e}")
-            return generate_helpful_guidance()
-        
-        # STEP 5: Send to Recommendation Synthesizer
-        logger.info("=== STEP 5: Recommendation Synthesizer ===")
-        final_payload = {
-            "workload": validated_workload,
-            "current_model": roi_report.get("current_model", ""),
-            "ranked_models": ranked_models,
-            "roi": roi_report
-        }
-        final_input = json.dumps(final_payload)
-        logger.info(f"Final payload size: {len(final_input)} chars")
-        logger.info(f"Final payload current_model: {final_payload['current_model']}")
-        
-        final_response = await self.recommender.run(final_input)
-        logger.info(f"Final response: {str(final_response)[:300]}...")
-        
-        # Check for INVALID INPUT error
-        if isinstance(final_response, str) and final_response.startswith("INVALID INPUT –"):
-            logger.error(f"Recommendation Synthesizer returned error: {final_response}")
-            return generate_helpful_guidance()
+            logger.info("=== EnterpriseAICostArchitect COMPLETE ===")
+            # Return ONLY the message produced by Recommendation Synthesizer
+            return result.outputs["recommender"]
         
-        logger.info("=== EnterpriseAICostArchitect COMPLETE ===")
-        # Return ONLY the message produced by Recommendation Synthesizer
-        return final_response 
\ No newline at end of file
+        if not settings.singleflight_enabled:
+            return await analyze()
+        return await singleflight.get_group().do(singleflight.make_key("chat", singleflight.normalize_message(message)), analyze)
@@ -1,4 +1,6 @@
+import numpy as np
 from app.agents.base import InvalidInputError
+from app.catalog import CatalogSnapshot, get_catalog
 
 async def run(workload: dict) -> list[dict]:
     # Validate input
@@ -7,84 +9,127 @@ async def run(workload: dict) -> list[dict]:
         if key not in workload or not isinstance(workload[key], int) or workload[key] < 1:
             raise InvalidInputError(f"INVALID INPUT – missing or invalid {key}")
 
-    # Example static cost_catalog (should be loaded from CSV in real app)
-    cost_catalog = [
-    {
-      "model_name": "gpt-4o",
-      "price_per_1k_tokens": 0.005,
-      "latency_ms": 360,
-      "context_window_tokens": 128000
-    },
-    {
-      "model_name": "gpt-4o-mini",
-      "price_per_1k_tokens": 0.00015,
-      "latency_ms": 470,
-      "context_window_tokens": 128000
-    },
-    {
-      "model_name": "gpt-4.1",
-      "price_per_1k_tokens": 0.002,
-      "latency_ms": 480,
-      "context_window_tokens": 1000000
-    },
-    {
-      "model_name": "gpt-4.1-mini",
-      "price_per_1k_tokens": 0.0004,
-      "latency_ms": 650,
-      "context_window_tokens": 1000000
-    },
-    {
-      "model_name": "gpt-4.1-nano",
-      "price_per_1k_tokens": 0.0001,
-      "latency_ms": 370,
-      "context_window_tokens": 1000000
-    },
-    {
-      "model_name": "claude-4-opus",
-      "price_per_1k_tokens": 0.015,
-      "latency_ms": 2750,
-      "context_window_tokens": 200000
-    },
-    {
-      "model_name": "claude-4-sonnet",
-      "price_per_1k_tokens": 0.003,
-      "latency_ms": 1330,
-      "context_window_tokens": 200000
-    },
-    {
-      "model_name": "claude-3.5-haiku",
-      "price_per_1k_tokens": 0.0008,
-      "latency_ms": 630,
-      "context_window_tokens": 200000
-    },
-    {
-      "model_name": "gemini-1.5-pro",
-      "price_per_1k_tokens": 0.00125,
-      "latency_ms": 430,
-      "context_window_tokens": 2000000
-    },
-    {
-      "model_name": "gemini-1.5-flash",
-      "price_per_1k_tokens": 0.000075,
-      "latency_ms": 200,
-      "context_window_tokens": 1000000
-    }
-  ]
+    catalog = get_catalog()
+    monthly_tokens = workload["calls_per_day"] * 30 * (workload["avg_input_tokens"] + workload["avg_output_tokens"])
+    rows = eligible_rows(catalog, workload)
+
+    # Catalog rows are stored cheapest-first, so the table is already sorted by monthly_cost
+    if rows is None:
+        return [
+            {
+                "model_name": model_name,
+                "monthly_cost": round(monthly_tokens * price / 1000, 2),
+                "p90_latency_ms": latency_ms,
+                "context_window_tokens": context_window_tokens,
+            }
+            for model_name, price, latency_ms, context_window_tokens in zip(
+                catalog.model_names, catalog.prices, catalog.latencies, catalog.context_windows
+            )
+        ]
+    return [
+        {
+            "model_name": catalog.model_names[i],
+            "monthly_cost": round(monthly_tokens * catalog.prices[i] / 1000, 2),
+            "p90_latency_ms": catalog.latencies[i],
+            "context_window_tokens": catalog.context_windows[i],
+        }
+        for i in rows
+    ]
 
-    calls_per_day = workload["calls_per_day"]
-    avg_input_tokens = workload["avg_input_tokens"]
-    avg_output_tokens = workload["avg_output_tokens"]
+def current_model_row(workload: dict) -> dict | None:
+    """Cost-table row for workload["current_model"] from the full catalog, eligible or not; None if unknown."""
+    catalog = get_catalog()
+    i = catalog.index.get(workload.get("current_model") or "")
+    if i is None:
+        return None
+    monthly_tokens = workload["calls_per_day"] * 30 * (workload["avg_input_tokens"] + workload["avg_output_tokens"])
+    return {
+        "model_name": catalog.model_names[i],
+        "monthly_cost": round(monthly_tokens * catalog.prices[i] / 1000, 2),
+        "p90_latency_ms": catalog.latencies[i],
+        "context_window_tokens": catalog.context_windows[i],
+    }
 
-    results = []
-    for row in cost_catalog:
-        monthly_cost = (
-            calls_per_day * 30 * (avg_input_tokens + avg_output_tokens) * row["price_per_1k_tokens"] / 1000
+def eligible_rows(catalog: CatalogSnapshot, workload: dict) -> list[int] | None:
+    """Catalog rows allowed for the workload's region and compliance_constraints; None = every row."""
+    constraints = workload.get("compliance_constraints") or []
+    if isinstance(constraints, str):
+        constraints = [constraints]
+    mask = catalog.eligible_mask(workload.get("region"), constraints)
+    if mask == catalog.all_rows:
+        return None
+    if not mask:
+        raise InvalidInputError(
+            f"INVALID INPUT – no model in the catalog is available in region {workload.get('region')!r} "
+            f"with {', '.join(map(str, constraints)) or 'no'} compliance"
         )
-        results.append({
-            "model_name": row["model_name"],
-            "monthly_cost": round(monthly_cost, 2),
-            "p90_latency_ms": row["latency_ms"],
-            "context_window_tokens": row["context_window_tokens"],
-        })
-    results.sort(key=lambda x: x["monthly_cost"])
-    return results 
\ No newline at end of file
+    return catalog.subset(mask)
+
+def _as_workload_column(values, key: str) -> np.ndarray:
+    array = np.asarray(values)
+    if array.ndim != 1 or not np.issubdtype(array.dtype, np.integer) or array.size == 0 or (array < 1).any():
+        raise InvalidInputError(f"INVALID INPUT – missing or invalid {key}")
+    return array.astype(np.int64, copy=False)
+
+def _round_cents(values: np.ndarray) -> np.ndarray:
+    """Vectorized round(value, 2) for non-negative costs, matching Python's result exactly.
+
+    np.round scales by 100 before rounding, so a value within float error of a half-cent can
+    land on the wrong side of it. Those few values are re-decided by comparing the exact binary
+    value against the half-cent boundary in integer arithmetic. Exact ties (half-cent values
+    that are exactly representable, like 0.125) round half-even, as round() does.
+    """
+    whole = values * 100
+    offset = whole.copy()
+    np.rint(whole, out=whole)
+    offset -= whole
+    threshold = 0.5 - 16 * np.finfo(np.float64).eps * max(float(whole.max(initial=0.0)), 1.0)
+    near_half = np.flatnonzero((offset >= threshold) | (offset <= -threshold))
+
+    if near_half.size:
+        flat_whole = whole.reshape(-1)
+        near_values = values.reshape(-1)[near_half]
+        cents = flat_whole[near_half].astype(np.int64)
+        # Boundary between cents and its neighbour, as an odd multiple of 1/200
+        boundary = 2 * cents + np.where(offset.reshape(-1)[near_half] > 0, 1, -1)
+        mantissa, exponent = np.frexp(near_values)
+        integer_mantissa = np.ldexp(mantissa, 53).astype(np.int64)
+        shift = (53 - exponent).astype(np.int64)
+        exact = 200 * integer_mantissa
+        limit = np.left_shift(boundary, shift)
+        upper = (boundary + 1) // 2
+        round_up = (exact > limit) | ((exact == limit) & (upper % 2 == 0))
+        flat_whole[near_half] = np.where(round_up, upper, upper - 1)
+
+    return np.divide(whole, 100, out=whole)
+
+def run_batch(calls_per_day, avg_input_tokens, avg_output_tokens, catalog: CatalogSnapshot | None = None) -> dict:
+    """Cost every workload against every model in one vectorized pass.
+
+    Takes three equal-length integer arrays and returns a (workloads × models) monthly_cost
+    matrix using the same formula and 2-decimal rounding as run(). Columns follow the
+    catalog snapshot's cheapest-first order, the same order run() returns. Every model is
+    costed; callers filter per workload with eligible_rows() against the same snapshot, which
+    can be passed in as catalog (default: the current one).
+    """
+    calls = _as_workload_column(calls_per_day, "calls_per_day")
+    inputs = _as_workload_column(avg_input_tokens, "avg_input_tokens")
+    outputs = _as_workload_column(avg_output_tokens, "avg_output_tokens")
+    if not calls.shape == inputs.shape == outputs.shape:
+        raise InvalidInputError("INVALID INPUT – workload arrays must have the same length")
+
+    if catalog is None:
+        catalog = get_catalog()
+    # Same operation order as run(): integer volume first, then price, then / 1000
+    monthly_tokens = calls * 30 * (inputs + outputs)
+    monthly_cost = monthly_tokens[:, None] * catalog.price_per_1k_tokens[None, :]
+    monthly_cost /= 1000
+    monthly_cost = _round_cents(monthly_cost)
+
+    return {
+        "catalog_version": catalog.version,
+        "model_names": list(catalog.model_names),
+        "monthly_cost": monthly_cost,
+        "p90_latency_ms": catalog.latency_ms.copy(),
+        "context_window_tokens": catalog.context_window_tokens.copy(),
+    }
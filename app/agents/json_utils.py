@@ -0,0 +1,124 @@
+import json
+import logging
+import re
+from typing import Any
+from app import tracing
+
+logger = logging.getLogger(__name__)
+
+_OPENERS = {"{": "}", "[": "]"}
+_OPENER = re.compile(r"[\[{]")
+_STRUCTURAL = re.compile(r'[\[\]{}"]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_decoder = json.JSONDecoder()
+
+class JSONStreamExtractor:
+    """Find the first complete top-level JSON object or array in text that arrives in chunks.
+
+    Brackets are balanced incrementally (ignoring brackets inside JSON strings), so nested
+    objects are handled and each character is scanned once. A balanced span that doesn't parse,
+    like "[see above]" in prose, is skipped and scanning resumes just after its opening bracket.
+    feed() returns True as soon as the closing bracket of a valid value arrives; the value is
+    then in .value and later text, such as trailing commentary or a closing fence, is never needed.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.value: Any = None
+        self.complete = False
+        self._pos = 0
+        self._start = -1
+        self._stack: list[str] = []
+        self._in_string = False
+
+    def feed(self, chunk: str) -> bool:
+        if self.complete:
+            return True
+        self.buffer += chunk
+        buffer = self.buffer
+        # Jump between the characters that matter instead of stepping through every one in Python
+        while True:
+            if self._start < 0:
+                match = _OPENER.search(buffer, self._pos)
+                if match is None:
+                    self._pos = len(buffer)
+                    return False
+                self._start, self._pos = match.start(), match.end()
+                self._stack = [_OPENERS[match.group()]]
+            elif self._in_string:
+                match = _STRING_SPECIAL.search(buffer, self._pos)
+                if match is None:
+                    self._pos = len(buffer)
+                    return False
+                if match.group() == "\\":
+                    if match.end() == len(buffer):
+                        # Wait for the escaped character
+                        self._pos = match.start()
+                        return False
+                    self._pos = match.end() + 1
+                else:
+                    self._in_string = False
+                    self._pos = match.end()
+            else:
+                match = _STRUCTURAL.search(buffer, self._pos)
+                if match is None:
+                    self._pos = len(buffer)
+                    return False
+                char, self._pos = match.group(), match.end()
+                if char == '"':
+                    self._in_string = True
+                elif char in _OPENERS:
+                    self._stack.append(_OPENERS[char])
+                elif char != self._stack[-1]:
+                    self._restart()
+                else:
+                    self._stack.pop()
+                    if not self._stack and self._close():
+                        return True
+
+    def _close(self) -> bool:
+        candidate = self.buffer[self._start:self._pos]
+        try:
+            self.value = json.loads(candidate)
+        except json.JSONDecodeError:
+            self._restart()
+            return False
+        self.complete = True
+        return True
+
+    def _restart(self) -> None:
+        # Not JSON after all: look for a value starting after this opening bracket
+        self._pos = self._start + 1
+        self._start = -1
+        self._stack = []
+        self._in_string = False
+
+def extract_json_from_text(text: str) -> Any:
+    """Extract the first JSON object or array from text that might contain extra content."""
+    with tracing.span("parse_json", chars=len(text)):
+        try:
+            # Agents are prompted for bare JSON, so try that first
+            return json.loads(text.strip())
+        except json.JSONDecodeError:
+            pass
+        # The whole text is here, so let the C decoder try each opening bracket rather than
+        # balancing brackets in Python the way JSONStreamExtractor has to for partial text
+        match = _OPENER.search(text)
+        while match is not None:
+            try:
+                value, _ = _decoder.raw_decode(text, match.start())
+            except json.JSONDecodeError:
+                match = _OPENER.search(text, match.end())
+                continue
+            logger.info("Extracted JSON value from surrounding text")
+            return value
+        logger.error("No valid JSON found in text: '%s...'", text[:200])
+        raise json.JSONDecodeError("No valid JSON found in text", text, 0)
+
+def is_json_response(text: str) -> bool:
+    """True when extract_json_from_text can parse the response; used to decide what is worth caching."""
+    try:
+        extract_json_from_text(text)
+        return True
+    except json.JSONDecodeError:
+        return False
@@ -2,6 +2,8 @@ from typing import Any
 from app.agents.base import BaseAgent
 from app.agents.configs import MODEL_SCORER
 from app.adapters import openai_client
+from app.config import settings
+from app.agents.json_utils import JSONStreamExtractor, is_json_response
 
 class ModelScorerAgent(BaseAgent):
     def __init__(self):
@@ -10,12 +12,16 @@ class ModelScorerAgent(BaseAgent):
     async def run(self, message: Any) -> Any:
         prompt = f"{self.config['agent_role']}\n\n{self.config['agent_goal']}\n\n{self.config['agent_instructions']}\n\nUser message: {message}"
         
-        response = await openai_client.chat(
+        response = await openai_client.chat_until(
             prompt=prompt,
             model=self.config["model"],
             temperature=float(self.config["temperature"]),
             top_p=float(self.config["top_p"]),
-            timeout_s=30
+            timeout_s=settings.model_timeout_s,
+            cache_if=is_json_response,
+            # Return once the JSON is complete instead of waiting for any trailing text
+            stop_when=JSONStreamExtractor().feed,
+            agent="model_scorer"
         )
         
         return response 
\ No newline at end of file
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable
+from app import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+class Stage:
+    """One node of the pipeline graph.
+
+    run receives a dict with the outputs of every dependency (keyed by name) and returns
+    this stage's output. Dependencies may be other stages or plain inputs supplied to
+    Pipeline.run.
+
+    A stage that declares `reads` can be memoized: reads maps a dependency to the keys of its
+    (dict) output the stage actually uses, e.g. {"intake": ("calls_per_day",)}. Dependencies not
+    in reads contribute their own memo key, and version() (say, the catalog version) covers
+    state the stage reads from elsewhere.
+    """
+
+    def __init__(self, name: str, run: Callable[[dict], Awaitable[Any]], deps: Iterable[str] = (),
+                 reads: dict[str, Iterable[str]] | None = None, version: Callable[[], Any] | None = None):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.reads = {dep: tuple(fields) for dep, fields in reads.items()} if reads is not None else None
+        self.version = version
+
+_MISSING = object()
+
+class StageMemo:
+    """Outputs of memoizable stages keyed by exactly what they read, least recently used evicted first.
+
+    Memoized outputs are shared between runs, so stages must not mutate their inputs.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        value = self._entries.get(key, _MISSING)
+        if value is not _MISSING:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+class StageFailed(Exception):
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"{stage}: {error}")
+        self.stage = stage
+        self.error = error
+
+class PipelineResult:
+    def __init__(self):
+        self.outputs: dict[str, Any] = {}
+        self.timings_ms: dict[str, float] = {}
+        # Stages answered from the memo instead of running
+        self.reused: list[str] = []
+        self.memo_keys: dict[str, str] = {}
+        self.failed_stage: str | None = None
+        self.error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.failed_stage is None
+
+    def raise_for_failure(self) -> None:
+        if self.failed_stage is not None:
+            raise StageFailed(self.failed_stage, self.error)
+
+class Pipeline:
+    """Dependency-driven stage executor.
+
+    Every stage starts as soon as all of its dependencies are available, so independent
+    branches run concurrently. Outputs passed in as `cached` are treated as already
+    computed: their stages are skipped and nothing upstream of them runs, which is how a
+    run resumes from any node. Wall time is recorded per executed stage.
+
+    With a StageMemo, a stage that declares reads and whose inputs match an earlier run's
+    returns that output without running; since a memo key includes the keys of the stages it
+    depends on, everything downstream of a changed field still runs.
+    """
+
+    def __init__(self, stages: Iterable[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+
+    def _required(self, targets: Iterable[str], available: dict) -> set[str]:
+        required, pending = set(), list(targets)
+        while pending:
+            name = pending.pop()
+            if name in required or name in available:
+                continue
+            if name not in self.stages:
+                raise KeyError(f"pipeline input '{name}' was not provided")
+            required.add(name)
+            pending.extend(self.stages[name].deps)
+        return required
+
+    @staticmethod
+    def _memo_key(stage: Stage, outputs: dict, memo_keys: dict) -> str | None:
+        if stage.reads is None:
+            return None
+        parts = [stage.name, stage.version() if stage.version else None]
+        for dep in stage.deps:
+            if dep in stage.reads:
+                fields, value = stage.reads[dep], outputs[dep]
+                if not fields:
+                    # Only gates the stage, e.g. a precheck that either passed or failed the run
+                    continue
+                if not isinstance(value, dict):
+                    return None
+                parts.append([value.get(field) for field in fields])
+            elif dep in memo_keys:
+                parts.append(memo_keys[dep])
+            else:
+                # An input we can't fingerprint cheaply, e.g. a resumed stage's output
+                return None
+        return json.dumps(parts, default=str)
+
+    async def run(
+        self,
+        cached: dict | None = None,
+        targets: Iterable[str] | None = None,
+        on_stage_complete: Callable[[str, Any], Any] | None = None,
+        memo: StageMemo | None = None,
+    ) -> PipelineResult:
+        """Run the stages needed for `targets` (default: all) that `cached` doesn't already cover.
+
+        On the first stage failure the remaining stages are cancelled; the result keeps every
+        output produced so far and names the failed stage.
+        """
+        result = PipelineResult()
+        result.outputs.update(cached or {})
+        required = self._required(targets or self.stages, result.outputs)
+
+        running: dict[asyncio.Task, str] = {}
+        launched: dict[str, int] = {}
+        waiting = set(required)
+
+        async def execute(stage: Stage) -> Any:
+            key = self._memo_key(stage, result.outputs, result.memo_keys) if memo is not None else None
+            if key is not None:
+                result.memo_keys[stage.name] = key
+                output = memo.get(key)
+                metrics.STAGE_MEMO.inc(stage=stage.name, outcome="miss" if output is _MISSING else "hit")
+                if output is not _MISSING:
+                    result.reused.append(stage.name)
+                    return output
+            start = time.perf_counter()
+            try:
+                with tracing.span(f"stage:{stage.name}"):
+                    output = await stage.run({dep: result.outputs[dep] for dep in stage.deps})
+            finally:
+                elapsed = time.perf_counter() - start
+                result.timings_ms[stage.name] = round(elapsed * 1000, 3)
+                metrics.STAGE_DURATION.observe(elapsed, stage=stage.name)
+            if key is not None:
+                memo.put(key, output)
+            return output
+
+        def launch_ready() -> None:
+            for name in sorted(waiting):
+                stage = self.stages[name]
+                if all(dep in result.outputs for dep in stage.deps):
+                    waiting.discard(name)
+                    launched[name] = len(launched)
+                    running[asyncio.create_task(execute(stage))] = name
+
+        pipeline_span = tracing.span("pipeline", stages=sorted(required), cached=sorted(cached or {}))
+        # Entered before any task is created, so every stage task inherits it as parent
+        pipeline_span.__enter__()
+        launch_ready()
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                # Stages that finish together are handled in launch order, so callbacks are deterministic
+                for task in sorted(done, key=lambda task: launched[running[task]]):
+                    name = running.pop(task)
+                    if task.exception() is not None:
+                        result.failed_stage, result.error = name, task.exception()
+                        metrics.STAGE_FAILURES.inc(stage=name)
+                        logger.error("Pipeline stage %s failed: %s", name, result.error)
+                        return result
+                    result.outputs[name] = task.result()
+                    if on_stage_complete is not None:
+                        callback_result = on_stage_complete(name, result.outputs[name])
+                        if asyncio.iscoroutine(callback_result):
+                            await callback_result
+                launch_ready()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            if result.reused:
+                pipeline_span.set(reused=result.reused)
+            pipeline_span.__exit__(None, None, None)
+            logger.info("Pipeline stage timings (ms): %s", result.timings_ms)
+
+        return result
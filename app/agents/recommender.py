@@ -1,7 +1,41 @@
-from typing import Any
+import json
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncIterator
 from app.agents.base import BaseAgent
 from app.agents.configs import RECOMMENDATION_SYNTHESIZER
 from app.adapters import openai_client
+from app.adapters.resilience import LLMUnavailableError
+from app.config import settings
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+def render_recommendation(payload: dict) -> str:
+    """Deterministic stand-in for the Recommendation Synthesizer, following its agent_instructions."""
+    workload, ranked_models, roi = payload["workload"], payload["ranked_models"], payload["roi"]
+    best_model = roi["best_model"]
+    if workload.get("current_model"):
+        tldr = (f"Switch from {payload['current_model']} to {best_model}; save ₹{roi['savings_per_month']} / month "
+                f"(ROI {roi['roi_percent']}%, payback {roi['payback_weeks']} weeks).")
+    else:
+        best_cost = next((m["monthly_cost"] for m in ranked_models if m["model_name"] == best_model), 0)
+        tldr = f"Implement {best_model}; projected cost ₹{best_cost} / month for this workload."
+
+    lines = [tldr, "", "| model_name | monthly_cost | p90_latency_ms | composite_score |", "|---|---|---|---|"]
+    for model in ranked_models:
+        name = f"*{model['model_name']}*" if model["model_name"] == best_model else model["model_name"]
+        lines.append(f"| {name} | {model['monthly_cost']} | {model.get('p90_latency_ms', '')} | {model.get('composite_score', '')} |")
+
+    input_tokens, output_tokens = workload.get("avg_input_tokens", 0), workload.get("avg_output_tokens", 0)
+    driver = "input tokens" if input_tokens >= output_tokens else "output tokens"
+    lines += ["", f"- Cost driver: {driver} ({max(input_tokens, output_tokens)} of {input_tokens + output_tokens} tokens per call)"]
+    return "\n".join(lines)
+
+def _fallback(message: Any) -> str:
+    metrics.LLM_FALLBACKS.inc(agent="recommender")
+    logger.warning("Recommender LLM unavailable - using the deterministic recommendation")
+    return render_recommendation(json.loads(str(message)))
 
 class RecommenderAgent(BaseAgent):
     def __init__(self):
@@ -10,12 +44,39 @@ class RecommenderAgent(BaseAgent):
     async def run(self, message: Any) -> Any:
         prompt = f"{self.config['agent_role']}\n\n{self.config['agent_goal']}\n\n{self.config['agent_instructions']}\n\nUser message: {message}"
         
-        response = await openai_client.chat(
-            prompt=prompt,
-            model=self.config["model"],
-            temperature=float(self.config["temperature"]),
-            top_p=float(self.config["top_p"]),
-            timeout_s=30
-        )
+        try:
+            response = await openai_client.chat(
+                prompt=prompt,
+                model=self.config["model"],
+                temperature=float(self.config["temperature"]),
+                top_p=float(self.config["top_p"]),
+                timeout_s=settings.model_timeout_s,
+                agent="recommender"
+            )
+        except LLMUnavailableError:
+            return _fallback(message)
+        
+        return response
+    
+    async def stream(self, message: Any) -> AsyncIterator[str]:
+        """Yield the recommendation markdown as the model writes it."""
+        prompt = f"{self.config['agent_role']}\n\n{self.config['agent_goal']}\n\n{self.config['agent_instructions']}\n\nUser message: {message}"
         
-        return response 
\ No newline at end of file
+        started = False
+        try:
+            async with aclosing(openai_client.chat_stream(
+                prompt=prompt,
+                model=self.config["model"],
+                temperature=float(self.config["temperature"]),
+                top_p=float(self.config["top_p"]),
+                timeout_s=settings.model_timeout_s,
+                agent="recommender"
+            )) as deltas:
+                async for delta in deltas:
+                    started = True
+                    yield delta
+        except LLMUnavailableError:
+            # Raised while opening the stream; a half-written recommendation can't be swapped out
+            if started:
+                raise
+            yield _fallback(message)
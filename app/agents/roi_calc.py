@@ -1,10 +1,11 @@
 import logging
 from app.agents.base import InvalidInputError
+from app import logs
 
 logger = logging.getLogger(__name__)
 
 async def run(payload: dict) -> dict:
-    logger.info(f"ROI Calculator started with payload keys: {list(payload.keys())}")
+    logger.info("ROI Calculator started with payload keys: %s", list(payload.keys()))
     
     # Validate input
     if not isinstance(payload, dict):
@@ -15,8 +16,8 @@ async def run(payload: dict) -> dict:
     ranked_models = payload["ranked_models"]
     current_model = payload["current_model"]
     
-    logger.info(f"Input current_model: '{current_model}' (empty: {not current_model})")
-    logger.info(f"Ranked models count: {len(ranked_models)}")
+    logger.info("Input current_model: '%s' (empty: %s)", current_model, not current_model)
+    logger.info("Ranked models count: %s", len(ranked_models))
     
     if not isinstance(ranked_models, list) or not ranked_models:
         raise InvalidInputError("INVALID INPUT – ranked_models must be a non-empty list")
@@ -29,19 +30,19 @@ async def run(payload: dict) -> dict:
         most_expensive = max(ranked_models, key=lambda m: m.get("monthly_cost", 0))
         current_model = most_expensive.get("model_name", "baseline")
         current = most_expensive
-        logger.info(f"No current model specified, using most expensive as baseline: {current_model}")
+        logger.info("No current model specified, using most expensive as baseline: %s", current_model)
     else:
         # Find current_model in ranked_models
         current = next((m for m in ranked_models if m.get("model_name") == current_model), None)
         if not current:
             raise InvalidInputError("INVALID INPUT – current_model not in list")
-        logger.info(f"Found current model in ranked list: {current_model}")
+        logger.info("Found current model in ranked list: %s", current_model)
     
     best = ranked_models[0]  # First item is best (lowest cost)
     current_cost = current.get("monthly_cost")
     best_cost = best.get("monthly_cost")
     
-    logger.info(f"Current cost: {current_cost}, Best cost: {best_cost}")
+    logger.info("Current cost: %s, Best cost: %s", current_cost, best_cost)
     
     if current_cost is None or best_cost is None:
         raise InvalidInputError("INVALID INPUT – missing monthly_cost in models")
@@ -57,5 +58,5 @@ async def run(payload: dict) -> dict:
         "payback_weeks": payback_weeks,
     }
     
-    logger.info(f"ROI result: {result}")
+    logger.info("ROI result: %s", logs.payload(result))
     return result 
\ No newline at end of file
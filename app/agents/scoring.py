@@ -0,0 +1,108 @@
+import logging
+from bisect import bisect_left, bisect_right
+from app.agents.base import InvalidInputError
+
+logger = logging.getLogger(__name__)
+
+# Defaults mirror MODEL_SCORER["agent_instructions"]
+DEFAULT_COST_WEIGHT = 0.6
+DEFAULT_LATENCY_WEIGHT = 0.4
+DEFAULT_VIOLATION_PENALTY = 10.0
+
+async def run(
+    payload: dict,
+    cost_weight: float = DEFAULT_COST_WEIGHT,
+    latency_weight: float = DEFAULT_LATENCY_WEIGHT,
+    violation_penalty: float = DEFAULT_VIOLATION_PENALTY,
+) -> list[dict]:
+    """Rank every model in the cost table by composite score (lower = better)."""
+    # Validate input
+    if not isinstance(payload, dict):
+        raise InvalidInputError("INVALID INPUT – payload must be a dict")
+    for key in ("workload", "cost_table"):
+        if key not in payload:
+            raise InvalidInputError(f"INVALID INPUT – missing {key}")
+    workload = payload["workload"]
+    cost_table = payload["cost_table"]
+    if not isinstance(workload, dict):
+        raise InvalidInputError("INVALID INPUT – workload must be a dict")
+    for key in ("avg_input_tokens", "avg_output_tokens", "latency_sla_ms"):
+        value = workload.get(key)
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 1:
+            raise InvalidInputError(f"INVALID INPUT – missing {key}")
+    if not isinstance(cost_table, list) or not cost_table:
+        raise InvalidInputError("INVALID INPUT – cost_table must be a non-empty list")
+
+    latency_sla_ms = workload["latency_sla_ms"]
+    tokens_per_call = workload["avg_input_tokens"] + workload["avg_output_tokens"]
+
+    # Normalize against the cheapest non-zero cost so free/rounded-to-zero rows don't divide by zero
+    min_cost = min((row["monthly_cost"] for row in cost_table if row["monthly_cost"] > 0), default=1.0)
+
+    results = []
+    for row in cost_table:
+        context_adequate = row["context_window_tokens"] >= tokens_per_call
+        latency_adequate = row["p90_latency_ms"] <= latency_sla_ms
+
+        normalized_cost = row["monthly_cost"] / min_cost
+        normalized_latency = row["p90_latency_ms"] / latency_sla_ms
+        composite_score = cost_weight * normalized_cost + latency_weight * normalized_latency
+
+        constraint_violations = []
+        if not context_adequate:
+            constraint_violations.append("context_window_too_small")
+        if not latency_adequate:
+            constraint_violations.append("latency_too_high")
+        if constraint_violations:
+            composite_score += violation_penalty
+
+        results.append({
+            "model_name": row["model_name"],
+            "monthly_cost": row["monthly_cost"],
+            "p90_latency_ms": row["p90_latency_ms"],
+            "composite_score": round(composite_score, 4),
+            "context_adequate": context_adequate,
+            "latency_adequate": latency_adequate,
+            "suitable": not constraint_violations,
+            "constraint_violations": constraint_violations,
+        })
+
+    # Ties broken by cost then name so the ranking is stable across runs
+    results.sort(key=lambda x: (x["composite_score"], x["monthly_cost"], x["model_name"]))
+    logger.info("Scored %s models, best: %s", len(results), results[0]['model_name'])
+    return results
+
+def pareto_frontier(cost_table: list[dict]) -> list[dict]:
+    """Cost-table rows not dominated on (monthly_cost ↓, p90_latency_ms ↓, context_window_tokens ↑).
+
+    Sort-based sweep in O(n log n) comparisons: rows are visited cheapest-first, so anything that
+    could dominate a row has already been seen. The seen non-dominated rows are kept as a
+    staircase ordered by latency, on which context strictly increases; one bisect finds the
+    best context available at or below a row's latency. Identical rows don't dominate each
+    other. The frontier is returned cheapest-first.
+    """
+    ordered = sorted(
+        cost_table,
+        key=lambda row: (row["monthly_cost"], row["p90_latency_ms"], -row["context_window_tokens"]),
+    )
+    latencies, contexts, costs = [], [], []
+    frontier = []
+    for row in ordered:
+        cost, latency, context = row["monthly_cost"], row["p90_latency_ms"], row["context_window_tokens"]
+        i = bisect_right(latencies, latency) - 1
+        if i >= 0 and contexts[i] >= context:
+            if latencies[i] < latency or contexts[i] > context or costs[i] < cost:
+                continue
+            # Identical to a frontier row: keep it, the staircase already covers it
+            frontier.append(row)
+            continue
+
+        frontier.append(row)
+        start = bisect_left(latencies, latency)
+        end = start
+        while end < len(latencies) and contexts[end] <= context:
+            end += 1
+        latencies[start:end] = [latency]
+        contexts[start:end] = [context]
+        costs[start:end] = [cost]
+    return frontier
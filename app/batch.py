@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterable, AsyncIterator, Iterable
+from app.adapters import scheduler
+from app.agents import cost_engine
+from app.catalog import get_catalog
+from app.agents.base import InvalidInputError
+from app.agents.conductor import ANALYSIS_STAGES, EnterpriseAICostArchitect
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+WORKLOAD_KEYS = ["calls_per_day", "avg_input_tokens", "avg_output_tokens", "latency_sla_ms"]
+
+def _decode(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return InvalidInputError(f"INVALID INPUT – line is not valid JSON: {e}")
+
+async def parse_ndjson(chunks: AsyncIterable[bytes]) -> AsyncIterator[Any]:
+    """Yield one workload per non-blank line of an NDJSON byte stream, as the bytes arrive.
+
+    A line that isn't valid JSON is yielded as an InvalidInputError so it gets its own error
+    result instead of failing the batch.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _decode(line)
+    if buffer.strip():
+        yield _decode(buffer)
+
+async def iterate(items: Iterable[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+def _workload_error(item: Any) -> str | None:
+    if isinstance(item, Exception):
+        return str(item)
+    if not isinstance(item, dict):
+        return "INVALID INPUT – workload must be a JSON object"
+    for key in WORKLOAD_KEYS:
+        value = item.get(key)
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            return f"INVALID INPUT – missing or invalid {key}"
+    if not isinstance(item.get("current_model") or "", str):
+        return "INVALID INPUT – current_model must be a string"
+    return None
+
+def _error_line(index: int, item: Any, error: Any) -> dict:
+    return {
+        "index": index,
+        "id": item.get("id") if isinstance(item, dict) else None,
+        "status": "error",
+        "error": str(error),
+    }
+
+async def analyze(workloads: AsyncIterable[Any], include_recommendation: bool = False) -> AsyncIterator[dict]:
+    """Analyze a stream of workload JSONs, yielding one result per workload in completion order.
+
+    Workloads are read batch_chunk_size at a time and costed with one vectorized
+    cost_engine.run_batch call per chunk; scoring and ROI then run per workload on the
+    conductor's pipeline, resumed after the Cost Engine. LLM stages (the recommender, and the
+    scorer in "llm" mode) hold one of batch_llm_concurrency slots and queue in the LLM scheduler's
+    batch class, behind interactive and first-time analyses. Reading pauses while
+    batch_max_pending results are outstanding, so memory stays flat for any batch size.
+    Each result carries the workload's input index; a final line summarizes the batch.
+    """
+    conductor = EnterpriseAICostArchitect()
+    llm_slots = asyncio.Semaphore(settings.batch_llm_concurrency)
+    scorer_uses_llm = settings.model_scorer_mode == "llm"
+    pending: set[asyncio.Task] = set()
+    totals = {"total": 0, "succeeded": 0, "failed": 0}
+
+    async def process(index: int, workload: dict, cost_table: list) -> dict:
+        # Runs in its own task, so the batch class applies to this workload's LLM calls only
+        with scheduler.priority(scheduler.BATCH):
+            return await analyze_one(index, workload, cost_table)
+
+    async def analyze_one(index: int, workload: dict, cost_table: list) -> dict:
+        cached = {
+            "message": None,
+            "solution_architect": None,
+            "workload_json": workload,
+            "precheck": True,
+            "intake": {**workload, "current_model": workload.get("current_model") or ""},
+            "cost_engine": cost_table,
+        }
+        if scorer_uses_llm:
+            async with llm_slots:
+                result = await conductor.pipeline.run(cached, targets=ANALYSIS_STAGES)
+        else:
+            result = await conductor.pipeline.run(cached, targets=ANALYSIS_STAGES)
+
+        if result.ok and include_recommendation:
+            async with llm_slots:
+                result = await conductor.pipeline.run(result.outputs, targets=["recommender"])
+        if not result.ok:
+            return _error_line(index, workload, result.error)
+
+        line = {
+            "index": index,
+            "id": workload.get("id"),
+            "status": "ok",
+            "ranked_models": result.outputs["model_scorer"],
+            "pareto_frontier": result.outputs["pareto_frontier"],
+            "roi_analysis": result.outputs["roi_calc"],
+        }
+        if include_recommendation:
+            line["final_recommendation"] = result.outputs["recommender"]
+        return line
+
+    def start_chunk(chunk: list) -> list[dict]:
+        """Cost the chunk's valid workloads in one pass and schedule the rest of their stages."""
+        errors, valid = [], []
+        for index, item in chunk:
+            error = _workload_error(item)
+            if error:
+                errors.append(_error_line(index, item, error))
+            else:
+                valid.append((index, item))
+        if not valid:
+            return errors
+
+        catalog = get_catalog()
+        try:
+            costs = cost_engine.run_batch(
+                [workload["calls_per_day"] for _, workload in valid],
+                [workload["avg_input_tokens"] for _, workload in valid],
+                [workload["avg_output_tokens"] for _, workload in valid],
+                catalog=catalog,
+            )
+        except InvalidInputError as e:
+            return errors + [_error_line(index, workload, e) for index, workload in valid]
+
+        model_names = costs["model_names"]
+        latencies = costs["p90_latency_ms"].tolist()
+        context_windows = costs["context_window_tokens"].tolist()
+        for (index, workload), monthly_costs in zip(valid, costs["monthly_cost"].tolist()):
+            try:
+                rows = cost_engine.eligible_rows(catalog, workload)
+            except InvalidInputError as e:
+                errors.append(_error_line(index, workload, e))
+                continue
+            cost_table = [
+                {
+                    "model_name": model_name,
+                    "monthly_cost": monthly_cost,
+                    "p90_latency_ms": latency_ms,
+                    "context_window_tokens": context_window_tokens,
+                }
+                for model_name, monthly_cost, latency_ms, context_window_tokens in zip(
+                    model_names, monthly_costs, latencies, context_windows
+                )
+            ]
+            if rows is not None:
+                cost_table = [cost_table[i] for i in rows]
+            pending.add(asyncio.create_task(process(index, workload, cost_table)))
+        return errors
+
+    def count(line: dict) -> dict:
+        totals["total"] += 1
+        totals["succeeded" if line["status"] == "ok" else "failed"] += 1
+        return line
+
+    chunk: list = []
+    index = 0
+    try:
+        async for item in workloads:
+            chunk.append((index, item))
+            index += 1
+            if len(chunk) < settings.batch_chunk_size:
+                continue
+            for line in start_chunk(chunk):
+                yield count(line)
+            chunk = []
+
+            # Emit whatever has finished; only block once too many results are outstanding
+            while pending:
+                done = {task for task in pending if task.done()}
+                if not done:
+                    if len(pending) < settings.batch_max_pending:
+                        break
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending.difference_update(done)
+                for task in done:
+                    yield count(task.result())
+
+        for line in start_chunk(chunk):
+            yield count(line)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield count(task.result())
+    finally:
+        # The client may disconnect mid-batch
+        for task in pending:
+            task.cancel()
+
+    logger.info("Batch analysis complete: %s", totals)
+    yield {"status": "done", **totals}
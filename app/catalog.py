@@ -0,0 +1,208 @@
+import csv
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = Path(__file__).resolve().parent.parent / "cost_catalog.csv"
+REQUIRED_COLUMNS = ("model_name", "price_per_1k_tokens", "latency_ms", "context_window_tokens")
+
+# Optional columns, ";"-separated. A row with no regions is served everywhere (GLOBAL).
+GLOBAL_REGION = "GLOBAL"
+REGION_ALIASES = {
+    "USA": "US", "UNITED STATES": "US", "NORTH AMERICA": "US",
+    "EUROPE": "EU", "EUROPEAN UNION": "EU",
+    "ASIA": "APAC", "ASIA PACIFIC": "APAC", "AP": "APAC",
+}
+
+def normalize_region(region: str) -> str:
+    key = " ".join(str(region).upper().replace("_", " ").split())
+    return REGION_ALIASES.get(key, key)
+
+def normalize_certification(certification: str) -> str:
+    """'SOC 2', 'soc-2' and 'SOC2' are the same certification."""
+    return "".join(ch for ch in str(certification).upper() if ch.isalnum())
+
+def _split_list(value: str | None) -> list[str]:
+    return [item.strip() for item in (value or "").split(";") if item.strip()]
+
+class CatalogError(Exception):
+    pass
+
+class CatalogSnapshot:
+    """Immutable, column-oriented view of one version of cost_catalog.csv.
+
+    Rows are stored cheapest-first (stable on file order for equal prices), so every
+    workload's cost table comes out already sorted by monthly_cost.
+    """
+
+    def __init__(self, version: str, rows: list[dict], file_signature: tuple = ()):
+        self.version = version
+        self.file_signature = file_signature
+        ordered = sorted(rows, key=lambda row: row["price_per_1k_tokens"])
+        self.model_names = [row["model_name"] for row in ordered]
+        self.index = {name: i for i, name in enumerate(self.model_names)}
+        self.price_per_1k_tokens = np.array([row["price_per_1k_tokens"] for row in ordered], dtype=np.float64)
+        self.latency_ms = np.array([row["latency_ms"] for row in ordered], dtype=np.int64)
+        self.context_window_tokens = np.array([row["context_window_tokens"] for row in ordered], dtype=np.int64)
+        # Plain-Python copies for the per-request path, where numpy scalars would only add overhead
+        self.prices = self.price_per_1k_tokens.tolist()
+        self.latencies = self.latency_ms.tolist()
+        self.context_windows = self.context_window_tokens.tolist()
+        self.regions = [row.get("regions") or [GLOBAL_REGION] for row in ordered]
+        self.certifications = [row.get("certifications") or [] for row in ordered]
+
+        # Inverted indexes: attribute value -> bitset of row positions (bit i = row i)
+        self.all_rows = (1 << len(ordered)) - 1
+        self.region_bits: dict[str, int] = {}
+        self.certification_bits: dict[str, int] = {}
+        for i, (regions, certifications) in enumerate(zip(self.regions, self.certifications)):
+            for region in regions:
+                self.region_bits[region] = self.region_bits.get(region, 0) | (1 << i)
+            for certification in certifications:
+                self.certification_bits[certification] = self.certification_bits.get(certification, 0) | (1 << i)
+        self._global_rows = self.region_bits.get(GLOBAL_REGION, 0)
+        self._subsets: dict[int, list[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.model_names)
+
+    def eligible_mask(self, region: str | None = None, certifications: list[str] | None = None) -> int:
+        """Bitset of rows served in region and holding every certification.
+
+        One AND per attribute. A missing or GLOBAL region applies no region filter; a region no row
+        declares leaves only the rows served everywhere. A certification no row declares leaves no
+        rows at all, so a compliance requirement is never silently dropped. Only a catalog with no
+        certifications column data can't enforce them: they are then ignored, with a warning.
+        """
+        mask = self.all_rows
+        if region:
+            key = normalize_region(region)
+            if key not in self.region_bits:
+                # Cloud region names like "eu-west-1" fall back to their prefix
+                key = normalize_region(str(region).split("-")[0])
+            if key != GLOBAL_REGION:
+                mask &= self.region_bits.get(key, 0) | self._global_rows
+        if certifications and not self.certification_bits:
+            logger.warning("Catalog %s declares no certifications; ignoring required %s", self.version, certifications)
+            return mask
+        for certification in certifications or []:
+            mask &= self.certification_bits.get(normalize_certification(certification), 0)
+        return mask
+
+    def subset(self, mask: int) -> list[int]:
+        """Row positions set in mask, cheapest-first; memoized per distinct mask."""
+        rows = self._subsets.get(mask)
+        if rows is None:
+            rows = [i for i in range(len(self.model_names)) if mask >> i & 1]
+            if len(self._subsets) < 1024:
+                self._subsets[mask] = rows
+        return rows
+
+    def row(self, model_name: str) -> dict:
+        i = self.index[model_name]
+        return {
+            "model_name": model_name,
+            "price_per_1k_tokens": self.prices[i],
+            "latency_ms": self.latencies[i],
+            "context_window_tokens": self.context_windows[i],
+        }
+
+def parse_catalog(text: str) -> list[dict]:
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise CatalogError(f"cost catalog missing columns: {', '.join(missing)}")
+
+    rows, seen = [], set()
+    for line_no, raw in enumerate(reader, start=2):
+        try:
+            row = {
+                "model_name": raw["model_name"].strip(),
+                "price_per_1k_tokens": float(raw["price_per_1k_tokens"]),
+                "latency_ms": int(raw["latency_ms"]),
+                "context_window_tokens": int(raw["context_window_tokens"]),
+                "regions": [normalize_region(region) for region in _split_list(raw.get("regions"))],
+                "certifications": [normalize_certification(cert) for cert in _split_list(raw.get("certifications"))],
+            }
+        except (TypeError, ValueError) as e:
+            raise CatalogError(f"cost catalog line {line_no}: {e}")
+        if not row["model_name"] or row["model_name"] in seen:
+            raise CatalogError(f"cost catalog line {line_no}: empty or duplicate model_name")
+        seen.add(row["model_name"])
+        rows.append(row)
+
+    if not rows:
+        raise CatalogError("cost catalog is empty")
+    return rows
+
+class CatalogStore:
+    """Holds the current CatalogSnapshot and swaps in a new one when the file's mtime changes."""
+
+    def __init__(self, path: str | os.PathLike, check_interval_s: float = 1.0):
+        self.path = Path(path)
+        self.check_interval_s = check_interval_s
+        self._snapshot: CatalogSnapshot | None = None
+        self._loads = 0
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _signature(self) -> tuple:
+        stat = self.path.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self) -> CatalogSnapshot:
+        signature = self._signature()
+        data = self.path.read_bytes()
+        rows = parse_catalog(data.decode("utf-8-sig"))
+        self._loads += 1
+        version = f"v{self._loads}-{hashlib.sha256(data).hexdigest()[:8]}"
+        logger.info("Cost catalog loaded from %s: %s models, version %s", self.path, len(rows), version)
+        return CatalogSnapshot(version, rows, signature)
+
+    def get(self) -> CatalogSnapshot:
+        """Current snapshot; stats the file at most once per check_interval_s."""
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now < self._next_check:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._load()
+            elif now >= self._next_check:
+                try:
+                    if self._signature() != self._snapshot.file_signature:
+                        self._snapshot = self._load()
+                except (OSError, CatalogError) as e:
+                    # Keep serving the last good snapshot while the file is mid-write or broken
+                    logger.error("Cost catalog reload failed, keeping %s: %s", self._snapshot.version, e)
+            self._next_check = now + self.check_interval_s
+            return self._snapshot
+
+    def reload(self) -> CatalogSnapshot:
+        with self._lock:
+            self._snapshot = self._load()
+            self._next_check = time.monotonic() + self.check_interval_s
+            return self._snapshot
+
+_store: CatalogStore | None = None
+
+def get_store() -> CatalogStore:
+    global _store
+    if _store is None:
+        _store = CatalogStore(
+            settings.cost_catalog_path or DEFAULT_CATALOG_PATH,
+            check_interval_s=settings.cost_catalog_check_interval_s,
+        )
+    return _store
+
+def get_catalog() -> CatalogSnapshot:
+    return get_store().get()
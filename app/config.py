@@ -3,8 +3,94 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     openai_api_key: str
     model_timeout_s: int = 30
-    
+    # Point the shared client at another OpenAI-compatible server, e.g. loadtest/fake_openai.py ("" = api.openai.com)
+    openai_base_url: str = ""
+
+    # Shared OpenAI client connection pool
+    openai_max_connections: int = 20
+    openai_max_keepalive_connections: int = 10
+    openai_keepalive_expiry_s: float = 30.0
+    openai_max_in_flight: int = 16
+
+    # LLM scheduler: requests wait per priority class (interactive > analysis > batch) for an in-flight slot
+    # and their model's requests / tokens per minute budget (keyed by model, "*" = any other; absent = unlimited)
+    llm_rpm_limits: dict[str, float] = {}
+    llm_tpm_limits: dict[str, float] = {}
+    # Completion tokens charged up front per request; the TPM bucket is corrected once usage comes back
+    llm_completion_tokens_estimate: int = 512
+    # Per class: requests beyond max_depth are rejected, and a request that can't start within max_wait_s is dropped
+    llm_queue_max_depth: dict[str, int] = {"interactive": 64, "analysis": 256, "batch": 1024}
+    llm_queue_max_wait_s: dict[str, float] = {"interactive": 5.0, "analysis": 30.0, "batch": 300.0}
+
+    # JSON-producing agents stream their completion and move on once the first JSON value is complete
+    llm_stream_json_enabled: bool = True
+
+    # Transient LLM errors (timeouts, 429, 5xx) are retried with full-jitter exponential backoff
+    llm_max_retries: int = 2
+    llm_retry_base_delay_s: float = 0.25
+    llm_retry_max_delay_s: float = 4.0
+    # Per-model circuit breaker: open after this many consecutive transient failures, probe again after reset_s
+    llm_breaker_failure_threshold: int = 5
+    llm_breaker_reset_s: float = 30.0
+
+    # Hedged LLM calls: duplicate a chat() call still running past the agent's recent llm_hedge_percentile latency
+    llm_hedging_enabled: bool = False
+    llm_hedge_percentile: float = 95.0
+    llm_hedge_min_samples: int = 20
+    llm_hedge_window: int = 200
+    llm_hedge_min_delay_ms: float = 50.0
+    # Hedges are capped at this fraction of chat() calls, plus a small burst
+    llm_hedge_budget_ratio: float = 0.05
+    llm_hedge_budget_burst: float = 2.0
+
+    # LLM response cache: in-memory LRU plus a SQLite file shared by workers ("" = memory only)
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 1024
+    llm_cache_ttl_s: int = 86400
+    llm_cache_db_path: str = ".cache/llm_cache.sqlite3"
+    llm_cache_disabled_agents: list[str] = []
+
+    # cost_catalog.csv location ("" = repo/image root) and how often to stat it for changes
+    cost_catalog_path: str = ""
+    cost_catalog_check_interval_s: float = 1.0
+
+    # Model Scorer: "native" computes the ranking in-process, "llm" asks MODEL_SCORER["model"]
+    model_scorer_mode: str = "native"
+    scorer_cost_weight: float = 0.6
+    scorer_latency_weight: float = 0.4
+    scorer_violation_penalty: float = 10.0
+
+    # Concurrent identical /v1/chat and /v1/chat/interactive requests share one pipeline run
+    singleflight_enabled: bool = True
+
+    # /v1/batch: workloads costed per vectorized chunk, LLM stages bounded, results buffered at most batch_max_pending
+    batch_chunk_size: int = 256
+    batch_llm_concurrency: int = 4
+    batch_max_pending: int = 1024
+
+    # Interactive sessions: updates send session_id + changed fields; idle sessions expire, LRU beyond max_entries
+    session_max_entries: int = 10_000
+    session_ttl_s: float = 1800.0
+    # Memoized stage outputs kept per session, keyed by the workload fields each stage reads
+    stage_memo_max_entries: int = 32
+    # Responses kept per session as bases for JSON Patch updates (a client one or two ticks behind still gets a patch)
+    session_max_snapshots: int = 4
+
+    # Append every request's span timeline to this JSONL file ("" = only trace requests sending X-Debug-Trace)
+    trace_file_path: str = ""
+
+    # Logging: records go through a bounded queue to a background writer thread; a full queue drops records
+    log_level: str = "INFO"
+    log_queue_size: int = 10_000
+    # Fraction of requests logged below WARNING; X-Log-Level: debug raises one request's verbosity
+    log_sample_rate: float = 1.0
+    log_verbosity_header_enabled: bool = True
+    # Payloads logged through logs.payload() are cut to this many chars / list items; any message to log_max_message_chars
+    log_payload_max_chars: int = 500
+    log_payload_max_items: int = 5
+    log_max_message_chars: int = 4_000
+
     class Config:
         env_file = ".env"
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings()
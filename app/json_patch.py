@@ -0,0 +1,70 @@
+import copy
+from typing import Any
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+def diff(old: Any, new: Any, path: str = "") -> list[dict]:
+    """RFC 6902 operations that turn `old` into `new` (JSON-compatible values).
+
+    Objects are compared key by key and lists index by index, so a slider tick that changes a few
+    numbers yields a few replace ops. Elements added or removed at the end of a list become add /
+    remove ops; a list that changed everywhere is simply replaced by many ops, never diffed by content.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(diff(old[key], value, child))
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        ops = []
+        for i in range(min(len(old), len(new))):
+            ops.extend(diff(old[i], new[i], f"{path}/{i}"))
+        for value in new[len(old):]:
+            ops.append({"op": "add", "path": f"{path}/-", "value": value})
+        # Remove from the end so earlier indexes stay valid
+        for i in range(len(old) - 1, len(new) - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+        return ops
+    if old == new and type(old) is type(new):
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+def apply(document: Any, patch: list[dict]) -> Any:
+    """Apply add / remove / replace operations (what diff() emits) to a copy of `document`."""
+    document = copy.deepcopy(document)
+    for op in patch:
+        if op["path"] == "":
+            document = copy.deepcopy(op["value"])
+            continue
+        *parents, last = [_unescape(token) for token in op["path"].split("/")[1:]]
+        target = document
+        for token in parents:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        if isinstance(target, list):
+            if op["op"] == "add":
+                value = copy.deepcopy(op["value"])
+                target.append(value) if last == "-" else target.insert(int(last), value)
+            elif op["op"] == "remove":
+                del target[int(last)]
+            elif op["op"] == "replace":
+                target[int(last)] = copy.deepcopy(op["value"])
+            else:
+                raise ValueError(f"unsupported JSON Patch op {op['op']!r}")
+        elif op["op"] == "remove":
+            del target[last]
+        elif op["op"] in ("add", "replace"):
+            target[last] = copy.deepcopy(op["value"])
+        else:
+            raise ValueError(f"unsupported JSON Patch op {op['op']!r}")
+    return document
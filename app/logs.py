@@ -0,0 +1,204 @@
+import atexit
+import json
+import logging
+import queue
+import random
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+from app.config import settings
+from app import metrics
+
+FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Requests carrying this header are logged at the given level (debug, info, ...), unsampled
+VERBOSITY_HEADER = "x-log-level"
+
+# Minimum level for records logged while serving the current request (None = outside a request)
+_request_level: ContextVar[int | None] = ContextVar("log_request_level", default=None)
+_listener: QueueListener | None = None
+# Files written by their own listener thread (see file_writer), keyed by path
+_writers: dict[str, tuple[logging.Logger, QueueListener]] = {}
+_stats = {"dropped": 0}
+
+class Payload:
+    """Log argument that serializes and truncates its value only if the record is actually emitted.
+
+    `logger.debug("Scorer input: %s", logs.payload(table))` costs nothing when the record is filtered.
+    Long lists keep their first few items; the text is cut at LOG_PAYLOAD_MAX_CHARS.
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value: Any, limit: int | None = None):
+        self.value = value
+        self.limit = limit or settings.log_payload_max_chars
+
+    def __str__(self) -> str:
+        value = self.value
+        suffix = ""
+        if isinstance(value, (list, tuple)) and len(value) > settings.log_payload_max_items:
+            suffix = f" ... ({len(value) - settings.log_payload_max_items} more items)"
+            value = value[:settings.log_payload_max_items]
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        if len(text) > self.limit:
+            return f"{text[:self.limit]}... ({len(text) - self.limit} more chars){suffix}"
+        return text + suffix
+
+def payload(value: Any, limit: int | None = None) -> Payload:
+    return Payload(value, limit)
+
+class RequestLevelFilter(logging.Filter):
+    """Drop records below the current request's level, or below the base level outside requests."""
+
+    def __init__(self, base_level: int):
+        super().__init__()
+        self.base_level = base_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        level = _request_level.get()
+        return record.levelno >= (self.base_level if level is None else level)
+
+def _is_app_logger(name: str) -> bool:
+    return name == "app" or name.startswith("app.")
+
+class RequestLevelLogger(logging.Logger):
+    """For app.* loggers, answers isEnabledFor from the current request's level.
+
+    One request can then log at DEBUG while the loggers stay at LOG_LEVEL, so a debug() call in
+    any other request is dropped after a ContextVar lookup, before a LogRecord is built.
+    """
+
+    def __init__(self, name: str, level: int = logging.NOTSET):
+        super().__init__(name, level)
+        self.per_request = _is_app_logger(name)
+
+    def isEnabledFor(self, level: int) -> bool:
+        request_level = _request_level.get()
+        if request_level is None or not self.per_request or self.disabled or self.manager.disable >= level:
+            return super().isEnabledFor(level)
+        return level >= request_level
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks the event loop: a full queue drops the record and counts it."""
+
+    def __init__(self, queue, truncate: bool = True):
+        super().__init__(queue)
+        self.truncate = truncate
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        limit = settings.log_max_message_chars if self.truncate else 0
+        if limit and len(record.msg) > limit:
+            record.msg = record.message = f"{record.msg[:limit]}... ({len(record.msg) - limit} more chars)"
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _stats["dropped"] += 1
+            metrics.LOG_DROPPED.inc()
+
+def setup() -> None:
+    """Route all logging through a bounded queue drained by a background thread.
+
+    Records are filtered and formatted on the calling side (only if they pass), and written to
+    stderr by the listener thread, so slow terminals or pipes never stall a request.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    base_level = logging.getLevelName(settings.log_level.upper())
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(FORMAT))
+    handler = _DroppingQueueHandler(queue.Queue(settings.log_queue_size))
+    handler.addFilter(RequestLevelFilter(base_level))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(base_level)
+    logging.getLogger("app").setLevel(base_level)
+    # Module loggers already exist (created at import); later ones are made request-aware too
+    logging.setLoggerClass(RequestLevelLogger)
+    for name, existing in logging.Logger.manager.loggerDict.items():
+        if _is_app_logger(name) and type(existing) is logging.Logger:
+            existing.__class__ = RequestLevelLogger
+            existing.per_request = True
+
+    _listener = QueueListener(handler.queue, stream)
+    _listener.start()
+    atexit.register(shutdown)
+
+def shutdown() -> None:
+    """Flush queued records and stop the listener threads."""
+    global _listener
+    close_writers()
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def file_writer(path: str) -> logging.Logger:
+    """Logger whose messages are appended to `path`, one per line, by a background thread.
+
+    It doesn't propagate, so request levels, sampling and the message cut don't apply. Like the
+    log queue, a full queue drops records instead of blocking the caller on disk I/O.
+    """
+    writer = _writers.get(path)
+    if writer is None:
+        handler = _DroppingQueueHandler(queue.Queue(settings.log_queue_size), truncate=False)
+        file_handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        listener = QueueListener(handler.queue, file_handler)
+        listener.start()
+        logger = logging.getLogger(f"cost_architect.file_writer.{path}")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.handlers = [handler]
+        writer = _writers[path] = (logger, listener)
+    return writer[0]
+
+def close_writers() -> None:
+    """Write out everything queued for file_writer() loggers and close their files."""
+    for logger, listener in _writers.values():
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        logger.handlers = []
+    _writers.clear()
+
+def get_stats() -> dict:
+    return {"running": _listener is not None, "queued": _listener.queue.qsize() if _listener else 0, **_stats}
+
+def _parse_level(value: bytes) -> int | None:
+    level = logging.getLevelName(value.decode("latin-1").strip().upper())
+    return level if isinstance(level, int) else None
+
+class LogContextMiddleware:
+    """ASGI middleware: picks the log level for each request.
+
+    A request sending `X-Log-Level: debug` (when LOG_VERBOSITY_HEADER_ENABLED) is logged at that
+    level. Otherwise only LOG_SAMPLE_RATE of requests log below WARNING; the rest keep their
+    warnings and errors only.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        level = None
+        if settings.log_verbosity_header_enabled:
+            header = dict(scope.get("headers") or []).get(VERBOSITY_HEADER.encode())
+            level = _parse_level(header) if header else None
+        if level is None:
+            base_level = logging.getLevelName(settings.log_level.upper())
+            level = base_level if random.random() < settings.log_sample_rate else max(base_level, logging.WARNING)
+        token = _request_level.set(level)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_level.reset(token)
@@ -1,25 +1,40 @@
+import json
 import logging
-from fastapi import FastAPI
+import uuid
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.schemas import ChatRequest, ChatResponse, InteractiveRequest, InteractiveResponse, StructuredResponse
+from pydantic import ValidationError
+from app.responses import ModelJSONResponse
+from app.schemas import ChatRequest, ChatResponse, InteractiveRequest, InteractiveResponse, StructuredResponse, RecommendationResponse, BatchRequest
 from app.agents.conductor import EnterpriseAICostArchitect, generate_helpful_guidance, generate_service_introduction
+from app.adapters import hedging, openai_client, llm_cache, resilience, scheduler
+from app import batch, catalog, json_patch, logs, metrics, recommendations, sessions, singleflight, tracing
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-    ]
-)
-
-# Set specific loggers to DEBUG for detailed debugging
-logging.getLogger('app.agents.conductor').setLevel(logging.DEBUG)
-logging.getLogger('app.adapters.openai_client').setLevel(logging.DEBUG)
+# Configure logging: a queue drained by a background thread, LOG_LEVEL by default, X-Log-Level per request
+logs.setup()
 
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Cost Architect API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the cost catalog and open shared clients on startup; close them on shutdown."""
+    catalog.get_catalog()
+    openai_client.init_client()
+    llm_cache.init_cache()
+    yield
+    recommendations.get_store().cancel_all()
+    await openai_client.close_client()
+    llm_cache.close_cache()
+    # Flushes the trace file
+    logs.close_writers()
+
+app = FastAPI(title="Cost Architect API", version="1.0.0", lifespan=lifespan)
+
+app.add_middleware(tracing.TracingMiddleware)
+app.add_middleware(logs.LogContextMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Add CORS middleware to allow requests from browser/HTML demo
 app.add_middleware(
@@ -30,17 +45,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _with_trace(response) -> ModelJSONResponse:
+    """Attach the span timeline when the client sent X-Debug-Trace, and render the model with orjson."""
+    response.trace = tracing.timeline()
+    return ModelJSONResponse(response)
+
 @app.post("/v1/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest) -> ChatResponse:
     """Process chat messages through the Enterprise AI Cost Architect workflow."""
-    logger.info(f"Received chat request with {len(request.messages)} messages")
+    logger.info("Received chat request with %s messages", len(request.messages))
     
     conductor = EnterpriseAICostArchitect()
     
     # Extract the latest message content to pass to the conductor
     if request.messages:
         latest_message = request.messages[-1].content
-        logger.info(f"Latest message: {latest_message[:100]}...")
+        logger.info("Latest message: %s", logs.payload(latest_message, 100))
     else:
         latest_message = ""
         logger.warning("No messages in request")
@@ -48,16 +68,17 @@ async def chat(request: ChatRequest) -> ChatResponse:
     # Run the conductor workflow
     try:
         result = await conductor.run(latest_message)
-        logger.info(f"Conductor completed successfully")
-        return ChatResponse(answer=result)
+        logger.info("Conductor completed successfully")
+        return _with_trace(ChatResponse(answer=result))
     except Exception as e:
-        logger.error(f"Conductor failed with exception: {e}")
-        return ChatResponse(answer=generate_helpful_guidance())
+        metrics.ENDPOINT_ERRORS.inc(endpoint="chat")
+        logger.error("Conductor failed with exception: %s", e)
+        return _with_trace(ChatResponse(answer=generate_helpful_guidance()))
 
 @app.post("/v1/chat/interactive", response_model=InteractiveResponse)
 async def interactive_chat(request: InteractiveRequest) -> InteractiveResponse:
     """Interactive chat that returns structured data for UI sliders and parameter modification."""
-    logger.info(f"Received interactive request")
+    logger.info("Received interactive request")
     
     conductor = EnterpriseAICostArchitect()
     
@@ -65,63 +86,213 @@ async def interactive_chat(request: InteractiveRequest) -> InteractiveResponse:
         # Handle initial message (like regular chat)
         if request.messages:
             latest_message = request.messages[-1].content
-            logger.info(f"Processing initial message: {latest_message[:100]}...")
+            logger.info("Processing initial message: %s", logs.payload(latest_message, 100))
             
             # Check if it's a greeting first
             if latest_message and any(greeting in latest_message.lower() for greeting in ["hi", "hello", "hey", "what"]):
-                return InteractiveResponse(simple_answer=generate_service_introduction())
+                return _with_trace(InteractiveResponse(simple_answer=generate_service_introduction()))
             
             # Run full workflow and return structured data
             structured_data = await conductor.run_interactive(message=latest_message)
-            return InteractiveResponse(structured_data=structured_data)
+            return _with_trace(_interactive_response(structured_data))
         
         # Handle modified workload parameters
-        elif request.modified_workload and request.original_data:
-            logger.info(f"Processing modified workload parameters")
-            modified_workload_dict = request.modified_workload.dict()
-            
-            # Restart workflow with modified parameters
-            structured_data = await conductor.run_interactive(
-                modified_workload=modified_workload_dict,
-                original_data=request.original_data
-            )
-            return InteractiveResponse(structured_data=structured_data)
+        elif request.session_id or (request.modified_workload and request.original_data):
+            logger.info("Processing modified workload parameters")
+            structured_data = await _run_update(conductor, request)
+            return _with_trace(_interactive_response(structured_data, request.base_revision))
         
         else:
-            return InteractiveResponse(simple_answer=generate_helpful_guidance())
+            return _with_trace(InteractiveResponse(simple_answer=generate_helpful_guidance()))
     
+    except sessions.SessionNotFoundError as e:
+        raise _session_not_found(e)
     except Exception as e:
         # Special handling for greeting detection
         if "GREETING_DETECTED" in str(e):
-            return InteractiveResponse(simple_answer=generate_service_introduction())
+            return _with_trace(InteractiveResponse(simple_answer=generate_service_introduction()))
         
-        logger.error(f"Interactive conductor failed: {e}")
-        return InteractiveResponse(simple_answer=generate_helpful_guidance())
+        metrics.ENDPOINT_ERRORS.inc(endpoint="interactive")
+        logger.error("Interactive conductor failed: %s", e)
+        return _with_trace(InteractiveResponse(simple_answer=generate_helpful_guidance()))
+
+@app.post("/v1/chat/interactive/stream")
+async def interactive_chat_stream(request: InteractiveRequest) -> StreamingResponse:
+    """Server-Sent Events variant of /v1/chat/interactive: one event per stage as it completes."""
+    logger.info("Received streaming interactive request")
+    
+    conductor = EnterpriseAICostArchitect()
+    latest_message = request.messages[-1].content if request.messages else ""
+    
+    async def event_stream():
+        async with aclosing(conductor.stream_interactive(latest_message)) as events:
+            async for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        if (timeline := tracing.timeline()) is not None:
+            yield f"event: trace\ndata: {json.dumps(timeline)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _run_update(conductor: EnterpriseAICostArchitect, request: InteractiveRequest) -> StructuredResponse:
+    """Restart the workflow with modified parameters, from original_data or the request's session."""
+    modified_workload = request.modified_workload.model_dump() if request.modified_workload else None
+    workload_changes = request.workload_changes.model_dump(exclude_none=True) if request.workload_changes else None
+    logger.info("Updated parameters: %s", logs.payload(workload_changes or modified_workload))
+    # Someone is dragging a slider: these LLM calls go ahead of first analyses and batches
+    with scheduler.priority(scheduler.INTERACTIVE):
+        return await conductor.run_interactive(
+            modified_workload=modified_workload,
+            original_data=request.original_data,
+            defer_recommendation=request.defer_recommendation,
+            revision_id=request.revision_id,
+            session_id=request.session_id,
+            workload_changes=workload_changes
+        )
+
+# Left out of patched documents: timings change on every run, and the new data_revision is sent next to the patch
+_PATCH_EXCLUDE = {"stage_timings_ms", "data_revision"}
+
+def _interactive_response(structured_data: StructuredResponse, base_revision: str | None = None) -> InteractiveResponse:
+    """Full structured_data, or a JSON Patch against base_revision when the session still holds that revision."""
+    session = sessions.get_store().peek(structured_data.session_id) if structured_data.session_id else None
+    if session is None:
+        return InteractiveResponse(structured_data=structured_data)
+    structured_data.data_revision = uuid.uuid4().hex[:16]
+    base = session.snapshots.get(base_revision) if base_revision else None
+    # Responses aren't modified once returned: keep the object and dump it only if a later update diffs against it
+    session.remember(structured_data.data_revision, structured_data)
+    if base is None:
+        return InteractiveResponse(structured_data=structured_data)
+    patch = json_patch.diff(base.model_dump(mode="json", exclude=_PATCH_EXCLUDE),
+                            structured_data.model_dump(mode="json", exclude=_PATCH_EXCLUDE))
+    return InteractiveResponse(patch=patch, base_revision=base_revision, data_revision=structured_data.data_revision)
+
+def _session_not_found(error: sessions.SessionNotFoundError) -> HTTPException:
+    # Tells the client to fall back to sending original_data
+    return HTTPException(status_code=404, detail=f"Unknown or expired session_id {error}; resend original_data")
 
 @app.post("/v1/chat/update-params", response_model=InteractiveResponse)
 async def update_parameters(request: InteractiveRequest) -> InteractiveResponse:
     """Update specific parameters and recalculate costs in real-time."""
-    logger.info(f"Received parameter update request")
+    logger.info("Received parameter update request")
     
-    if not request.modified_workload or not request.original_data:
-        return InteractiveResponse(simple_answer="Missing required parameters for update")
+    if not request.session_id and (not request.modified_workload or not request.original_data):
+        return _with_trace(InteractiveResponse(simple_answer="Missing required parameters for update"))
     
     conductor = EnterpriseAICostArchitect()
     
     try:
-        modified_workload_dict = request.modified_workload.dict()
-        logger.info(f"Updated parameters: {modified_workload_dict}")
-        
-        # Restart workflow with modified parameters
-        structured_data = await conductor.run_interactive(
-            modified_workload=modified_workload_dict,
-            original_data=request.original_data
-        )
-        return InteractiveResponse(structured_data=structured_data)
+        structured_data = await _run_update(conductor, request)
+        return _with_trace(_interactive_response(structured_data, request.base_revision))
     
+    except sessions.SessionNotFoundError as e:
+        raise _session_not_found(e)
     except Exception as e:
-        logger.error(f"Parameter update failed: {e}")
-        return InteractiveResponse(simple_answer=generate_helpful_guidance())
+        metrics.ENDPOINT_ERRORS.inc(endpoint="update_params")
+        logger.error("Parameter update failed: %s", e)
+        return _with_trace(InteractiveResponse(simple_answer=generate_helpful_guidance()))
+
+@app.get("/v1/chat/recommendation/{revision_id}", response_model=RecommendationResponse)
+async def get_recommendation(revision_id: str, wait_s: float = 0.0) -> RecommendationResponse:
+    """Fetch a deferred final_recommendation; wait_s > 0 long-polls until it is ready."""
+    entry = await recommendations.get_store().wait(revision_id, min(max(wait_s, 0.0), 30.0))
+    if entry is None:
+        return RecommendationResponse(revision_id=revision_id, status="unknown")
+    return RecommendationResponse(
+        revision_id=revision_id,
+        status=entry.status,
+        final_recommendation=entry.final_recommendation
+    )
+
+@app.post("/v1/batch")
+async def batch_analysis(request: Request, include_recommendation: bool = False) -> StreamingResponse:
+    """Analyze many workloads at once; results stream back as NDJSON in completion order.
+    
+    The body is either NDJSON (Content-Type: application/x-ndjson), one workload JSON per line
+    and decoded lazily, or a JSON list of workloads / {"workloads": [...]}.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        # The body must be read before the response starts: once it does, Starlette listens for
+        # the client's disconnect on the same receive channel and would swallow the body messages.
+        body = await request.body()
+        workloads = batch.parse_ndjson(batch.iterate([body]))
+    else:
+        try:
+            body = await request.json()
+            batch_request = BatchRequest(workloads=body) if isinstance(body, list) else BatchRequest(**body)
+        except (json.JSONDecodeError, TypeError, ValidationError) as e:
+            raise HTTPException(status_code=400, detail=f"Expected a list of workloads or NDJSON: {e}")
+        include_recommendation = include_recommendation or batch_request.include_recommendation
+        workloads = batch.iterate(batch_request.workloads)
+    logger.info("Received batch request (include_recommendation=%s)", include_recommendation)
+    
+    async def ndjson_lines():
+        async for line in batch.analyze(workloads, include_recommendation=include_recommendation):
+            yield json.dumps(line) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.get("/v1/stats/openai-client")
+async def openai_client_stats():
+    """Connection pool counters for the shared OpenAI client."""
+    return openai_client.get_stats()
+
+@app.get("/v1/stats/llm-scheduler")
+async def llm_scheduler_stats():
+    """LLM requests queued, admitted and shed per priority class, and how long admitted ones waited."""
+    return openai_client.get_scheduler_stats()
+
+@app.get("/v1/stats/llm-cache")
+async def llm_cache_stats():
+    """Hit/miss/eviction counters for the LLM response cache."""
+    return llm_cache.get_stats()
+
+@app.get("/v1/stats/circuit-breakers")
+async def circuit_breaker_stats():
+    """Per-model circuit breaker state and how many calls each one rejected."""
+    return resilience.get_stats()
+
+@app.get("/v1/stats/hedging")
+async def hedging_stats():
+    """Hedged LLM requests issued and won, and the remaining hedge budget."""
+    return hedging.get_stats()
+
+@app.get("/v1/stats/sessions")
+async def session_stats():
+    """Live interactive sessions and how many updates found, missed or evicted theirs."""
+    return sessions.get_stats()
+
+@app.get("/v1/stats/singleflight")
+async def singleflight_stats():
+    """How many requests were served by joining an identical in-flight analysis."""
+    return singleflight.get_stats()
+
+@app.get("/v1/stats/logging")
+async def logging_stats():
+    """Log queue depth and records dropped because the queue was full."""
+    return logs.get_stats()
+
+@app.get("/v1/catalog")
+async def cost_catalog():
+    """Currently loaded cost catalog snapshot."""
+    snapshot = catalog.get_catalog()
+    return {
+        "version": snapshot.version,
+        "models": [
+            {**snapshot.row(name), "regions": snapshot.regions[i], "certifications": snapshot.certifications[i]}
+            for i, name in enumerate(snapshot.model_names)
+        ],
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics() -> PlainTextResponse:
+    """Stage latency histograms, LLM token/request counters, fallbacks and in-flight gauges."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/healthz")
 async def healthcheck():
@@ -0,0 +1,211 @@
+import time
+from typing import Iterable
+
+# Prometheus text exposition format, version 0.0.4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: list["_Metric"] = []
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: dict[tuple, object] = {}
+        if not self.labels and self.kind != "histogram":
+            # Unlabelled series are exported as 0 from the start
+            self._values[()] = 0
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = STAGE_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            series = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series["buckets"][i] += 1
+                break
+        series["sum"] += value
+        series["count"] += 1
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return series["count"] if series else 0
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, hits in zip(self.buckets, series["buckets"]):
+                cumulative += hits
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, inf)} {series['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(series['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series['count']}")
+        return lines
+
+def render() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+STAGE_DURATION = Histogram(
+    "cost_architect_stage_duration_seconds", "Wall time of each pipeline stage.", ["stage"],
+)
+STAGE_FAILURES = Counter(
+    "cost_architect_stage_failures_total", "Pipeline stages that raised.", ["stage"],
+)
+STAGE_MEMO = Counter(
+    "cost_architect_stage_memo_total", "Memoizable stage runs by outcome (hit = output reused, miss = ran).",
+    ["stage", "outcome"],
+)
+LLM_REQUESTS = Counter(
+    "cost_architect_llm_requests_total", "LLM completions by agent and outcome (ok, error, cache_hit, shed).",
+    ["agent", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "cost_architect_llm_tokens_total", "Tokens reported in response.usage, by agent, model and kind.",
+    ["agent", "model", "kind"],
+)
+LLM_RETRIES = Counter(
+    "cost_architect_llm_retries_total", "LLM attempts retried after a transient error.", ["agent"],
+)
+LLM_CIRCUIT_OPEN = Gauge(
+    "cost_architect_llm_circuit_open", "1 while the model's circuit breaker is open or half-open.", ["model"],
+)
+LLM_FALLBACKS = Counter(
+    "cost_architect_llm_fallbacks_total", "Stages answered deterministically because the LLM was unavailable.",
+    ["agent"],
+)
+LLM_HEDGES = Counter(
+    "cost_architect_llm_hedges_total", "Hedged duplicate LLM requests by agent and outcome (issued, won).",
+    ["agent", "outcome"],
+)
+LLM_IN_FLIGHT = Gauge(
+    "cost_architect_llm_requests_in_flight", "LLM requests currently waiting on OpenAI.",
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "cost_architect_llm_queue_depth", "LLM requests waiting in the scheduler, by priority class.", ["priority"],
+)
+LLM_QUEUE_WAIT = Histogram(
+    "cost_architect_llm_queue_wait_seconds", "Time LLM requests waited in the scheduler before being sent.",
+    ["priority"],
+)
+LLM_QUEUE_DROPPED = Counter(
+    "cost_architect_llm_queue_dropped_total",
+    "LLM requests shed by the scheduler (full = class queue at capacity, deadline = could not start in time).",
+    ["priority", "reason"],
+)
+HELPFUL_GUIDANCE = Counter(
+    "cost_architect_helpful_guidance_total", "Responses that fell back to generate_helpful_guidance().",
+)
+ENDPOINT_ERRORS = Counter(
+    "cost_architect_endpoint_errors_total", "Exceptions caught by an endpoint handler.", ["endpoint"],
+)
+LOG_DROPPED = Counter(
+    "cost_architect_log_records_dropped_total", "Log records dropped because the log queue was full.",
+)
+HTTP_IN_FLIGHT = Gauge(
+    "cost_architect_http_requests_in_flight", "HTTP requests currently being served, streaming bodies included.",
+)
+HTTP_REQUESTS = Counter(
+    "cost_architect_http_requests_total", "HTTP requests by route template and status.", ["path", "status"],
+)
+HTTP_DURATION = Histogram(
+    "cost_architect_http_request_duration_seconds", "HTTP request time until the last body chunk is sent.", ["path"],
+)
+
+class MetricsMiddleware:
+    """ASGI middleware: in-flight gauge and per-route counters, held until the response body is done."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The route template keeps ids like revision_id out of the label values
+            path = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(path=path, status=str(status["code"]))
+            HTTP_DURATION.observe(time.perf_counter() - start, path=path)
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+class PendingRecommendation:
+    def __init__(self, revision_id: str, task: asyncio.Task):
+        self.revision_id = revision_id
+        self.task = task
+        self.created_at = time.monotonic()
+        self.status = "pending"
+        self.final_recommendation: str | None = None
+
+class RecommendationStore:
+    """Background recommendation jobs keyed by revision id, for two-phase update-params.
+
+    The store is per process: a long-poll that lands on another worker, or arrives after ttl_s,
+    sees no entry. Run two-phase mode behind sticky routing or with a single worker.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_s: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[str, PendingRecommendation] = OrderedDict()
+
+    def submit(
+        self,
+        produce: Callable[[], Awaitable[str]],
+        fallback: Callable[[], str],
+        supersedes: str | None = None,
+    ) -> str:
+        """Start producing a recommendation in the background and return its revision id.
+
+        If the caller names the revision it is replacing, that revision's job is cancelled,
+        so a dragged slider only pays for the recommendation it finally settles on.
+        """
+        self._expire()
+        if supersedes:
+            self.cancel(supersedes)
+
+        revision_id = uuid.uuid4().hex
+        task = asyncio.create_task(self._produce(revision_id, produce, fallback))
+        self._entries[revision_id] = PendingRecommendation(revision_id, task)
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            evicted.task.cancel()
+        return revision_id
+
+    async def _produce(self, revision_id: str, produce: Callable[[], Awaitable[str]], fallback: Callable[[], str]) -> None:
+        try:
+            final_recommendation, status = await produce(), "ready"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Deferred recommendation %s failed: %s", revision_id, e)
+            final_recommendation, status = fallback(), "failed"
+        entry = self._entries.get(revision_id)
+        if entry is not None:
+            entry.final_recommendation = final_recommendation
+            entry.status = status
+
+    def get(self, revision_id: str) -> PendingRecommendation | None:
+        self._expire()
+        return self._entries.get(revision_id)
+
+    async def wait(self, revision_id: str, timeout_s: float) -> PendingRecommendation | None:
+        """Return the entry once it is no longer pending, or after timeout_s (long-poll)."""
+        entry = self.get(revision_id)
+        if entry is not None and entry.status == "pending" and timeout_s > 0:
+            await asyncio.wait({entry.task}, timeout=timeout_s)
+        return entry
+
+    def cancel(self, revision_id: str) -> None:
+        entry = self._entries.pop(revision_id, None)
+        if entry is not None and not entry.task.done():
+            # A long-poll already holding this entry must not keep reporting "pending"
+            entry.status = "cancelled"
+            entry.task.cancel()
+            logger.info("Cancelled superseded recommendation %s", revision_id)
+
+    def cancel_all(self) -> None:
+        for revision_id in list(self._entries):
+            self.cancel(revision_id)
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_s
+        while self._entries:
+            revision_id, entry = next(iter(self._entries.items()))
+            if entry.created_at > cutoff:
+                break
+            self.cancel(revision_id)
+
+_store: RecommendationStore | None = None
+
+def get_store() -> RecommendationStore:
+    global _store
+    if _store is None:
+        _store = RecommendationStore()
+    return _store
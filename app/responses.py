@@ -0,0 +1,20 @@
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+def _default(value: Any) -> Any:
+    # pydantic's JSON mode applies each field's type (a float field holding 0 renders as 0.0); orjson writes the result
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class ModelJSONResponse(JSONResponse):
+    """JSON response rendered by orjson, with pydantic models dumped in JSON mode first.
+
+    Endpoints return it directly, so FastAPI neither re-validates the response model nor runs
+    jsonable_encoder over it.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
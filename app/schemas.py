@@ -11,6 +11,8 @@ class ChatRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     answer: str
+    # Span timeline, only when the request sent X-Debug-Trace
+    trace: Optional[Dict[str, Any]] = None
 
 # New schemas for interactive mode
 class WorkloadParams(BaseModel):
@@ -22,6 +24,16 @@ class WorkloadParams(BaseModel):
     compliance_constraints: List[str]
     current_model: str
 
+class WorkloadChanges(BaseModel):
+    # Only the fields a slider changed; the rest come from the session
+    calls_per_day: Optional[int] = None
+    avg_input_tokens: Optional[int] = None
+    avg_output_tokens: Optional[int] = None
+    latency_sla_ms: Optional[int] = None
+    region: Optional[str] = None
+    compliance_constraints: Optional[List[str]] = None
+    current_model: Optional[str] = None
+
 class CostModel(BaseModel):
     model_name: str
     monthly_cost: float
@@ -46,23 +58,60 @@ class ROIAnalysis(BaseModel):
     payback_weeks: int
 
 class StructuredResponse(BaseModel):
+    # Stages that failed or never ran are None; final_recommendation then carries guidance
     solution_architect: Optional[Dict[str, Any]] = None
-    workload_params: WorkloadParams
-    cost_table: List[CostModel]
-    ranked_models: List[RankedModel]
-    roi_analysis: ROIAnalysis
-    final_recommendation: str
+    workload_params: Optional[WorkloadParams] = None
+    cost_table: Optional[List[CostModel]] = None
+    ranked_models: Optional[List[RankedModel]] = None
+    # Non-dominated options on (monthly_cost, p90_latency_ms, context_window_tokens), cheapest first
+    pareto_frontier: Optional[List[CostModel]] = None
+    roi_analysis: Optional[ROIAnalysis] = None
+    # None while a deferred recommendation is still being written (see revision_id)
+    final_recommendation: Optional[str] = None
+    revision_id: Optional[str] = None
+    recommendation_status: str = "ready"
+    stage_timings_ms: Optional[Dict[str, float]] = None
+    # Send this with workload_changes on later updates instead of original_data
+    session_id: Optional[str] = None
+    # Identifies this exact structured_data; send it as base_revision to get the next one as a JSON Patch
+    data_revision: Optional[str] = None
     editable_fields: List[str] = ["calls_per_day", "avg_input_tokens", "avg_output_tokens", "latency_sla_ms", "region"]
 
+class BatchRequest(BaseModel):
+    workloads: List[Dict[str, Any]]
+    include_recommendation: bool = False
+
 class InteractiveRequest(BaseModel):
     # Modified parameters - only provide fields that were changed
     modified_workload: Optional[WorkloadParams] = None
     # Original data to restart from appropriate step
     original_data: Optional[Dict[str, Any]] = None
+    # Server-side alternative to original_data: the session from an earlier response plus only the changed fields
+    session_id: Optional[str] = None
+    workload_changes: Optional[WorkloadChanges] = None
+    # data_revision of the structured_data the client holds: the response is an RFC 6902 patch against it when the server still has it
+    base_revision: Optional[str] = None
     # For initial requests (same as ChatRequest)
     messages: Optional[List[Message]] = None
+    # Return numbers immediately and fetch final_recommendation later by revision_id
+    defer_recommendation: bool = False
+    # Revision the client is currently showing; its pending recommendation is cancelled
+    revision_id: Optional[str] = None
 
 class InteractiveResponse(BaseModel):
     # Either structured data or simple answer for greetings/errors
     structured_data: Optional[StructuredResponse] = None
-    simple_answer: Optional[str] = None 
\ No newline at end of file
+    simple_answer: Optional[str] = None
+    # Instead of structured_data: RFC 6902 operations turning the base_revision structured_data into the new one
+    patch: Optional[List[Dict[str, Any]]] = None
+    base_revision: Optional[str] = None
+    # With a patch: the data_revision of the patched structured_data (the patch itself leaves it and stage_timings_ms out)
+    data_revision: Optional[str] = None
+    # Span timeline, only when the request sent X-Debug-Trace
+    trace: Optional[Dict[str, Any]] = None
+
+class RecommendationResponse(BaseModel):
+    revision_id: str
+    # pending | ready | failed | unknown
+    status: str
+    final_recommendation: Optional[str] = None
@@ -0,0 +1,96 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+from app.agents.pipeline import StageMemo
+from app.config import settings
+
+class SessionNotFoundError(LookupError):
+    """The session id is unknown to this worker or has expired; the client must resend original_data."""
+
+class Session:
+    """What a parameter update needs from the analysis it modifies."""
+
+    def __init__(self, session_id: str, solution_architect: dict | None, workload: dict, memo: StageMemo):
+        self.session_id = session_id
+        self.solution_architect = solution_architect
+        self.workload = workload
+        # Stage outputs from this session's earlier runs, reused when an update doesn't touch their inputs
+        self.memo = memo
+        # Recent structured_data sent to the client by data_revision, the bases for JSON Patch responses
+        self.snapshots: OrderedDict[str, Any] = OrderedDict()
+        self.last_used = time.monotonic()
+
+    def remember(self, data_revision: str, snapshot: Any) -> None:
+        self.snapshots[data_revision] = snapshot
+        while len(self.snapshots) > settings.session_max_snapshots:
+            self.snapshots.popitem(last=False)
+
+class SessionStore:
+    """Interactive sessions keyed by session id, so slider updates send only the changed fields.
+
+    Sessions expire ttl_s after their last use and the least recently used one is evicted past
+    max_entries. Like the recommendation store this is per process: an update that lands on
+    another worker, or after expiry, gets no session and must resend original_data.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_s: float = 1800.0):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._stats = {"created": 0, "hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def create(self, solution_architect: dict | None, workload: dict, memo: StageMemo | None = None) -> str:
+        self._expire()
+        session_id = uuid.uuid4().hex
+        memo = memo or StageMemo(settings.stage_memo_max_entries)
+        self._sessions[session_id] = Session(session_id, solution_architect, workload, memo)
+        self._stats["created"] += 1
+        while len(self._sessions) > self.max_entries:
+            self._sessions.popitem(last=False)
+            self._stats["evicted"] += 1
+        return session_id
+
+    def get(self, session_id: str) -> Session | None:
+        """Return the session and mark it used, or None if it is unknown or expired."""
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def peek(self, session_id: str) -> Session | None:
+        """The session if it is live, without counting a hit or refreshing it."""
+        return self._sessions.get(session_id)
+
+    def update(self, session_id: str, workload: dict) -> None:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.workload = workload
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl_s
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used > cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self._stats["expired"] += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {"sessions": len(self._sessions), **self._stats}
+
+_store: SessionStore | None = None
+
+def get_store() -> SessionStore:
+    global _store
+    if _store is None:
+        _store = SessionStore(settings.session_max_entries, settings.session_ttl_s)
+    return _store
+
+def get_stats() -> dict[str, Any]:
+    return get_store().stats()
@@ -0,0 +1,69 @@
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable
+from app import tracing
+
+logger = logging.getLogger(__name__)
+
+def normalize_message(message: Any) -> Any:
+    """Canonical form of a user message: sorted-key JSON for workload JSON, collapsed whitespace otherwise."""
+    text = str(message)
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return " ".join(text.split())
+
+def make_key(*parts: Any) -> str:
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class SingleFlight:
+    """Share one in-flight computation between concurrent callers with the same key.
+
+    The computation runs in its own task, so a caller that disconnects doesn't cancel it for the
+    others. Results aren't kept once the computation finishes; that is the LLM cache's job.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    async def do(self, key: str, produce: Callable[[], Awaitable[Any]]) -> Any:
+        self._stats["calls"] += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self._stats["executions"] += 1
+            task = asyncio.create_task(produce())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self._stats["coalesced"] += 1
+            # The shared run's spans live in the trace of the request that started it
+            tracing.current_span().set(coalesced_onto=key[:12])
+            logger.info("Coalesced request onto in-flight computation %s", key[:12])
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        calls = self._stats["calls"]
+        return {
+            **self._stats,
+            "coalescing_ratio": round(self._stats["coalesced"] / calls, 4) if calls else 0.0,
+            "in_flight": len(self._in_flight),
+        }
+
+_group: SingleFlight | None = None
+
+def get_group() -> SingleFlight:
+    global _group
+    if _group is None:
+        _group = SingleFlight()
+    return _group
+
+def get_stats() -> dict:
+    return get_group().stats()
@@ -0,0 +1,152 @@
+import json
+import time
+import uuid
+from contextvars import ContextVar
+from app.config import settings
+from app import logs
+
+# Requests carrying this header get their timeline back (debug field / SSE event) and an X-Trace-Id header
+DEBUG_HEADER = "x-debug-trace"
+TRACE_ID_HEADER = "x-trace-id"
+
+_current: ContextVar["Span | None"] = ContextVar("trace_span", default=None)
+
+class Span:
+    """One timed step of a request. Children are spans opened while this one was current.
+
+    asyncio tasks copy the context they are created in, so spans opened inside pipeline
+    stages and LLM calls nest under whichever span launched them.
+    """
+
+    __slots__ = ("trace", "name", "attrs", "children", "start", "end", "_token")
+
+    def __init__(self, trace: "Trace", name: str, attrs: dict):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.children: list[Span] = []
+        self.start = time.perf_counter()
+        self.end: float | None = None
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"[:200]
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # An async generator closed from another task; that context is gone anyway
+            pass
+        return False
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def add(self, key: str, amount: float = 1) -> None:
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def to_dict(self, origin: float, now: float) -> dict:
+        end = self.end if self.end is not None else now
+        node = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+        }
+        if self.end is None:
+            node["open"] = True
+        if self.attrs:
+            node["attrs"] = dict(self.attrs)
+        if self.children:
+            node["children"] = [child.to_dict(origin, now) for child in self.children]
+        return node
+
+class Trace:
+    def __init__(self, name: str, debug: bool, trace_id: str | None = None, **attrs):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.debug = debug
+        self.root = Span(self, name, attrs)
+
+    def to_dict(self) -> dict:
+        return {"trace_id": self.trace_id, **self.root.to_dict(self.root.start, time.perf_counter())}
+
+class _NoopSpan:
+    """Returned by span() when the request isn't traced, so instrumentation costs one ContextVar lookup."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def add(self, key: str, amount: float = 1) -> None:
+        pass
+
+_NOOP = _NoopSpan()
+
+def span(name: str, **attrs) -> Span | _NoopSpan:
+    """Open a child of the current span: `with tracing.span("llm", agent=agent) as s: ...`."""
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    child = Span(parent.trace, name, attrs)
+    parent.children.append(child)
+    return child
+
+def current_span() -> Span | _NoopSpan:
+    return _current.get() or _NOOP
+
+def timeline() -> dict | None:
+    """The current trace so far, if the client asked for it with the debug header."""
+    current = _current.get()
+    if current is None or not current.trace.debug:
+        return None
+    return current.trace.to_dict()
+
+def _write(trace: Trace) -> None:
+    # Appended by the writer's own thread, so no request waits on the disk
+    logs.file_writer(settings.trace_file_path).info(json.dumps(trace.to_dict(), default=str))
+
+class TracingMiddleware:
+    """ASGI middleware: opens a root span per traced request and adds the X-Trace-Id header.
+
+    A request is traced when it sends `X-Debug-Trace: 1` or when TRACE_FILE_PATH is set, in
+    which case every finished trace is appended to that file as one JSON line.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        debug = headers.get(DEBUG_HEADER.encode(), b"").lower() in (b"1", b"true", b"yes")
+        if not debug and not settings.trace_file_path:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace("request", debug, method=scope.get("method"), path=scope.get("path"))
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(TRACE_ID_HEADER.encode(), trace.trace_id.encode())]
+                trace.root.set(status=message["status"])
+            await send(message)
+
+        try:
+            with trace.root:
+                await self.app(scope, receive, send_with_trace_id)
+        finally:
+            if settings.trace_file_path:
+                _write(trace)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Compare cost_engine.run in a loop against cost_engine.run_batch over a workload grid.
+
+Usage: python -m benchmarks.bench_cost_engine_batch [--workloads 100000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import numpy as np
+sys.path.append('.')
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+from app.agents import cost_engine
+
+def make_workloads(n: int, seed: int = 7) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return (
+        rng.integers(100, 50_000, n),
+        rng.integers(50, 4_000, n),
+        rng.integers(50, 2_000, n),
+    )
+
+async def run_loop(calls, inputs, outputs) -> float:
+    start = time.perf_counter()
+    for c, i, o in zip(calls.tolist(), inputs.tolist(), outputs.tolist()):
+        await cost_engine.run({"calls_per_day": c, "avg_input_tokens": i, "avg_output_tokens": o})
+    return time.perf_counter() - start
+
+def run_batch(calls, inputs, outputs) -> float:
+    start = time.perf_counter()
+    cost_engine.run_batch(calls, inputs, outputs)
+    return time.perf_counter() - start
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workloads", type=int, default=100_000)
+    parser.add_argument("--min-speedup", type=float, default=50.0)
+    args = parser.parse_args()
+
+    calls, inputs, outputs = make_workloads(args.workloads)
+    loop_s = asyncio.run(run_loop(calls, inputs, outputs))
+    batch_s = min(run_batch(calls, inputs, outputs) for _ in range(5))
+    speedup = loop_s / batch_s
+
+    print(f"workloads: {args.workloads:,}  models: {len(cost_engine.run_batch([1], [1], [1])['model_names'])}")
+    print(f"run() loop:  {loop_s * 1000:10.1f} ms")
+    print(f"run_batch(): {batch_s * 1000:10.1f} ms")
+    print(f"speedup:     {speedup:10.1f}x (required {args.min_speedup:.0f}x)")
+    return 0 if speedup >= args.min_speedup else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the deterministic request path, gated against a saved baseline.
+
+Usage: python -m benchmarks.bench_hot_paths [--save-baseline] [--max-regression 0.3] [--only cost_engine]
+
+Each benchmark reports the best-of-5 time per call. Without --save-baseline the results are
+compared with benchmarks/baseline.json and the run fails if any benchmark is slower than its
+baseline by more than --max-regression (0.3 = 30%). Baselines are machine-specific: save one
+on the machine that runs the gate.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+sys.path.append('.')
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+from app import catalog
+from app.agents import cost_engine, roi_calc, scoring
+from app.agents.conductor import is_greeting_or_casual_message
+from app.agents.json_utils import extract_json_from_text
+from app.responses import ModelJSONResponse
+from app.schemas import CostModel, StructuredResponse
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+
+WORKLOAD = {
+    "calls_per_day": 12_000,
+    "avg_input_tokens": 850,
+    "avg_output_tokens": 320,
+    "latency_sla_ms": 1500,
+    "region": "US",
+    "compliance_constraints": ["SOC2"],
+    "current_model": "",
+}
+
+def make_catalog(n: int) -> catalog.CatalogSnapshot:
+    rows = [
+        {
+            "model_name": f"model-{i:06d}",
+            "price_per_1k_tokens": 0.0001 + (i * 7919 % 10_000) / 1_000_000,
+            "latency_ms": 200 + i * 31 % 3000,
+            "context_window_tokens": (4 + i % 8) * 16_000,
+            "regions": ["US", "EU"] if i % 3 else ["EU"],
+            "certifications": ["SOC2", "GDPR"] if i % 2 else ["GDPR"],
+        }
+        for i in range(n)
+    ]
+    return catalog.CatalogSnapshot(f"bench-{n}", rows)
+
+# Shapes the agents actually produce: bare JSON, fenced JSON, JSON wrapped in prose, a scorer array
+LLM_OUTPUTS = {
+    "plain": json.dumps(WORKLOAD),
+    "fenced": "```json\n" + json.dumps({"architecture": ["Intake", "Classifier", "Router"], "workload": WORKLOAD}, indent=2) + "\n```",
+    "noisy": "Sure! Here is the normalized workload you asked for:\n\n" + json.dumps(WORKLOAD)
+             + "\n\nLet me know if you want me to adjust any of these assumptions.",
+    "array": "Ranked models:\n" + json.dumps([{"model_name": f"model-{i}", "composite_score": i / 10} for i in range(10)]),
+}
+
+MESSAGES = [
+    "hi",
+    "what does this do?",
+    "We handle 40k support tickets a day, about 900 tokens in and 250 out, EU only, GDPR.",
+    json.dumps(WORKLOAD),
+]
+
+def _best_per_call(run_loops, target_s: float = 0.2, repeats: int = 5) -> float:
+    """Best seconds per call over `repeats` batches; run_loops(n) makes n calls, each batch lasts ~target_s."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        run_loops(loops)
+        elapsed = time.perf_counter() - start
+        if elapsed >= target_s / 10 or loops >= 1 << 20:
+            break
+        loops *= 10
+    loops = max(1, round(loops * target_s / max(elapsed, 1e-9)))
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run_loops(loops)
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+def measure(fn) -> float:
+    def run_loops(loops):
+        for _ in range(loops):
+            fn()
+    return _best_per_call(run_loops)
+
+def measure_async(coro_fn, loop: asyncio.AbstractEventLoop) -> float:
+    """measure() for coroutines; each batch runs inside one run_until_complete so only the awaits are timed."""
+    async def batch(loops):
+        for _ in range(loops):
+            await coro_fn()
+    return _best_per_call(lambda loops: loop.run_until_complete(batch(loops)))
+
+def run_benchmarks(only: str | None = None) -> dict[str, float]:
+    loop = asyncio.new_event_loop()
+    results: dict[str, float] = {}
+
+    def record(name: str, seconds: float) -> None:
+        results[name] = seconds
+        print(f"{name:<40} {seconds * 1e6:14.2f} µs/call")
+
+    def selected(name: str) -> bool:
+        return only is None or name.startswith(only)
+
+    original_get_catalog = cost_engine.get_catalog
+    try:
+        for n in (10, 1_000, 100_000):
+            name = f"cost_engine.run[{n}]"
+            if not selected(name):
+                continue
+            snapshot = make_catalog(n)
+            cost_engine.get_catalog = lambda snapshot=snapshot: snapshot
+            record(name, measure_async(lambda: cost_engine.run(WORKLOAD), loop))
+    finally:
+        cost_engine.get_catalog = original_get_catalog
+
+    if selected("roi_calc.run"):
+        cost_table = loop.run_until_complete(cost_engine.run(WORKLOAD))
+        ranked = loop.run_until_complete(scoring.run({"workload": WORKLOAD, "cost_table": cost_table}))
+        payload = {"workload": WORKLOAD, "ranked_models": ranked, "current_model": ranked[-1]["model_name"]}
+        record("roi_calc.run", measure_async(lambda: roi_calc.run(payload), loop))
+
+    for kind, text in LLM_OUTPUTS.items():
+        name = f"extract_json_from_text[{kind}]"
+        if selected(name):
+            record(name, measure(lambda text=text: extract_json_from_text(text)))
+
+    if selected("is_greeting_or_casual_message"):
+        record("is_greeting_or_casual_message", measure(lambda: [is_greeting_or_casual_message(m) for m in MESSAGES]))
+
+    for n in (10, 1_000, 10_000):
+        table = [
+            {"model_name": f"model-{i:06d}", "monthly_cost": i * 1.25, "p90_latency_ms": 300 + i % 900,
+             "context_window_tokens": 128_000}
+            for i in range(n)
+        ]
+        if selected(f"StructuredResponse.build[{n}]"):
+            record(f"StructuredResponse.build[{n}]",
+                   measure(lambda table=table: StructuredResponse(cost_table=[CostModel(**m) for m in table])))
+        if selected(f"StructuredResponse.json[{n}]"):
+            response = StructuredResponse(cost_table=[CostModel(**m) for m in table])
+            record(f"StructuredResponse.json[{n}]", measure(lambda response=response: response.model_dump_json()))
+        # What the chat endpoints send: rendered by orjson, not re-validated as a response model
+        if selected(f"ModelJSONResponse.render[{n}]"):
+            response = StructuredResponse(cost_table=[CostModel(**m) for m in table])
+            record(f"ModelJSONResponse.render[{n}]", measure(lambda response=response: ModelJSONResponse(response)))
+
+    loop.close()
+    return results
+
+def compare(results: dict[str, float], baseline: dict[str, float], max_regression: float) -> list[str]:
+    failures = []
+    print(f"\n{'benchmark':<40} {'baseline µs':>14} {'now µs':>14} {'change':>9}")
+    for name, seconds in results.items():
+        if name not in baseline:
+            print(f"{name:<40} {'-':>14} {seconds * 1e6:14.2f} {'new':>9}")
+            continue
+        change = seconds / baseline[name] - 1
+        flag = "  REGRESSED" if change > max_regression else ""
+        print(f"{name:<40} {baseline[name] * 1e6:14.2f} {seconds * 1e6:14.2f} {change:+8.1%}{flag}")
+        if change > max_regression:
+            failures.append(name)
+    return failures
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to benchmarks/baseline.json")
+    parser.add_argument("--max-regression", type=float, default=0.3)
+    parser.add_argument("--only", help="run benchmarks whose name starts with this prefix")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only)
+
+    if args.save_baseline:
+        stored = json.loads(args.baseline.read_text())["benchmarks"] if args.baseline.exists() and args.only else {}
+        stored.update(results)
+        args.baseline.write_text(json.dumps({
+            "machine": platform.platform(),
+            "python": platform.python_version(),
+            "benchmarks": stored,
+        }, indent=2) + "\n")
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline first")
+        return 1
+    failures = compare(results, json.loads(args.baseline.read_text())["benchmarks"], args.max_regression)
+    if failures:
+        print(f"\n{len(failures)} benchmark(s) regressed more than {args.max_regression:.0%}: {', '.join(failures)}")
+        return 1
+    print(f"\nAll benchmarks within {args.max_regression:.0%} of baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
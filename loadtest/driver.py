@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""Replay a realistic traffic mix against a running API and report throughput and latency.
+
+Usage: python -m loadtest.driver [--base-url http://127.0.0.1:8000] [--duration 60] [--concurrency 32]
+                                 [--rate 0] [--mix chat=0.2,interactive=0.3,update=0.5] [--sessions] [--json]
+
+Each virtual user loops: pick an endpoint from --mix, send a request, record its latency.
+With --rate > 0 requests are started on an open-loop schedule instead (at most --concurrency in
+flight), which is what to use when sizing for a target arrival rate. Parameter updates replay
+slider moves on structured_data returned by earlier interactive calls, either re-uploading it as
+original_data or, with --sessions, sending only its session_id and the changed field.
+
+A request counts as an error on a transport failure, a non-2xx status, or a 200 whose body is
+the generic guidance fallback instead of a result.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import httpx
+
+ENDPOINTS = {
+    "chat": "/v1/chat",
+    "interactive": "/v1/chat/interactive",
+    "update": "/v1/chat/update-params",
+}
+SLIDERS = {
+    "calls_per_day": (100, 200_000),
+    "avg_input_tokens": (50, 4_000),
+    "avg_output_tokens": (20, 2_000),
+    "latency_sla_ms": (200, 5_000),
+}
+REGIONS = ["US", "EU", "Global", "us-east-1", "Europe"]
+# No HIPAA: /v1/chat/interactive treats any message containing "hi" as a greeting
+COMPLIANCE = [[], ["SOC2"], ["GDPR"], ["SOC2", "GDPR"]]
+# Free-text requests go through the Solution Architect; avoid words that greeting check matches
+DESCRIPTIONS = [
+    "Our support desk gets {calls} emails per day; draft replies and route urgent cases. {compliance}",
+    "Summarize {calls} sales calls per day into CRM notes for the account team. {compliance}",
+    "Classify {calls} insurance claims a day and extract policy numbers, {region} data residency. {compliance}",
+    "Review {calls} vendor contracts per day and flag risky clauses for legal. {compliance}",
+]
+
+def random_workload(rng: random.Random) -> dict:
+    return {
+        "calls_per_day": rng.randint(500, 100_000),
+        "avg_input_tokens": rng.randint(100, 3_000),
+        "avg_output_tokens": rng.randint(50, 1_000),
+        "latency_sla_ms": rng.choice([800, 1_500, 2_000, 3_000]),
+        "region": rng.choice(REGIONS),
+        "compliance_constraints": rng.choice(COMPLIANCE),
+        "current_model": rng.choice(["", "gpt-4o", "gpt-3.5-turbo"]),
+    }
+
+def random_message(rng: random.Random) -> str:
+    # Half workload JSON (skips the Solution Architect), half free text
+    if rng.random() < 0.5:
+        return json.dumps(random_workload(rng))
+    compliance = rng.choice(COMPLIANCE)
+    return rng.choice(DESCRIPTIONS).format(
+        calls=rng.randint(500, 100_000),
+        region=rng.choice(["EU", "US"]),
+        compliance=f"Must be {' and '.join(compliance)} compliant." if compliance else "",
+    )
+
+def slider_move(rng: random.Random, structured: dict) -> dict:
+    workload = dict(structured["workload_params"])
+    field = rng.choice(list(SLIDERS))
+    low, high = SLIDERS[field]
+    workload[field] = min(high, max(low, int(workload[field] * rng.uniform(0.5, 1.5)) or low))
+    return workload
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), math.ceil(pct / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {name: [] for name in ENDPOINTS}
+        self.errors: dict[str, dict[str, int]] = {name: {} for name in ENDPOINTS}
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+
+    def record(self, endpoint: str, latency_s: float, error: str | None = None) -> None:
+        self.latencies[endpoint].append(latency_s)
+        if error is not None:
+            self.errors[endpoint][error] = self.errors[endpoint].get(error, 0) + 1
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        report = {"elapsed_s": round(elapsed, 3), "endpoints": {}}
+        total = total_errors = 0
+        for endpoint, latencies in self.latencies.items():
+            if not latencies:
+                continue
+            ordered = sorted(latencies)
+            errors = sum(self.errors[endpoint].values())
+            total += len(ordered)
+            total_errors += errors
+            report["endpoints"][endpoint] = {
+                "requests": len(ordered),
+                "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1),
+                "error_rate": round(errors / len(ordered), 4),
+                "errors": self.errors[endpoint],
+            }
+        report["requests"] = total
+        report["throughput_rps"] = round(total / elapsed, 2) if elapsed else 0.0
+        report["error_rate"] = round(total_errors / total, 4) if total else 0.0
+        return report
+
+class Driver:
+    def __init__(self, client: httpx.AsyncClient, mix: dict[str, float], rng: random.Random,
+                 defer_recommendation: bool = False, pool_size: int = 64, use_sessions: bool = False):
+        self.client = client
+        self.mix = mix
+        self.rng = rng
+        self.defer_recommendation = defer_recommendation
+        self.pool_size = pool_size
+        self.use_sessions = use_sessions
+        # structured_data from earlier interactive responses, the starting point for slider updates
+        self.analyses: list[dict] = []
+        self.recorder = Recorder()
+
+    def pick_endpoint(self) -> str:
+        endpoint = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        # Nothing to update yet: run an interactive analysis first
+        return "interactive" if endpoint == "update" and not self.analyses else endpoint
+
+    def build_request(self, endpoint: str) -> dict:
+        if endpoint == "update":
+            original = self.rng.choice(self.analyses)
+            if self.use_sessions and original.get("session_id"):
+                workload = slider_move(self.rng, original)
+                changes = {k: v for k, v in workload.items() if v != original["workload_params"][k]}
+                return {
+                    "session_id": original["session_id"],
+                    "workload_changes": changes,
+                    "defer_recommendation": self.defer_recommendation,
+                }
+            return {
+                "modified_workload": slider_move(self.rng, original),
+                "original_data": original,
+                "defer_recommendation": self.defer_recommendation,
+            }
+        return {"messages": [{"role": "user", "content": random_message(self.rng)}]}
+
+    def _remember(self, structured: dict | None) -> None:
+        if not structured or not structured.get("workload_params"):
+            return
+        if len(self.analyses) < self.pool_size:
+            self.analyses.append(structured)
+        else:
+            self.analyses[self.rng.randrange(self.pool_size)] = structured
+
+    async def one(self) -> None:
+        endpoint = self.pick_endpoint()
+        body = self.build_request(endpoint)
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(ENDPOINTS[endpoint], json=body)
+        except httpx.HTTPError as e:
+            self.recorder.record(endpoint, time.perf_counter() - start, type(e).__name__)
+            return
+        latency = time.perf_counter() - start
+        if not response.is_success:
+            self.recorder.record(endpoint, latency, f"http_{response.status_code}")
+            return
+        data = response.json()
+        if endpoint == "chat":
+            error = "fallback" if "I need more details" in data.get("answer", "") else None
+        else:
+            structured = data.get("structured_data")
+            error = None if structured and structured.get("cost_table") else "fallback"
+            self._remember(structured)
+        self.recorder.record(endpoint, latency, error)
+
+    async def run_closed_loop(self, duration_s: float, concurrency: int) -> dict:
+        deadline = time.perf_counter() + duration_s
+
+        async def user():
+            while time.perf_counter() < deadline:
+                await self.one()
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        self.recorder.finished = time.perf_counter()
+        return self.recorder.summary()
+
+    async def run_open_loop(self, duration_s: float, rate: float, concurrency: int) -> dict:
+        """Poisson arrivals at `rate` per second; arrivals beyond `concurrency` in flight are dropped and counted."""
+        deadline = time.perf_counter() + duration_s
+        slots = asyncio.Semaphore(concurrency)
+        tasks, dropped = set(), 0
+
+        async def guarded():
+            try:
+                await self.one()
+            finally:
+                slots.release()
+
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(self.rng.expovariate(rate))
+            if slots.locked():
+                dropped += 1
+                continue
+            await slots.acquire()
+            task = asyncio.create_task(guarded())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        self.recorder.finished = time.perf_counter()
+        return {**self.recorder.summary(), "dropped_arrivals": dropped}
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}; expected {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def print_report(report: dict) -> None:
+    print(f"{'endpoint':<12} {'requests':>9} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for name, stats in report["endpoints"].items():
+        print(f"{name:<12} {stats['requests']:>9} {stats['throughput_rps']:>8.2f} {stats['p50_ms']:>9.1f} "
+              f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['error_rate']:>8.2%}")
+        if stats["errors"]:
+            print(f"{'':<12} errors: {stats['errors']}")
+    print(f"\ntotal: {report['requests']} requests in {report['elapsed_s']}s, "
+          f"{report['throughput_rps']} req/s, error rate {report['error_rate']:.2%}")
+    if report.get("dropped_arrivals"):
+        print(f"dropped arrivals (concurrency cap reached): {report['dropped_arrivals']}")
+
+async def run(args) -> dict:
+    timeout = httpx.Timeout(args.timeout_s)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+        driver = Driver(client, args.mix, random.Random(args.seed), defer_recommendation=args.defer_recommendation,
+                        use_sessions=args.sessions)
+        if args.rate > 0:
+            return await driver.run_open_loop(args.duration, args.rate, args.concurrency)
+        return await driver.run_closed_loop(args.duration, args.concurrency)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrivals per second (0 = closed loop)")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("chat=0.2,interactive=0.3,update=0.5"))
+    parser.add_argument("--defer-recommendation", action="store_true", help="send updates as two-phase requests")
+    parser.add_argument("--sessions", action="store_true", help="send updates as session_id + changed fields")
+    parser.add_argument("--timeout-s", type=float, default=120.0)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""Local stand-in for the OpenAI chat completions API, for load tests that shouldn't cost money.
+
+Usage: python -m loadtest.fake_openai [--port 9000] [--latency-ms 800] [--sigma 0.5]
+                                      [--agent-latency-ms recommender=2500] [--error-rate 0.01]
+
+Then start the API with OPENAI_BASE_URL=http://127.0.0.1:9000/v1. Each prompt is matched to
+the agent that built it and answered with a canned, agent-appropriate response (workload JSON
+derived from the request, a ranking computed from the cost table, a markdown recommendation).
+Latency is log-normal around the median for that agent; a fraction of requests fail with a
+429/500/503 so the client's retry and error paths get exercised too.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import time
+import uuid
+sys.path.append('.')
+os.environ.setdefault('OPENAI_API_KEY', 'loadtest')
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.agents.configs import (
+    INTAKE_CLARIFIER, MODEL_SCORER, RECOMMENDATION_SYNTHESIZER, SOLUTION_ARCHITECT_OPT_EXTRACTOR,
+)
+
+# Agents build their prompt as agent_role + goal + instructions + "User message: ..."
+AGENT_ROLES = {
+    "solution_architect": SOLUTION_ARCHITECT_OPT_EXTRACTOR["agent_role"],
+    "intake": INTAKE_CLARIFIER["agent_role"],
+    "model_scorer": MODEL_SCORER["agent_role"],
+    "recommender": RECOMMENDATION_SYNTHESIZER["agent_role"],
+}
+CRITICAL_KEYS = ("calls_per_day", "avg_input_tokens", "avg_output_tokens", "latency_sla_ms")
+
+class FakeConfig:
+    def __init__(self, latency_ms: float = 800.0, sigma: float = 0.5, agent_latency_ms: dict | None = None,
+                 error_rate: float = 0.0, error_statuses: tuple = (429, 500, 503), stream_chunk_chars: int = 24,
+                 seed: int | None = None):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.agent_latency_ms = agent_latency_ms or {}
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.stream_chunk_chars = stream_chunk_chars
+        self.random = random.Random(seed)
+
+    def sample_latency_s(self, agent: str) -> float:
+        median = self.agent_latency_ms.get(agent, self.latency_ms)
+        if median <= 0:
+            return 0.0
+        return self.random.lognormvariate(0.0, self.sigma) * median / 1000
+
+def detect_agent(prompt: str) -> str:
+    for agent, role in AGENT_ROLES.items():
+        if prompt.startswith(role):
+            return agent
+    return "unknown"
+
+def _user_message(prompt: str) -> str:
+    return prompt.rsplit("User message: ", 1)[-1]
+
+def _stable_int(text: str, low: int, high: int) -> int:
+    digest = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+    return low + digest % (high - low)
+
+def solution_architect_reply(message: str) -> str:
+    numbers = [int(n.replace(",", "")) for n in re.findall(r"\d[\d,]*", message)]
+    calls = next((n for n in numbers if n >= 100), _stable_int(message, 500, 50_000))
+    region = "EU" if re.search(r"\b(EU|Europe|GDPR)\b", message, re.IGNORECASE) else "US"
+    compliance = [c for c in ("GDPR", "HIPAA", "SOC2") if c.lower() in message.lower()]
+    return json.dumps({
+        "opt_task": "Automate the described business process",
+        "architecture": ["Ingestion", "LLM Classifier", "Response Drafting", "Human Review"],
+        "workload": {
+            "calls_per_day": calls,
+            "avg_input_tokens": _stable_int(message + "in", 200, 2_000),
+            "avg_output_tokens": _stable_int(message + "out", 50, 800),
+            "latency_sla_ms": 2000,
+            "region": region,
+            "compliance_constraints": compliance,
+            "current_model": "",
+        },
+    })
+
+def intake_reply(message: str) -> str:
+    try:
+        workload = json.loads(message)
+    except json.JSONDecodeError:
+        return "INVALID INPUT – please provide the workload as JSON"
+    for key in CRITICAL_KEYS:
+        if not isinstance(workload.get(key), int) or workload[key] < 1:
+            return f"INVALID INPUT – missing or invalid {key}"
+    workload.setdefault("region", "Global")
+    workload.setdefault("compliance_constraints", [])
+    workload.setdefault("current_model", "")
+    return "```json\n" + json.dumps(workload, indent=2) + "\n```"
+
+def model_scorer_reply(message: str) -> str:
+    payload = json.loads(message)
+    sla = payload["workload"].get("latency_sla_ms", 0)
+    table = payload["cost_table"]
+    cheapest = min(model["monthly_cost"] for model in table) or 1.0
+    ranked = []
+    for model in table:
+        latency_ok = not sla or model["p90_latency_ms"] <= sla
+        ranked.append({
+            "model_name": model["model_name"],
+            "monthly_cost": model["monthly_cost"],
+            "p90_latency_ms": model["p90_latency_ms"],
+            "composite_score": round(model["monthly_cost"] / cheapest + (0 if latency_ok else 10), 4),
+            "context_adequate": True,
+            "latency_adequate": latency_ok,
+            "suitable": latency_ok,
+            "constraint_violations": [] if latency_ok else ["latency"],
+        })
+    ranked.sort(key=lambda model: model["composite_score"])
+    return json.dumps(ranked)
+
+def recommender_reply(message: str) -> str:
+    try:
+        payload = json.loads(message)
+        roi, ranked = payload["roi"], payload["ranked_models"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return "Implement the cheapest suitable model."
+    lines = [
+        f"Implement {roi['best_model']}; save ₹{roi['savings_per_month']} / month (ROI {roi['roi_percent']}%).",
+        "",
+        "| model_name | monthly_cost | p90_latency_ms | composite_score |",
+        "|---|---|---|---|",
+    ]
+    for model in ranked:
+        name = f"*{model['model_name']}*" if model["model_name"] == roi["best_model"] else model["model_name"]
+        lines.append(f"| {name} | {model['monthly_cost']} | {model['p90_latency_ms']} | {model.get('composite_score', '')} |")
+    return "\n".join(lines)
+
+REPLIES = {
+    "solution_architect": solution_architect_reply,
+    "intake": intake_reply,
+    "model_scorer": model_scorer_reply,
+    "recommender": recommender_reply,
+}
+
+def canned_reply(prompt: str) -> tuple[str, str]:
+    agent = detect_agent(prompt)
+    reply = REPLIES.get(agent)
+    try:
+        return agent, reply(_user_message(prompt)) if reply else "OK"
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return agent, "INVALID INPUT – could not read the request"
+
+def _usage(prompt: str, content: str) -> dict:
+    # ~4 characters per token is close enough for sizing
+    prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+def create_app(config: FakeConfig | None = None) -> FastAPI:
+    config = config or FakeConfig()
+    app = FastAPI(title="Fake OpenAI")
+    app.state.config = config
+    app.state.stats = {"requests": 0, "errors": 0, "by_agent": {}}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "".join(str(message.get("content", "")) for message in body.get("messages", []))
+        agent, content = canned_reply(prompt)
+        stats = app.state.stats
+        stats["requests"] += 1
+        stats["by_agent"][agent] = stats["by_agent"].get(agent, 0) + 1
+
+        latency_s = config.sample_latency_s(agent)
+        if config.random.random() < config.error_rate:
+            stats["errors"] += 1
+            await asyncio.sleep(latency_s / 4)
+            status = config.random.choice(config.error_statuses)
+            return JSONResponse({"error": {"message": "fake upstream error", "type": "server_error"}}, status_code=status)
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created, model = int(time.time()), body.get("model", "gpt-4o")
+        if not body.get("stream"):
+            await asyncio.sleep(latency_s)
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": _usage(prompt, content),
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+        chunks = [content[i:i + config.stream_chunk_chars] for i in range(0, len(content), config.stream_chunk_chars)]
+
+        async def events():
+            def chunk(choices, usage=None):
+                data = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                        "model": model, "choices": choices}
+                if usage is not None:
+                    data["usage"] = usage
+                return f"data: {json.dumps(data)}\n\n"
+
+            # A third of the latency before the first token, the rest spread over the chunks
+            await asyncio.sleep(latency_s / 3)
+            per_chunk = latency_s * 2 / 3 / max(len(chunks), 1)
+            yield chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+            for piece in chunks:
+                yield chunk([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                await asyncio.sleep(per_chunk)
+            yield chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if include_usage:
+                yield chunk([], _usage(prompt, content))
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def fake_stats():
+        return app.state.stats
+
+    return app
+
+def _parse_agent_latency(values: list[str]) -> dict:
+    latencies = {}
+    for value in values:
+        agent, _, ms = value.partition("=")
+        if agent not in AGENT_ROLES or not ms:
+            raise argparse.ArgumentTypeError(f"expected agent=ms with agent in {', '.join(AGENT_ROLES)}, got {value!r}")
+        latencies[agent] = float(ms)
+    return latencies
+
+def main() -> int:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="median latency per completion")
+    parser.add_argument("--sigma", type=float, default=0.5, help="log-normal shape; 0.5 puts p99 at ~3.2x the median")
+    parser.add_argument("--agent-latency-ms", action="append", default=[], metavar="AGENT=MS",
+                        help="per-agent median, e.g. recommender=2500 (repeatable)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-statuses", default="429,500,503")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        latency_ms=args.latency_ms,
+        sigma=args.sigma,
+        agent_latency_ms=_parse_agent_latency(args.agent_latency_ms),
+        error_rate=args.error_rate,
+        error_statuses=tuple(int(status) for status in args.error_statuses.split(",")),
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
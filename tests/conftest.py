@@ -0,0 +1,6 @@
+import os
+
+# app.config.Settings requires an API key at import time; tests never reach OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+# Keep the LLM response cache in memory so tests don't write to .cache/
+os.environ.setdefault("LLM_CACHE_DB_PATH", "")
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app import batch
+
+WORKLOAD = {
+    "calls_per_day": 1000,
+    "avg_input_tokens": 100,
+    "avg_output_tokens": 50,
+    "latency_sla_ms": 1000,
+    "region": "US",
+    "compliance_constraints": [],
+    "current_model": "",
+}
+
+async def chunked(*parts):
+    for part in parts:
+        yield part
+
+@pytest.mark.asyncio
+async def test_parse_ndjson_handles_lines_split_across_chunks():
+    items = [item async for item in batch.parse_ndjson(chunked(b'{"a": 1}\n{"a"', b': 2}\n\nnot json\n{"a": 3}'))]
+
+    assert items[:2] == [{"a": 1}, {"a": 2}]
+    assert isinstance(items[2], Exception)
+    assert items[3] == {"a": 3}
+
+@pytest.mark.asyncio
+async def test_analyze_reports_every_workload_and_a_summary(monkeypatch):
+    monkeypatch.setattr(batch.settings, "batch_chunk_size", 2)
+    workloads = [
+        {**WORKLOAD, "id": "a"},
+        {**WORKLOAD, "id": "b", "calls_per_day": 0},
+        {**WORKLOAD, "id": "c", "current_model": "gpt-4o"},
+        "not a workload",
+        {**WORKLOAD, "id": "e", "current_model": "missing-model"},
+        {**WORKLOAD, "id": "f", "region": "Europe", "compliance_constraints": ["HIPAA"]},
+    ]
+    lines = [line async for line in batch.analyze(batch.iterate(workloads))]
+
+    summary = lines.pop()
+    assert summary == {"status": "done", "total": 6, "succeeded": 3, "failed": 3}
+    by_index = {line["index"]: line for line in lines}
+    assert sorted(by_index) == [0, 1, 2, 3, 4, 5]
+    assert [m["model_name"] for m in by_index[5]["ranked_models"]] == ["gpt-4o-mini", "gpt-4o"]
+    assert by_index[0]["status"] == "ok" and by_index[0]["id"] == "a"
+    assert by_index[0]["ranked_models"][0]["model_name"] == "gpt-4o-mini"
+    assert by_index[2]["roi_analysis"]["current_model"] == "gpt-4o"
+    assert "calls_per_day" in by_index[1]["error"]
+    assert by_index[3]["status"] == "error"
+    assert "current_model not in list" in by_index[4]["error"]
+
+@pytest.mark.asyncio
+async def test_analyze_bounds_recommender_concurrency(monkeypatch):
+    monkeypatch.setattr(batch.settings, "batch_llm_concurrency", 2)
+    active, peak = 0, 0
+
+    async def recommender(self, inputs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return "Implement gpt-4o-mini"
+
+    monkeypatch.setattr(batch.EnterpriseAICostArchitect, "_stage_recommender", recommender)
+    lines = [line async for line in batch.analyze(batch.iterate([WORKLOAD] * 6), include_recommendation=True)]
+
+    assert lines[-1]["succeeded"] == 6
+    assert all(line["final_recommendation"] == "Implement gpt-4o-mini" for line in lines[:-1])
+    assert peak == 2
+
+def test_batch_endpoint_streams_ndjson():
+    from app.main import app
+
+    body = "\n".join(json.dumps({**WORKLOAD, "id": i}) for i in range(3))
+    with TestClient(app) as client:
+        response = client.post("/v1/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[-1] == {"status": "done", "total": 3, "succeeded": 3, "failed": 0}
+    assert sorted(line["id"] for line in lines[:-1]) == [0, 1, 2]
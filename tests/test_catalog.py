@@ -0,0 +1,77 @@
+import os
+import pytest
+from app.catalog import CatalogStore, CatalogError, parse_catalog
+
+CSV = "model_name,price_per_1k_tokens,latency_ms,context_window_tokens\n"
+
+def write(path, body, mtime_ns):
+    path.write_text(CSV + body)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_catalog_snapshot_is_indexed_and_sorted_by_price(tmp_path):
+    path = tmp_path / "catalog.csv"
+    write(path, "b,2.0,350,16000\na,10.0,500,128000\nc,0.6,300,128000\n", 1_000_000_000)
+    snapshot = CatalogStore(path, check_interval_s=0).get()
+
+    assert snapshot.model_names == ["c", "b", "a"]
+    assert snapshot.index == {"c": 0, "b": 1, "a": 2}
+    assert snapshot.row("a") == {
+        "model_name": "a", "price_per_1k_tokens": 10.0, "latency_ms": 500, "context_window_tokens": 128000,
+    }
+    assert snapshot.price_per_1k_tokens.tolist() == [0.6, 2.0, 10.0]
+    assert snapshot.version.startswith("v1-")
+
+def test_catalog_hot_reload_on_mtime_change(tmp_path):
+    path = tmp_path / "catalog.csv"
+    write(path, "a,1.0,100,1000\n", 1_000_000_000)
+    store = CatalogStore(path, check_interval_s=0)
+    first = store.get()
+    assert store.get() is first
+
+    write(path, "a,1.0,100,1000\nb,0.5,200,2000\n", 2_000_000_000)
+    second = store.get()
+    assert second is not first
+    assert second.model_names == ["b", "a"]
+    assert second.version != first.version
+
+    # A broken rewrite keeps serving the last good snapshot
+    write(path, "a,not-a-price,100,1000\n", 3_000_000_000)
+    assert store.get() is second
+
+def test_parse_catalog_rejects_bad_input():
+    with pytest.raises(CatalogError):
+        parse_catalog("model_name,price_per_1k_tokens\n")
+    with pytest.raises(CatalogError):
+        parse_catalog(CSV)
+    with pytest.raises(CatalogError):
+        parse_catalog(CSV + "a,1,1,1\na,2,2,2\n")
+
+def test_catalog_region_and_certification_bitsets(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        CSV.strip() + ",regions,certifications\n"
+        "us-only,1.0,100,1000,US,SOC 2\n"
+        "eu-hipaa,2.0,100,1000,Europe;US,GDPR;hipaa\n"
+        "anywhere,3.0,100,1000,,GDPR\n"
+    )
+    snapshot = CatalogStore(path, check_interval_s=0).get()
+
+    assert snapshot.region_bits == {"US": 0b011, "EU": 0b010, "GLOBAL": 0b100}
+    assert snapshot.certification_bits == {"SOC2": 0b001, "GDPR": 0b110, "HIPAA": 0b010}
+    assert snapshot.subset(snapshot.eligible_mask("eu-west-1")) == [1, 2]
+    assert snapshot.subset(snapshot.eligible_mask("US", ["soc-2"])) == [0]
+    assert snapshot.subset(snapshot.eligible_mask("EU", ["GDPR", "HIPAA"])) == [1]
+    assert snapshot.eligible_mask("Global") == snapshot.all_rows
+    # An undeclared region leaves the rows served everywhere; an undeclared certification leaves nothing
+    assert snapshot.subset(snapshot.eligible_mask("Mars")) == [2]
+    assert snapshot.eligible_mask("US", ["ISO 9001"]) == 0
+    assert snapshot.eligible_mask(None, ["GDPR", "ISO 9001"]) == 0
+
+def test_catalog_without_certifications_warns_instead_of_filtering(tmp_path, caplog):
+    path = tmp_path / "catalog.csv"
+    path.write_text(CSV.strip() + ",regions\nus-only,1.0,100,1000,US\nanywhere,3.0,100,1000,\n")
+    snapshot = CatalogStore(path, check_interval_s=0).get()
+
+    with caplog.at_level("WARNING", logger="app.catalog"):
+        assert snapshot.eligible_mask("US", ["HIPAA"]) == snapshot.all_rows
+    assert "declares no certifications" in caplog.text
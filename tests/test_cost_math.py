@@ -1,7 +1,9 @@
 import pytest
 import asyncio
+import numpy as np
 from app.agents import cost_engine, roi_calc
 from app.agents.base import InvalidInputError
+from app.catalog import CatalogSnapshot
 
 @pytest.mark.asyncio
 async def test_cost_engine_run_formula():
@@ -22,9 +24,8 @@ async def test_cost_engine_run_formula():
     assert gpt4o["monthly_cost"] == 45000.0
     assert gpt4o["p90_latency_ms"] == 500
     assert gpt4o["context_window_tokens"] == 128000
-    # Sorted by cost
-    assert results[0]["model_name"] == "gpt-3.5-turbo"
-    assert results[1]["model_name"] == "gpt-4o"
+    # Sorted by cost: gpt-4o-mini (0.6 per 1k) is the cheapest row in the catalog
+    assert [r["model_name"] for r in results] == ["gpt-4o-mini", "gpt-3.5-turbo", "gpt-4o"]
 
 @pytest.mark.asyncio
 async def test_cost_engine_run_invalid():
@@ -35,6 +36,39 @@ async def test_cost_engine_run_invalid():
     with pytest.raises(InvalidInputError):
         await cost_engine.run({"calls_per_day": 1, "avg_input_tokens": "bad", "avg_output_tokens": 1})
 
+@pytest.mark.asyncio
+async def test_cost_engine_run_batch_matches_run():
+    rng = np.random.default_rng(0)
+    calls = rng.integers(1, 100_000, 500)
+    inputs = rng.integers(1, 5_000, 500)
+    outputs = rng.integers(1, 3_000, 500)
+    batch = cost_engine.run_batch(calls, inputs, outputs)
+    assert batch["monthly_cost"].shape == (500, len(batch["model_names"]))
+    for i in range(500):
+        results = await cost_engine.run({
+            "calls_per_day": int(calls[i]),
+            "avg_input_tokens": int(inputs[i]),
+            "avg_output_tokens": int(outputs[i]),
+        })
+        assert [r["model_name"] for r in results] == batch["model_names"]
+        assert [r["monthly_cost"] for r in results] == batch["monthly_cost"][i].tolist()
+
+@pytest.mark.asyncio
+async def test_cost_engine_rejects_compliance_no_model_holds():
+    workload = {"calls_per_day": 1000, "avg_input_tokens": 100, "avg_output_tokens": 50, "region": "EU"}
+    results = await cost_engine.run({**workload, "compliance_constraints": ["HIPAA"]})
+    assert [r["model_name"] for r in results] == ["gpt-4o-mini", "gpt-4o"]
+    with pytest.raises(InvalidInputError, match="FedRAMP"):
+        await cost_engine.run({**workload, "compliance_constraints": ["HIPAA", "FedRAMP"]})
+
+def test_cost_engine_run_batch_invalid():
+    with pytest.raises(InvalidInputError):
+        cost_engine.run_batch([1, 2], [1, 2], [1])
+    with pytest.raises(InvalidInputError):
+        cost_engine.run_batch([0], [1], [1])
+    with pytest.raises(InvalidInputError):
+        cost_engine.run_batch([1.5], [1], [1])
+
 @pytest.mark.asyncio
 async def test_roi_calc_run_formula():
     payload = {
@@ -82,4 +116,47 @@ async def test_roi_calc_run_invalid():
     with pytest.raises(InvalidInputError):
         await roi_calc.run({"workload": {}, "ranked_models": [{"model_name": "gpt-3.5-turbo", "monthly_cost": 9000.0}], "current_model": "gpt-4o"})
     with pytest.raises(InvalidInputError):
-        await roi_calc.run({"workload": {}, "ranked_models": [{"model_name": "gpt-3.5-turbo"}], "current_model": "gpt-3.5-turbo"}) 
\ No newline at end of file
+        await roi_calc.run({"workload": {}, "ranked_models": [{"model_name": "gpt-3.5-turbo"}], "current_model": "gpt-3.5-turbo"}) 
+@pytest.mark.asyncio
+async def test_cost_engine_run_filters_by_region_and_compliance():
+    workload = {"calls_per_day": 1000, "avg_input_tokens": 100, "avg_output_tokens": 50}
+    everything = await cost_engine.run({**workload, "region": "Global", "compliance_constraints": []})
+    europe = await cost_engine.run({**workload, "region": "Europe", "compliance_constraints": ["GDPR"]})
+    hipaa = await cost_engine.run({**workload, "region": "us-east-1", "compliance_constraints": ["HIPAA"]})
+
+    assert len(everything) == 3
+    assert [r["model_name"] for r in europe] == ["gpt-4o-mini", "gpt-4o"]
+    assert [r["model_name"] for r in hipaa] == ["gpt-4o-mini", "gpt-4o"]
+    assert europe[0] == everything[0]
+
+
+@pytest.mark.asyncio
+async def test_cost_engine_run_rejects_when_no_model_is_eligible(monkeypatch):
+    snapshot = CatalogSnapshot("test", [
+        {"model_name": "us-model", "price_per_1k_tokens": 1.0, "latency_ms": 100, "context_window_tokens": 1000,
+         "regions": ["US"], "certifications": []},
+        {"model_name": "eu-model", "price_per_1k_tokens": 2.0, "latency_ms": 100, "context_window_tokens": 1000,
+         "regions": ["EU"], "certifications": ["HIPAA"]},
+    ])
+    monkeypatch.setattr(cost_engine, "get_catalog", lambda: snapshot)
+    workload = {"calls_per_day": 1000, "avg_input_tokens": 100, "avg_output_tokens": 50}
+
+    with pytest.raises(InvalidInputError):
+        await cost_engine.run({**workload, "region": "US", "compliance_constraints": ["HIPAA"]})
+
+@pytest.mark.asyncio
+async def test_roi_uses_current_model_filtered_out_by_region():
+    from app.agents import scoring
+    from app.agents.conductor import EnterpriseAICostArchitect
+
+    workload = {"calls_per_day": 1000, "avg_input_tokens": 100, "avg_output_tokens": 50, "latency_sla_ms": 1000,
+                "region": "EU", "compliance_constraints": [], "current_model": "gpt-3.5-turbo"}
+    cost_table = await cost_engine.run(workload)
+    ranked = await scoring.run({"workload": workload, "cost_table": cost_table})
+    assert "gpt-3.5-turbo" not in [m["model_name"] for m in ranked]
+
+    roi = await EnterpriseAICostArchitect()._stage_roi_calc({"intake": workload, "model_scorer": ranked})
+
+    assert roi["current_model"] == "gpt-3.5-turbo"
+    assert roi["best_model"] == ranked[0]["model_name"]
+    assert roi["savings_per_month"] == cost_engine.current_model_row(workload)["monthly_cost"] - ranked[0]["monthly_cost"]
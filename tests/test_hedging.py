@@ -0,0 +1,96 @@
+import asyncio
+import types
+import pytest
+from app import metrics
+from app.adapters import hedging, llm_cache, openai_client
+from app.config import settings
+
+def _fake_response(content: str):
+    message = types.SimpleNamespace(content=content)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+@pytest.fixture
+def hedger(monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_min_samples", 5)
+    monkeypatch.setattr(settings, "llm_hedge_min_delay_ms", 1.0)
+    hedging.reset()
+    yield hedging.get_hedger()
+    hedging.reset()
+
+def test_percentile_waits_for_enough_samples():
+    tracker = hedging.LatencyTracker(window=10)
+    for ms in range(1, 5):
+        tracker.record("intake", ms / 1000)
+    assert tracker.percentile("intake", 95, min_samples=5) is None
+    for ms in range(5, 21):
+        tracker.record("intake", ms / 1000)
+    # Only the last 10 samples (11..20 ms) are kept
+    assert tracker.percentile("intake", 50, min_samples=5) == 0.015
+    assert tracker.percentile("intake", 95, min_samples=5) == 0.02
+
+@pytest.mark.asyncio
+async def test_slow_chat_is_hedged_and_the_duplicate_wins(monkeypatch, hedger):
+    monkeypatch.setattr(settings, "llm_hedging_enabled", True)
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    llm_cache.close_cache()
+    await openai_client.close_client()
+    client = openai_client.init_client()
+    for _ in range(5):
+        hedger.latencies.record("intake", 0.01)
+    calls, cancelled = [], []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        return _fake_response(f"answer {len(calls)}")
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    won = metrics.LLM_HEDGES.value(agent="intake", outcome="won")
+    result = await openai_client.chat(prompt="p", model="gpt-4o", temperature=0.2, top_p=1.0, timeout_s=5, agent="intake")
+
+    assert result == "answer 2"
+    assert len(calls) == 2 and cancelled == [True]
+    assert hedger.stats()["hedges_won"] == 1
+    assert metrics.LLM_HEDGES.value(agent="intake", outcome="won") == won + 1
+    assert openai_client.get_stats()["in_flight"] == 0
+    await openai_client.close_client()
+
+@pytest.mark.asyncio
+async def test_hedges_stay_within_budget(monkeypatch, hedger):
+    hedger.budget = hedging.HedgeBudget(ratio=0.05, burst=1.0)
+    # Every call runs past the hedge delay
+    monkeypatch.setattr(hedger, "hedge_delay", lambda agent: 0.001)
+
+    async def slow():
+        await asyncio.sleep(0.004)
+        return "ok"
+
+    for _ in range(40):
+        assert await hedger.run("model_scorer", slow) == "ok"
+
+    stats = hedger.stats()
+    # One from the burst plus 5% of 40 calls
+    assert 1 <= stats["hedges_issued"] <= 3
+    assert stats["budget_exhausted"] >= 37
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back_to_the_hedge(hedger):
+    for _ in range(5):
+        hedger.latencies.record("intake", 0.001)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream 500")
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    assert await hedger.run("intake", flaky) == "ok"
+    assert len(attempts) == 2
@@ -0,0 +1,78 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app import json_patch
+from app.agents.recommender import RecommenderAgent
+
+WORKLOAD = {
+    "calls_per_day": 1000,
+    "avg_input_tokens": 100,
+    "avg_output_tokens": 50,
+    "latency_sla_ms": 1000,
+    "region": "US",
+    "compliance_constraints": [],
+    "current_model": "",
+}
+
+@pytest.mark.parametrize("old, new", [
+    ({"a": 1, "b": [1, 2, 3]}, {"a": 2, "b": [1, 2, 3]}),
+    ({"a": 1, "gone": True}, {"a": 1, "new/key~": {"x": [1]}}),
+    ({"rows": [{"n": 1}, {"n": 2}, {"n": 3}]}, {"rows": [{"n": 1}]}),
+    ({"rows": [1]}, {"rows": [1, 2, 3]}),
+    ({"v": None}, {"v": "text"}),
+    ({"v": 1}, {"v": 1.0}),
+    ([1, 2], {"now": "an object"}),
+])
+def test_diff_then_apply_round_trips(old, new):
+    patch = json_patch.diff(old, new)
+    patched = json_patch.apply(old, patch)
+    assert patched == new
+    assert json_patch.diff(new, patched) == []
+
+def test_diff_emits_only_changed_leaves():
+    old = {"table": [{"model": "a", "cost": 1.0}, {"model": "b", "cost": 2.0}], "same": {"x": 1}}
+    new = {"table": [{"model": "a", "cost": 1.0}, {"model": "b", "cost": 4.0}], "same": {"x": 1}}
+    assert json_patch.diff(old, new) == [{"op": "replace", "path": "/table/1/cost", "value": 4.0}]
+    assert json_patch.diff(old, old) == []
+
+def test_update_params_returns_a_patch_against_a_known_revision(monkeypatch):
+    from app.main import app
+
+    async def recommender(self, message):
+        return "Implement gpt-4o-mini"
+
+    monkeypatch.setattr(RecommenderAgent, "run", recommender)
+    with TestClient(app) as client:
+        first = client.post("/v1/chat/update-params", json={
+            "modified_workload": WORKLOAD, "original_data": {"solution_architect": None},
+        }).json()["structured_data"]
+        assert first["data_revision"]
+
+        update = {"session_id": first["session_id"], "workload_changes": {"latency_sla_ms": 3000}}
+        delta = client.post("/v1/chat/update-params", json={**update, "base_revision": first["data_revision"]})
+        full = client.post("/v1/chat/update-params", json=update).json()["structured_data"]
+        unknown = client.post("/v1/chat/update-params", json={**update, "base_revision": "not-a-revision"}).json()
+
+    body = delta.json()
+    assert body["structured_data"] is None
+    assert body["base_revision"] == first["data_revision"]
+    assert body["data_revision"] and body["data_revision"] != first["data_revision"]
+    # Volatile fields are not part of the patched document
+    assert not any(op["path"].startswith(("/stage_timings_ms", "/data_revision")) for op in body["patch"])
+    patched = json_patch.apply(first, body["patch"])
+    assert patched["workload_params"]["latency_sla_ms"] == 3000
+    ignore = {"data_revision", "stage_timings_ms"}
+    assert {k: v for k, v in patched.items() if k not in ignore} == {k: v for k, v in full.items() if k not in ignore}
+
+    # The patched object, with the returned data_revision, serves as the next base
+    with TestClient(app) as client:
+        again = client.post("/v1/chat/update-params", json={
+            "session_id": first["session_id"], "workload_changes": {"latency_sla_ms": 4000},
+            "base_revision": body["data_revision"],
+        }).json()
+    assert again["base_revision"] == body["data_revision"]
+    assert json_patch.apply(patched, again["patch"])["workload_params"]["latency_sla_ms"] == 4000
+    assert len(delta.content) < len(json.dumps(full)) / 2
+    # The server no longer has (or never had) the base: full object
+    assert unknown["patch"] is None
+    assert unknown["structured_data"]["workload_params"]["latency_sla_ms"] == 3000
@@ -0,0 +1,137 @@
+import json
+import types
+import pytest
+from app import metrics
+from app.adapters import hedging, llm_cache, openai_client
+from app.agents.json_utils import JSONStreamExtractor, extract_json_from_text, is_json_response
+from app.config import settings
+
+NESTED = {"opt_task": "triage", "architecture": ["a", "b"], "workload": {"calls_per_day": 10, "region": "EU"}}
+
+@pytest.mark.parametrize("text", [
+    json.dumps(NESTED),
+    "```json\n" + json.dumps(NESTED, indent=2) + "\n```\nLet me know if you need changes.",
+    "Here is the workload {as requested} [v2]:\n" + json.dumps(NESTED) + "\nNote: {region} may change.",
+])
+def test_extracts_nested_objects(text):
+    assert extract_json_from_text(text) == NESTED
+
+def test_brackets_inside_strings_do_not_end_the_value():
+    value = {"note": "use } and ] freely \\\" {", "items": [[1, 2], {"x": "]"}]}
+    assert extract_json_from_text("Result: " + json.dumps(value) + " done") == value
+
+def test_array_of_objects_is_returned_whole():
+    ranked = [{"model_name": "a", "constraint_violations": []}, {"model_name": "b", "constraint_violations": ["latency"]}]
+    assert extract_json_from_text("Ranked:\n" + json.dumps(ranked)) == ranked
+
+def test_no_json_raises():
+    with pytest.raises(json.JSONDecodeError):
+        extract_json_from_text("INVALID INPUT – missing calls_per_day {please}")
+    assert not is_json_response("What is your calls_per_day?")
+
+def test_extractor_completes_on_the_closing_bracket():
+    text = "```json\n" + json.dumps(NESTED) + "\n```\nTrailing commentary."
+    extractor = JSONStreamExtractor()
+    closing = text.index("```", 3)
+    fed = 0
+    for i in range(0, len(text), 5):
+        fed = i + 5
+        if extractor.feed(text[i:i + 5]):
+            break
+    assert extractor.complete and extractor.value == NESTED
+    assert fed < closing + 5
+
+@pytest.mark.asyncio
+async def test_chat_until_stops_reading_once_the_json_is_complete(monkeypatch):
+    llm_cache.close_cache()
+    await openai_client.close_client()
+    client = openai_client.init_client()
+    pieces = ['Sure: {"calls_per_day": ', '10, "nested": {"a": [1]}', '}\nAnything else', " I can help with?"]
+    read, closed, calls = [], [], []
+
+    class FakeStream:
+        def __init__(self):
+            self.chunks = iter(pieces)
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            content = next(self.chunks, None)
+            if content is None:
+                raise StopAsyncIteration
+            read.append(content)
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=content))])
+
+        async def close(self):
+            closed.append(True)
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return FakeStream()
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    kwargs = dict(prompt="p", model="gpt-4o", temperature=0.2, top_p=1.0, timeout_s=5, agent="intake",
+                  cache_if=is_json_response)
+    completion_tokens = metrics.LLM_TOKENS.value(agent="intake", model="gpt-4o", kind="completion")
+    text = await openai_client.chat_until(**kwargs, stop_when=JSONStreamExtractor().feed)
+
+    assert extract_json_from_text(text) == {"calls_per_day": 10, "nested": {"a": [1]}}
+    assert read == pieces[:3] and closed == [True]
+    # Closed before the usage chunk: tokens are estimated from the text received
+    assert metrics.LLM_TOKENS.value(agent="intake", model="gpt-4o", kind="completion") == completion_tokens + len(text) // 4
+    # The early-stopped text is cached like a completed response
+    assert await openai_client.chat_until(**kwargs, stop_when=JSONStreamExtractor().feed) == text
+    assert len(calls) == 1
+
+    async def complete(**kwargs):
+        calls.append(kwargs)
+        message = types.SimpleNamespace(content='{"calls_per_day": 10}')
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    # Disabled: a plain (hedgeable) chat() call
+    monkeypatch.setattr(settings, "llm_stream_json_enabled", False)
+    monkeypatch.setattr(client.chat.completions, "create", complete)
+    llm_cache.close_cache()
+    assert await openai_client.chat_until(**kwargs, stop_when=JSONStreamExtractor().feed) == '{"calls_per_day": 10}'
+    assert "stream" not in calls[-1]
+    llm_cache.close_cache()
+    await openai_client.close_client()
+
+@pytest.mark.asyncio
+async def test_chat_until_is_hedged_when_hedging_is_on(monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(settings, "llm_hedging_enabled", True)
+    llm_cache.close_cache()
+    await openai_client.close_client()
+    client = openai_client.init_client()
+    hedged = []
+
+    class FakeStream:
+        def __aiter__(self):
+            self.chunks = iter(['{"ok": ', 'true}', " trailing"])
+            return self
+
+        async def __anext__(self):
+            content = next(self.chunks, None)
+            if content is None:
+                raise StopAsyncIteration
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=content))])
+
+        async def close(self):
+            pass
+
+    async def create(**kwargs):
+        return FakeStream()
+
+    async def run(agent, call):
+        hedged.append(agent)
+        return await call()
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    monkeypatch.setattr(hedging.get_hedger(), "run", run)
+    text = await openai_client.chat_until(prompt="p", model="gpt-4o", temperature=0.2, top_p=1.0, timeout_s=5,
+                                          agent="intake", stop_when=JSONStreamExtractor().feed)
+    assert text == '{"ok": true}'
+    assert hedged == ["intake"]
+    await openai_client.close_client()
@@ -0,0 +1,50 @@
+import pytest
+from app.adapters import llm_cache
+from app.adapters.llm_cache import LLMCache
+
+@pytest.mark.asyncio
+async def test_cache_lru_eviction_and_ttl(monkeypatch):
+    cache = LLMCache(max_entries=2, ttl_s=60)
+    for name in ("a", "b", "c"):
+        await cache.set(name, name.upper())
+
+    assert await cache.get("a") is None
+    assert await cache.get("c") == "C"
+    assert cache.stats()["evictions"] == 1
+
+    now = llm_cache.time.time()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now + 120)
+    assert await cache.get("c") is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 2
+
+@pytest.mark.asyncio
+async def test_cache_disk_tier_warm_start(tmp_path):
+    db_path = str(tmp_path / "cache" / "llm.sqlite3")
+    key = llm_cache.make_key("gpt-4o", 0.7, 0.9, "prompt")
+    first = LLMCache(max_entries=10, ttl_s=60, db_path=db_path)
+    await first.set(key, "cached answer")
+    first.close()
+
+    restarted = LLMCache(max_entries=10, ttl_s=60, db_path=db_path)
+    assert restarted.stats()["warm_loaded"] == 1
+    assert await restarted.get(key, "recommender") == "cached answer"
+    assert restarted.stats()["by_agent"]["recommender"] == {"hits": 1, "misses": 0}
+
+    # A second worker sharing the file sees writes from the first through the disk tier
+    other_worker = LLMCache(max_entries=10, ttl_s=60, db_path=db_path)
+    await restarted.set("fresh", "value")
+    assert await other_worker.get("fresh") == "value"
+    assert other_worker.stats()["disk_hits"] == 1
+    restarted.close()
+    other_worker.close()
+
+def test_make_key_depends_on_every_field():
+    base = llm_cache.make_key("gpt-4o", 0.7, 0.9, "prompt")
+    assert base == llm_cache.make_key("gpt-4o", 0.7, 0.9, "prompt")
+    assert base != llm_cache.make_key("gpt-4o-mini", 0.7, 0.9, "prompt")
+    assert base != llm_cache.make_key("gpt-4o", 0.2, 0.9, "prompt")
+    assert base != llm_cache.make_key("gpt-4o", 0.7, 1.0, "prompt")
+    assert base != llm_cache.make_key("gpt-4o", 0.7, 0.9, "prompt!")
@@ -0,0 +1,72 @@
+import json
+import random
+import httpx
+import openai
+import pytest
+from app.adapters import openai_client, llm_cache, scheduler
+from app.config import settings
+from loadtest import driver
+from loadtest.fake_openai import FakeConfig, canned_reply, create_app
+
+def use_fake_openai(config: FakeConfig):
+    """Point the shared OpenAI client at the fake server in-process."""
+    fake = create_app(config)
+    openai_client._client = openai.AsyncOpenAI(
+        api_key="loadtest",
+        base_url="http://fake-openai/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=fake)),
+    )
+    openai_client._scheduler = scheduler.Scheduler(settings.openai_max_in_flight)
+    return fake
+
+def test_canned_replies_match_the_calling_agent():
+    from app.agents.configs import INTAKE_CLARIFIER, SOLUTION_ARCHITECT_OPT_EXTRACTOR
+
+    prompt = f"{SOLUTION_ARCHITECT_OPT_EXTRACTOR['agent_role']}\n\n...\n\nUser message: 12,000 GDPR tickets a day in Europe"
+    agent, reply = canned_reply(prompt)
+    workload = json.loads(reply)["workload"]
+    assert agent == "solution_architect"
+    assert workload["calls_per_day"] == 12000
+    assert workload["region"] == "EU" and workload["compliance_constraints"] == ["GDPR"]
+
+    agent, reply = canned_reply(f"{INTAKE_CLARIFIER['agent_role']}\n\nUser message: {json.dumps({'calls_per_day': 5})}")
+    assert agent == "intake"
+    assert reply.startswith("INVALID INPUT")
+
+def test_fake_server_injects_errors():
+    from fastapi.testclient import TestClient
+
+    with TestClient(create_app(FakeConfig(latency_ms=0, error_rate=1.0, seed=1))) as client:
+        response = client.post("/v1/chat/completions", json={"model": "gpt-4o", "messages": [{"role": "user", "content": "x"}]})
+        stats = client.get("/stats").json()
+
+    assert response.status_code in (429, 500, 503)
+    assert stats == {"requests": 1, "errors": 1, "by_agent": {"unknown": 1}}
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert driver.percentile(values, 50) == 50.0
+    assert driver.percentile(values, 99) == 99.0
+    assert driver.percentile([0.2], 95) == 0.2
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_sessions", [False, True])
+async def test_driver_replays_mixed_traffic_against_the_fake(monkeypatch, use_sessions):
+    from app.main import app
+
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    llm_cache.close_cache()
+    await openai_client.close_client()
+    fake = use_fake_openai(FakeConfig(latency_ms=0, seed=3))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api") as client:
+        load = driver.Driver(client, driver.parse_mix("chat=1,interactive=1,update=2"), random.Random(5),
+                             use_sessions=use_sessions)
+        report = await load.run_closed_loop(duration_s=1.0, concurrency=4)
+
+    assert report["requests"] > 0
+    assert report["error_rate"] == 0.0, report
+    assert set(report["endpoints"]) == {"chat", "interactive", "update"}
+    assert {"intake", "solution_architect", "recommender"} <= set(fake.state.stats["by_agent"])
+    await openai_client.close_client()
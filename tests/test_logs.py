@@ -0,0 +1,108 @@
+import logging
+import queue
+import pytest
+from app import logs
+from app.config import settings
+
+class Recorder(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+@pytest.fixture
+def captured(monkeypatch):
+    monkeypatch.setattr(settings, "log_level", "INFO")
+    handler = Recorder()
+    handler.addFilter(logs.RequestLevelFilter(logging.INFO))
+    logger = logging.getLogger("app.test_logs")
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    yield logger, handler.records
+    logger.removeHandler(handler)
+
+async def _serve(headers: list) -> None:
+    async def app(scope, receive, send):
+        logging.getLogger("app.test_logs").debug("debug %s", "detail")
+        logging.getLogger("app.test_logs").info("info")
+        logging.getLogger("app.test_logs").warning("warning")
+
+    await logs.LogContextMiddleware(app)({"type": "http", "headers": headers}, None, None)
+
+def test_filtered_payload_is_never_serialized():
+    class Exploding:
+        def __str__(self):
+            raise AssertionError("formatted a filtered record")
+
+    handler = logs._DroppingQueueHandler(queue.Queue())
+    handler.addFilter(logs.RequestLevelFilter(logging.INFO))
+    handler.handle(logging.LogRecord("app", logging.DEBUG, __file__, 1, "Payload: %s", (logs.payload(Exploding()),), None))
+    assert handler.queue.empty()
+
+def test_payload_truncates_long_text_and_lists(monkeypatch):
+    monkeypatch.setattr(settings, "log_payload_max_items", 2)
+    assert str(logs.payload("x" * 50, 10)) == "x" * 10 + "... (40 more chars)"
+    assert str(logs.payload([1, 2, 3, 4])) == "[1, 2] ... (2 more items)"
+    assert str(logs.payload({"a": 1})) == '{"a": 1}'
+
+def test_filter_uses_base_level_outside_requests(captured):
+    logger, records = captured
+    logger.debug("hidden")
+    logger.info("shown")
+    assert [r.getMessage() for r in records] == ["shown"]
+
+@pytest.mark.asyncio
+async def test_header_raises_verbosity_for_one_request(captured, monkeypatch):
+    monkeypatch.setattr(settings, "log_verbosity_header_enabled", True)
+    _, records = captured
+    await _serve([(b"x-log-level", b"debug")])
+    assert [r.getMessage() for r in records] == ["debug detail", "info", "warning"]
+    records.clear()
+    await _serve([])
+    assert [r.getMessage() for r in records] == ["info", "warning"]
+
+@pytest.mark.asyncio
+async def test_header_is_ignored_when_disabled(captured, monkeypatch):
+    monkeypatch.setattr(settings, "log_verbosity_header_enabled", False)
+    _, records = captured
+    await _serve([(b"x-log-level", b"debug")])
+    assert [r.getMessage() for r in records] == ["info", "warning"]
+
+@pytest.mark.asyncio
+async def test_unsampled_requests_keep_only_warnings(captured, monkeypatch):
+    monkeypatch.setattr(settings, "log_sample_rate", 0.0)
+    _, records = captured
+    await _serve([])
+    assert [r.getMessage() for r in records] == ["warning"]
+
+def test_full_queue_drops_instead_of_blocking(monkeypatch):
+    monkeypatch.setattr(settings, "log_max_message_chars", 20)
+    handler = logs._DroppingQueueHandler(queue.Queue(1))
+    dropped = logs._stats["dropped"]
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "payload %s", ("y" * 100,), None)
+    handler.handle(record)
+    handler.handle(logging.LogRecord("app", logging.INFO, __file__, 1, "second", None, None))
+    assert logs._stats["dropped"] == dropped + 1
+    queued = handler.queue.get_nowait()
+    assert queued.getMessage() == "payload yyyyyyyyyyyy... (88 more chars)"
+
+def test_app_loggers_drop_filtered_calls_before_building_a_record(monkeypatch):
+    logs.setup()
+    logger = logging.getLogger("app.agents.conductor")
+    assert isinstance(logger, logs.RequestLevelLogger)
+    assert not getattr(logging.getLogger("httpx"), "per_request", False)
+    monkeypatch.setattr(logger, "makeRecord", lambda *args, **kwargs: pytest.fail("built a filtered record"))
+
+    token = logs._request_level.set(logging.INFO)
+    try:
+        logger.debug("hidden %s", "detail")
+    finally:
+        logs._request_level.reset(token)
+    token = logs._request_level.set(logging.DEBUG)
+    try:
+        assert logger.isEnabledFor(logging.DEBUG)
+    finally:
+        logs._request_level.reset(token)
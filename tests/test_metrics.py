@@ -0,0 +1,74 @@
+import types
+import pytest
+from fastapi.testclient import TestClient
+from app import metrics
+from app.adapters import openai_client, llm_cache
+from app.agents.pipeline import Pipeline, Stage
+from app.config import settings
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_latency_seconds", "Test.", ["stage"], buckets=(0.1, 1.0))
+    metrics._registry.remove(histogram)
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5.0, stage="a")
+
+    assert histogram.render() == [
+        "# HELP test_latency_seconds Test.",
+        "# TYPE test_latency_seconds histogram",
+        'test_latency_seconds_bucket{stage="a",le="0.1"} 1',
+        'test_latency_seconds_bucket{stage="a",le="1"} 2',
+        'test_latency_seconds_bucket{stage="a",le="+Inf"} 3',
+        'test_latency_seconds_sum{stage="a"} 5.55',
+        'test_latency_seconds_count{stage="a"} 3',
+    ]
+
+@pytest.mark.asyncio
+async def test_pipeline_records_stage_durations_and_failures():
+    async def ok(inputs):
+        return 1
+
+    async def broken(inputs):
+        raise ValueError("boom")
+
+    before = metrics.STAGE_DURATION.count(stage="metrics_ok")
+    failures = metrics.STAGE_FAILURES.value(stage="metrics_broken")
+    await Pipeline([Stage("metrics_ok", ok), Stage("metrics_broken", broken, deps=["metrics_ok"])]).run()
+
+    assert metrics.STAGE_DURATION.count(stage="metrics_ok") == before + 1
+    assert metrics.STAGE_FAILURES.value(stage="metrics_broken") == failures + 1
+
+@pytest.mark.asyncio
+async def test_chat_counts_tokens_from_usage(monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    llm_cache.close_cache()
+    await openai_client.close_client()
+    client = openai_client.init_client()
+
+    async def create(**kwargs):
+        message = types.SimpleNamespace(content="ok")
+        usage = types.SimpleNamespace(prompt_tokens=120, completion_tokens=30)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    prompt_before = metrics.LLM_TOKENS.value(agent="metrics_test", model="gpt-4o", kind="prompt")
+    await openai_client.chat(prompt="p", model="gpt-4o", temperature=0.2, top_p=1.0, timeout_s=5, agent="metrics_test")
+
+    assert metrics.LLM_TOKENS.value(agent="metrics_test", model="gpt-4o", kind="prompt") == prompt_before + 120
+    assert metrics.LLM_TOKENS.value(agent="metrics_test", model="gpt-4o", kind="completion") >= 30
+    assert metrics.LLM_REQUESTS.value(agent="metrics_test", outcome="ok") >= 1
+    await openai_client.close_client()
+
+def test_metrics_endpoint_exports_text_format():
+    from app.main import app
+
+    with TestClient(app) as client:
+        client.get("/healthz")
+        response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert "# TYPE cost_architect_stage_duration_seconds histogram" in body
+    assert 'cost_architect_http_requests_total{path="/healthz",status="200"}' in body
+    assert "cost_architect_http_requests_in_flight 1" in body
+    assert "cost_architect_helpful_guidance_total" in body
@@ -0,0 +1,121 @@
+import asyncio
+import types
+import pytest
+from app.adapters import openai_client, llm_cache
+from app.agents.json_utils import is_json_response
+from app.config import settings
+
+def _fake_response(content: str):
+    message = types.SimpleNamespace(content=content)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+@pytest.mark.asyncio
+async def test_chat_reuses_client_and_bounds_concurrency(monkeypatch):
+    monkeypatch.setattr(settings, "openai_max_in_flight", 2)
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    llm_cache.close_cache()
+    await openai_client.close_client()
+    client = openai_client.init_client()
+    peak = {"current": 0, "max": 0}
+
+    async def create(**kwargs):
+        peak["current"] += 1
+        peak["max"] = max(peak["max"], peak["current"])
+        await asyncio.sleep(0.01)
+        peak["current"] -= 1
+        return _fake_response("ok")
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    results = await asyncio.gather(*[
+        openai_client.chat(prompt="p", model="gpt-4o", temperature=0.2, top_p=1.0, timeout_s=5)
+        for _ in range(6)
+    ])
+
+    assert results == ["ok"] * 6
+    assert openai_client.init_client() is client
+    assert peak["max"] == 2
+    assert openai_client.get_stats()["in_flight"] == 0
+
+    await openai_client.close_client()
+    assert openai_client.init_client() is not client
+    await openai_client.close_client()
+
+@pytest.mark.asyncio
+async def test_chat_serves_repeated_prompts_from_cache(monkeypatch):
+    llm_cache.close_cache()
+    await openai_client.close_client()
+    client = openai_client.init_client()
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return _fake_response(f"answer {len(calls)}")
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    first = await openai_client.chat(prompt="same", model="gpt-4o", temperature=0.7, top_p=0.9, timeout_s=5, agent="intake")
+    second = await openai_client.chat(prompt="same", model="gpt-4o", temperature=0.7, top_p=0.9, timeout_s=5, agent="intake")
+    third = await openai_client.chat(prompt="same", model="gpt-4o", temperature=0.2, top_p=0.9, timeout_s=5, agent="intake")
+
+    assert first == second == "answer 1"
+    assert third == "answer 2"
+    assert len(calls) == 2
+
+    llm_cache.init_cache().set_agent_enabled("intake", False)
+    assert await openai_client.chat(prompt="same", model="gpt-4o", temperature=0.7, top_p=0.9, timeout_s=5, agent="intake") == "answer 3"
+
+    llm_cache.close_cache()
+    await openai_client.close_client()
+
+@pytest.mark.asyncio
+async def test_chat_does_not_cache_rejected_responses(monkeypatch):
+    llm_cache.close_cache()
+    await openai_client.close_client()
+    client = openai_client.init_client()
+    replies = iter(["INVALID INPUT – missing calls_per_day", "not json", '{"ok": true}', "unused"])
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return _fake_response(next(replies))
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    kwargs = dict(prompt="p", model="gpt-4o", temperature=0.7, top_p=0.9, timeout_s=5, agent="intake", cache_if=is_json_response)
+    assert (await openai_client.chat(**kwargs)).startswith("INVALID INPUT")
+    assert await openai_client.chat(**kwargs) == "not json"
+    assert await openai_client.chat(**kwargs) == '{"ok": true}'
+    assert await openai_client.chat(**kwargs) == '{"ok": true}'
+    assert len(calls) == 3
+
+    llm_cache.close_cache()
+    await openai_client.close_client()
+
+@pytest.mark.asyncio
+async def test_abandoned_chat_stream_releases_slot_and_upstream(monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    llm_cache.close_cache()
+    await openai_client.close_client()
+    client = openai_client.init_client()
+
+    class FakeStream:
+        closed = False
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content="tok"))])
+
+        async def close(self):
+            FakeStream.closed = True
+
+    async def create(**kwargs):
+        return FakeStream()
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    deltas = openai_client.chat_stream(prompt="p", model="gpt-4o", temperature=0.7, top_p=0.9, timeout_s=5, agent="recommender")
+    assert await deltas.__anext__() == "tok"
+    await deltas.aclose()
+
+    assert FakeStream.closed
+    assert openai_client.get_stats()["in_flight"] == 0
+    await openai_client.close_client()
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import pytest
+from app.agents.conductor import EnterpriseAICostArchitect
+from app.agents.pipeline import Pipeline, Stage, StageFailed, StageMemo
+
+WORKLOAD = {
+    "calls_per_day": 1000,
+    "avg_input_tokens": 100,
+    "avg_output_tokens": 50,
+    "latency_sla_ms": 1000,
+    "region": "US",
+    "compliance_constraints": [],
+    "current_model": "",
+}
+
+@pytest.mark.asyncio
+async def test_independent_stages_run_concurrently():
+    both_started = asyncio.Barrier(2)
+
+    async def left(inputs):
+        await asyncio.wait_for(both_started.wait(), timeout=1.0)
+        return inputs["x"] + 1
+
+    async def right(inputs):
+        await asyncio.wait_for(both_started.wait(), timeout=1.0)
+        return inputs["x"] * 10
+
+    async def join(inputs):
+        return inputs["left"] + inputs["right"]
+
+    pipeline = Pipeline([
+        Stage("left", left, deps=["x"]),
+        Stage("right", right, deps=["x"]),
+        Stage("join", join, deps=["left", "right"]),
+    ])
+    result = await pipeline.run({"x": 2})
+
+    assert result.ok
+    assert result.outputs["join"] == 23
+    assert set(result.timings_ms) == {"left", "right", "join"}
+
+@pytest.mark.asyncio
+async def test_failure_cancels_running_stages():
+    cancelled = asyncio.Event()
+
+    async def slow(inputs):
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def broken(inputs):
+        raise ValueError("bad workload")
+
+    async def after(inputs):
+        return "unreachable"
+
+    pipeline = Pipeline([
+        Stage("slow", slow, deps=["x"]),
+        Stage("broken", broken, deps=["x"]),
+        Stage("after", after, deps=["slow", "broken"]),
+    ])
+    result = await pipeline.run({"x": 1})
+
+    assert result.failed_stage == "broken"
+    assert cancelled.is_set()
+    assert "after" not in result.outputs
+    with pytest.raises(StageFailed):
+        result.raise_for_failure()
+
+@pytest.mark.asyncio
+async def test_cached_outputs_resume_without_upstream_stages():
+    calls = []
+
+    async def stage(inputs):
+        calls.append(len(calls))
+        return len(calls)
+
+    pipeline = Pipeline([
+        Stage("a", stage, deps=["x"]),
+        Stage("b", stage, deps=["a"]),
+        Stage("c", stage, deps=["b"]),
+    ])
+    result = await pipeline.run({"b": 5}, targets=["c"])
+
+    assert result.ok
+    assert calls == [0]
+    assert list(result.timings_ms) == ["c"]
+
+@pytest.mark.asyncio
+async def test_conductor_precheck_fails_before_intake_returns(monkeypatch):
+    conductor = EnterpriseAICostArchitect()
+    intake_cancelled = asyncio.Event()
+
+    async def slow_intake(message):
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            intake_cancelled.set()
+            raise
+
+    monkeypatch.setattr(conductor.intake_agent, "run", slow_intake)
+    workload = {**WORKLOAD, "latency_sla_ms": 0}
+    result = await asyncio.wait_for(conductor.run_interactive(json.dumps(workload)), timeout=1.0)
+
+    assert intake_cancelled.is_set()
+    assert result.workload_params is None
+    assert "more details" in result.final_recommendation
+
+@pytest.mark.asyncio
+async def test_conductor_run_and_interactive_share_the_pipeline(monkeypatch):
+    conductor = EnterpriseAICostArchitect()
+
+    async def intake(message):
+        return json.dumps(WORKLOAD)
+
+    async def recommender(message):
+        return "Implement gpt-4o-mini"
+
+    monkeypatch.setattr(conductor.intake_agent, "run", intake)
+    monkeypatch.setattr(conductor.recommender, "run", recommender)
+
+    assert await conductor.run(json.dumps(WORKLOAD)) == "Implement gpt-4o-mini"
+    result = await conductor.run_interactive(json.dumps(WORKLOAD))
+    assert result.final_recommendation == "Implement gpt-4o-mini"
+    assert {"intake", "precheck", "cost_engine", "model_scorer", "roi_calc", "recommender"} <= set(result.stage_timings_ms)
+
+@pytest.mark.asyncio
+async def test_conductor_precheck_leaves_repairable_values_to_intake(monkeypatch):
+    conductor = EnterpriseAICostArchitect()
+    seen = []
+
+    async def intake(message):
+        seen.append(json.loads(message))
+        return json.dumps(WORKLOAD)
+
+    async def recommender(message):
+        return "Implement gpt-4o-mini"
+
+    monkeypatch.setattr(conductor.intake_agent, "run", intake)
+    monkeypatch.setattr(conductor.recommender, "run", recommender)
+    workload = {**WORKLOAD, "calls_per_day": 1000.0, "avg_input_tokens": "12,000"}
+    result = await conductor.run_interactive(json.dumps(workload))
+
+    assert seen[0]["avg_input_tokens"] == "12,000"
+    assert result.final_recommendation == "Implement gpt-4o-mini"
+
+@pytest.mark.asyncio
+async def test_memo_reuses_stages_whose_read_fields_did_not_change():
+    calls = []
+
+    def stage(name, compute):
+        async def run(inputs):
+            calls.append(name)
+            return compute(inputs)
+        return run
+
+    pipeline = Pipeline([
+        Stage("cost", stage("cost", lambda i: i["workload"]["volume"] * 2), deps=["workload"], reads={"workload": ["volume"]}),
+        Stage("rank", stage("rank", lambda i: (i["cost"], i["workload"]["sla"])), deps=["workload", "cost"],
+              reads={"workload": ["sla"]}),
+        Stage("unkeyed", stage("unkeyed", lambda i: i["cost"]), deps=["cost"]),
+    ])
+    memo = StageMemo()
+    await pipeline.run({"workload": {"volume": 1, "sla": 10}}, memo=memo)
+    assert calls == ["cost", "rank", "unkeyed"]
+
+    calls.clear()
+    result = await pipeline.run({"workload": {"volume": 1, "sla": 20}}, memo=memo)
+    assert calls == ["rank", "unkeyed"]
+    assert result.reused == ["cost"]
+    assert result.outputs["rank"] == (2, 20)
+
+    # A changed upstream output changes the downstream key too
+    calls.clear()
+    result = await pipeline.run({"workload": {"volume": 3, "sla": 20}}, memo=memo)
+    assert calls == ["cost", "rank", "unkeyed"]
+    assert result.outputs["rank"] == (6, 20)
+
+    calls.clear()
+    result = await pipeline.run({"workload": {"volume": 1, "sla": 10}}, memo=memo)
+    assert calls == ["unkeyed"]
+    assert result.reused == ["cost", "rank"]
+
+def test_memo_evicts_least_recently_used():
+    memo = StageMemo(max_entries=2)
+    memo.put("a", 1)
+    memo.put("b", 2)
+    assert memo.get("a") == 1
+    memo.put("c", 3)
+    assert memo.get("a") == 1
+    assert "b" not in memo._entries
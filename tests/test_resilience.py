@@ -0,0 +1,194 @@
+import asyncio
+import json
+import time
+import types
+import httpx
+import openai
+import pytest
+import pytest_asyncio
+from app import metrics
+from app.adapters import llm_cache, openai_client, resilience
+from app.agents.conductor import EnterpriseAICostArchitect
+from app.agents.recommender import RecommenderAgent, render_recommendation
+from app.config import settings
+
+def _fake_response(content: str):
+    message = types.SimpleNamespace(content=content)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+def _timeout():
+    return openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+@pytest_asyncio.fixture
+async def client(monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(settings, "llm_retry_base_delay_s", 0.0)
+    monkeypatch.setattr(settings, "llm_breaker_failure_threshold", 3)
+    llm_cache.close_cache()
+    resilience.reset()
+    await openai_client.close_client()
+    yield openai_client.init_client()
+    await openai_client.close_client()
+    resilience.reset()
+
+CHAT = dict(prompt="p", model="gpt-4o", temperature=0.2, top_p=1.0, timeout_s=5, agent="intake")
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried(monkeypatch, client):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        if len(calls) < 3:
+            raise _timeout()
+        return _fake_response("ok")
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    retries = metrics.LLM_RETRIES.value(agent="intake")
+
+    assert await openai_client.chat(**CHAT) == "ok"
+    assert len(calls) == 3
+    assert metrics.LLM_RETRIES.value(agent="intake") == retries + 2
+    assert resilience.get_stats()["gpt-4o"]["state"] == "closed"
+
+@pytest.mark.asyncio
+async def test_other_errors_are_not_retried(monkeypatch, client):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        raise ValueError("bad request")
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    with pytest.raises(ValueError):
+        await openai_client.chat(**CHAT)
+    assert len(calls) == 1
+    assert resilience.get_stats()["gpt-4o"]["consecutive_failures"] == 0
+
+@pytest.mark.asyncio
+async def test_breaker_opens_fails_fast_and_recovers_after_a_probe(monkeypatch, client):
+    calls = []
+    healthy = {"value": False}
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        if not healthy["value"]:
+            raise _timeout()
+        return _fake_response("ok")
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    with pytest.raises(resilience.LLMUnavailableError):
+        await openai_client.chat(**CHAT)
+    assert len(calls) == 3
+    assert resilience.get_stats()["gpt-4o"]["state"] == "open"
+
+    with pytest.raises(resilience.CircuitOpenError):
+        await openai_client.chat(**CHAT)
+    assert len(calls) == 3
+
+    # After the reset window one probe goes through and closes the circuit
+    monkeypatch.setattr(settings, "llm_breaker_reset_s", 0.0)
+    healthy["value"] = True
+    assert await openai_client.chat(**CHAT) == "ok"
+    assert resilience.get_stats()["gpt-4o"] == {"state": "closed", "consecutive_failures": 0, "opened": 1, "rejected": 1}
+
+@pytest.mark.asyncio
+async def test_agents_use_the_configured_timeout(monkeypatch, client):
+    seen = []
+
+    class FakeStream:
+        def __init__(self):
+            self.chunks = iter(['{"ok": true}'])
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            content = next(self.chunks, None)
+            if content is None:
+                raise StopAsyncIteration
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=content))])
+
+        async def close(self):
+            pass
+
+    async def create(**kwargs):
+        seen.append(kwargs["timeout"])
+        return FakeStream() if kwargs.get("stream") else _fake_response('{"ok": true}')
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    monkeypatch.setattr(settings, "model_timeout_s", 7)
+    await EnterpriseAICostArchitect().intake_agent.run("{}")
+    assert seen == [pytest.approx(7, abs=0.5)]
+
+@pytest.mark.asyncio
+async def test_retries_share_one_deadline(monkeypatch, client):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs["timeout"])
+        # A stalled upstream that ignores its own timeout
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    start = time.monotonic()
+    with pytest.raises(resilience.LLMUnavailableError):
+        await openai_client.chat(**{**CHAT, "timeout_s": 0.2})
+    assert time.monotonic() - start < 1.0
+    assert calls and all(timeout <= 0.2 for timeout in calls)
+    assert len(calls) == 1 or calls[1] < calls[0]
+
+ROI_INPUT = {
+    "workload": {"calls_per_day": 1000, "avg_input_tokens": 300, "avg_output_tokens": 100, "current_model": "gpt-4o"},
+    "current_model": "gpt-4o",
+    "ranked_models": [
+        {"model_name": "gpt-4o-mini", "monthly_cost": 18.0, "p90_latency_ms": 400, "composite_score": 1.0},
+        {"model_name": "gpt-4o", "monthly_cost": 60.0, "p90_latency_ms": 500, "composite_score": 2.6},
+    ],
+    "roi": {"current_model": "gpt-4o", "best_model": "gpt-4o-mini", "savings_per_month": 42.0, "roi_percent": 70.0,
+            "payback_weeks": 4},
+}
+
+def test_render_recommendation_follows_the_synthesizer_format():
+    text = render_recommendation(ROI_INPUT)
+    lines = text.splitlines()
+    assert lines[0] == "Switch from gpt-4o to gpt-4o-mini; save ₹42.0 / month (ROI 70.0%, payback 4 weeks)."
+    assert "| *gpt-4o-mini* | 18.0 | 400 | 1.0 |" in lines
+    assert lines[-1] == "- Cost driver: input tokens (300 of 400 tokens per call)"
+
+@pytest.mark.asyncio
+async def test_recommender_falls_back_when_the_circuit_is_open(monkeypatch):
+    async def unavailable(**kwargs):
+        raise resilience.CircuitOpenError("circuit open for gpt-4o")
+
+    async def unavailable_stream(**kwargs):
+        raise resilience.CircuitOpenError("circuit open for gpt-4o")
+        yield
+
+    monkeypatch.setattr(openai_client, "chat", unavailable)
+    monkeypatch.setattr(openai_client, "chat_stream", unavailable_stream)
+    fallbacks = metrics.LLM_FALLBACKS.value(agent="recommender")
+    agent = RecommenderAgent()
+
+    assert await agent.run(json.dumps(ROI_INPUT)) == render_recommendation(ROI_INPUT)
+    assert [delta async for delta in agent.stream(json.dumps(ROI_INPUT))] == [render_recommendation(ROI_INPUT)]
+    assert metrics.LLM_FALLBACKS.value(agent="recommender") == fallbacks + 2
+
+@pytest.mark.asyncio
+async def test_llm_scorer_falls_back_to_native_ranking(monkeypatch):
+    monkeypatch.setattr(settings, "model_scorer_mode", "llm")
+    conductor = EnterpriseAICostArchitect()
+
+    async def unavailable(message):
+        raise resilience.CircuitOpenError("circuit open for gpt-4o")
+
+    monkeypatch.setattr(conductor.model_scorer, "run", unavailable)
+    workload = {"avg_input_tokens": 100, "avg_output_tokens": 50, "latency_sla_ms": 1000}
+    cost_table = [
+        {"model_name": "a", "monthly_cost": 10.0, "p90_latency_ms": 300, "context_window_tokens": 8000},
+        {"model_name": "b", "monthly_cost": 5.0, "p90_latency_ms": 2000, "context_window_tokens": 8000},
+    ]
+
+    ranked = await conductor._rank_models(workload, cost_table)
+    assert [m["model_name"] for m in ranked] == ["a", "b"]
+    assert ranked[1]["constraint_violations"] == ["latency_too_high"]
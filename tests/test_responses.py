@@ -0,0 +1,33 @@
+import json
+from app.responses import ModelJSONResponse
+from app.schemas import CostModel, InteractiveResponse, ROIAnalysis, RankedModel, StructuredResponse
+
+COST_TABLE = [
+    {"model_name": "gpt-4o-mini", "monthly_cost": 1.5, "p90_latency_ms": 400, "context_window_tokens": 128000},
+    {"model_name": "gpt-4o", "monthly_cost": 45000.0, "p90_latency_ms": 500, "context_window_tokens": 128000},
+]
+RANKED = [
+    {**row, "composite_score": 0.64, "context_adequate": True, "latency_adequate": True, "suitable": True,
+     "constraint_violations": []}
+    for row in COST_TABLE
+]
+ROI = {"current_model": "gpt-4o", "best_model": "gpt-4o-mini", "savings_per_month": 44998.5,
+       "roi_percent": 100.0, "payback_weeks": 4}
+
+def test_orjson_response_renders_the_same_json_as_pydantic():
+    response = InteractiveResponse(structured_data=StructuredResponse(
+        cost_table=[CostModel(**row) for row in COST_TABLE],
+        ranked_models=[RankedModel(**row) for row in RANKED],
+        roi_analysis=ROIAnalysis(**ROI),
+        final_recommendation="Implement gpt-4o-mini",
+        stage_timings_ms={"cost_engine": 0.5},
+    ))
+    rendered = ModelJSONResponse(response)
+    assert rendered.media_type == "application/json"
+    assert json.loads(rendered.body) == json.loads(response.model_dump_json())
+
+def test_float_fields_render_as_floats():
+    # The ROI engine returns int 0 when nothing is saved; clients must still see a float
+    roi = ROIAnalysis.model_construct(**{**ROI, "savings_per_month": 0, "roi_percent": 0})
+    body = ModelJSONResponse({"roi_analysis": roi}).body
+    assert b'"roi_percent":0.0' in body and b'"savings_per_month":0.0' in body
@@ -0,0 +1,169 @@
+import asyncio
+import types
+import pytest
+from app import metrics
+from app.adapters import llm_cache, openai_client, scheduler
+from app.adapters.resilience import LLMUnavailableError
+from app.config import settings
+
+@pytest.mark.asyncio
+async def test_free_slot_goes_to_the_most_urgent_class():
+    sched = scheduler.Scheduler(max_in_flight=1)
+    held = await sched.acquire("gpt-4o", 10, scheduler.BATCH)
+    waiting = {name: asyncio.create_task(sched.acquire("gpt-4o", 10, name))
+               for name in (scheduler.BATCH, scheduler.ANALYSIS, scheduler.INTERACTIVE)}
+    await asyncio.sleep(0)
+    assert sched.stats()["classes"][scheduler.BATCH]["queued"] == 1
+    assert metrics.LLM_QUEUE_DEPTH.value(priority=scheduler.INTERACTIVE) == 1
+
+    order = []
+    grant = held
+    for _ in range(3):
+        sched.release(grant)
+        pending = {task: name for name, task in waiting.items() if name not in order}
+        done, _ = await asyncio.wait(pending, timeout=1, return_when=asyncio.FIRST_COMPLETED)
+        assert len(done) == 1
+        task = done.pop()
+        order.append(pending[task])
+        grant = task.result()
+    assert order == [scheduler.INTERACTIVE, scheduler.ANALYSIS, scheduler.BATCH]
+    assert metrics.LLM_QUEUE_DEPTH.value(priority=scheduler.INTERACTIVE) == 0
+    assert sched.stats()["classes"][scheduler.BATCH]["granted"] == 2
+
+@pytest.mark.asyncio
+async def test_full_queue_and_missed_deadline_are_shed(monkeypatch):
+    monkeypatch.setattr(settings, "llm_queue_max_depth", {**settings.llm_queue_max_depth, "interactive": 1})
+    monkeypatch.setattr(settings, "llm_queue_max_wait_s", {**settings.llm_queue_max_wait_s, "interactive": 0.05})
+    sched = scheduler.Scheduler(max_in_flight=1)
+    held = await sched.acquire("gpt-4o", 10, scheduler.ANALYSIS)
+
+    waiting = asyncio.create_task(sched.acquire("gpt-4o", 10, scheduler.INTERACTIVE))
+    await asyncio.sleep(0)
+    with pytest.raises(scheduler.SchedulerRejectedError, match="full"):
+        await sched.acquire("gpt-4o", 10, scheduler.INTERACTIVE)
+    with pytest.raises(scheduler.SchedulerRejectedError, match="deadline"):
+        await waiting
+
+    stats = sched.stats()["classes"][scheduler.INTERACTIVE]
+    assert (stats["rejected_full"], stats["dropped_deadline"], stats["queued"]) == (1, 1, 0)
+    sched.release(held)
+    assert sched.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_rate_limits_are_per_model_and_drop_requests_that_cannot_make_their_deadline(monkeypatch):
+    # One minute's budget is 2 requests; the third would wait ~30 s, past any interactive deadline
+    monkeypatch.setattr(settings, "llm_rpm_limits", {"gpt-4o": 2})
+    monkeypatch.setattr(settings, "llm_tpm_limits", {"*": 60_000})
+    sched = scheduler.Scheduler(max_in_flight=10)
+    grants = [await sched.acquire("gpt-4o", 10, scheduler.INTERACTIVE) for _ in range(2)]
+    with pytest.raises(scheduler.SchedulerRejectedError, match="rate limit"):
+        await sched.acquire("gpt-4o", 10, scheduler.INTERACTIVE)
+    # Other models have their own buckets
+    grants.append(await sched.acquire("gpt-4o-mini", 10, scheduler.INTERACTIVE))
+
+    # Usage below the estimate is refunded to the TPM bucket
+    limits = sched._model_limits("gpt-4o-mini")
+    before = limits.tpm.tokens
+    sched.release(grants.pop(), used_tokens=4)
+    assert limits.tpm.tokens == before + 6
+    for grant in grants:
+        sched.release(grant)
+
+@pytest.mark.asyncio
+async def test_request_waits_for_its_bucket_to_refill(monkeypatch):
+    monkeypatch.setattr(settings, "llm_tpm_limits", {"gpt-4o": 60_000})
+    sched = scheduler.Scheduler(max_in_flight=10)
+    first = await sched.acquire("gpt-4o", 59_950, scheduler.ANALYSIS)
+    # 1,000 tokens a second: the next 100 fit after ~50 ms, and a batch call must not jump ahead
+    analysis = asyncio.create_task(sched.acquire("gpt-4o", 100, scheduler.ANALYSIS))
+    batch = asyncio.create_task(sched.acquire("gpt-4o", 10, scheduler.BATCH))
+    await asyncio.sleep(0)
+    assert not analysis.done() and not batch.done()
+
+    grant = await asyncio.wait_for(analysis, 1)
+    assert grant.waited_s >= 0.04
+    for granted in (first, grant, await asyncio.wait_for(batch, 1)):
+        sched.release(granted)
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    sched = scheduler.Scheduler(max_in_flight=1)
+    held = await sched.acquire("gpt-4o", 10, scheduler.ANALYSIS)
+    waiting = asyncio.create_task(sched.acquire("gpt-4o", 10, scheduler.BATCH))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert sched.stats()["classes"][scheduler.BATCH]["queued"] == 0
+    sched.release(held)
+    assert sched.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_chat_queues_in_the_callers_priority_class(monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(settings, "llm_rpm_limits", {"gpt-4o": 1})
+    llm_cache.close_cache()
+    await openai_client.close_client()
+    client = openai_client.init_client()
+
+    async def create(**kwargs):
+        message = types.SimpleNamespace(content="ok")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    kwargs = dict(prompt="p", model="gpt-4o", temperature=0.2, top_p=1.0, timeout_s=5, agent="intake")
+    with scheduler.priority(scheduler.INTERACTIVE):
+        assert await openai_client.chat(**kwargs) == "ok"
+        # Shed requests surface as LLMUnavailableError, which the agents already fall back on
+        with pytest.raises(LLMUnavailableError):
+            await openai_client.chat(**kwargs)
+
+    stats = openai_client.get_scheduler_stats()
+    assert stats["classes"][scheduler.INTERACTIVE]["granted"] == 1
+    assert stats["classes"][scheduler.INTERACTIVE]["dropped_deadline"] == 1
+    assert stats["in_flight"] == 0
+    assert metrics.LLM_REQUESTS.value(agent="intake", outcome="shed") >= 1
+    await openai_client.close_client()
+
+@pytest.mark.asyncio
+async def test_each_stream_open_attempt_is_admitted_on_its_own(monkeypatch):
+    monkeypatch.setattr(settings, "llm_cache_enabled", False)
+    monkeypatch.setattr(settings, "llm_retry_base_delay_s", 0.0)
+    llm_cache.close_cache()
+    await openai_client.close_client()
+    client = openai_client.init_client()
+    # One slot: the retry is only admitted if the failed open gave its grant back
+    monkeypatch.setattr(openai_client, "_scheduler", scheduler.Scheduler(max_in_flight=1))
+    opens = []
+
+    class FakeStream:
+        def __aiter__(self):
+            self.chunks = iter(["o", "k"])
+            return self
+
+        async def __anext__(self):
+            content = next(self.chunks, None)
+            if content is None:
+                raise StopAsyncIteration
+            # The grant is held while the stream is read
+            assert openai_client._scheduler.in_flight == 1
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=content))])
+
+        async def close(self):
+            pass
+
+    async def create(**kwargs):
+        opens.append(kwargs)
+        if len(opens) == 1:
+            raise asyncio.TimeoutError()
+        return FakeStream()
+
+    monkeypatch.setattr(client.chat.completions, "create", create)
+    chunks = [chunk async for chunk in openai_client.chat_stream(
+        prompt="p", model="gpt-4o", temperature=0.2, top_p=1.0, timeout_s=5, agent="intake")]
+
+    assert chunks == ["o", "k"] and len(opens) == 2
+    stats = openai_client.get_scheduler_stats()
+    assert stats["classes"][scheduler.ANALYSIS]["granted"] == 2
+    assert stats["in_flight"] == 0
+    await openai_client.close_client()
@@ -0,0 +1,97 @@
+import pytest
+from app.agents import scoring
+from app.agents.base import InvalidInputError
+
+COST_TABLE = [
+    {"model_name": "gpt-4o-mini", "monthly_cost": 2700.0, "p90_latency_ms": 300, "context_window_tokens": 128000},
+    {"model_name": "gpt-3.5-turbo", "monthly_cost": 9000.0, "p90_latency_ms": 350, "context_window_tokens": 16000},
+    {"model_name": "gpt-4o", "monthly_cost": 45000.0, "p90_latency_ms": 500, "context_window_tokens": 128000},
+]
+
+def documented_score(row, workload, min_cost, cost_weight=0.6, latency_weight=0.4, penalty=10):
+    """MODEL_SCORER agent_instructions, step 3-4, written out literally."""
+    context_adequate = row["context_window_tokens"] >= workload["avg_input_tokens"] + workload["avg_output_tokens"]
+    latency_adequate = row["p90_latency_ms"] <= workload["latency_sla_ms"]
+    base_score = (
+        cost_weight * (row["monthly_cost"] / min_cost)
+        + latency_weight * (row["p90_latency_ms"] / workload["latency_sla_ms"])
+    )
+    return base_score if context_adequate and latency_adequate else base_score + penalty
+
+@pytest.mark.asyncio
+async def test_scoring_matches_documented_formula():
+    workload = {"calls_per_day": 1000, "avg_input_tokens": 100, "avg_output_tokens": 50, "latency_sla_ms": 400}
+    ranked = await scoring.run({"workload": workload, "cost_table": COST_TABLE})
+
+    assert [m["model_name"] for m in ranked] == ["gpt-4o-mini", "gpt-3.5-turbo", "gpt-4o"]
+    for model in ranked:
+        row = next(r for r in COST_TABLE if r["model_name"] == model["model_name"])
+        assert model["composite_score"] == pytest.approx(documented_score(row, workload, 2700.0), abs=1e-4)
+        assert model["monthly_cost"] == row["monthly_cost"]
+        assert model["p90_latency_ms"] == row["p90_latency_ms"]
+
+    gpt4o = ranked[-1]
+    assert gpt4o["latency_adequate"] is False
+    assert gpt4o["suitable"] is False
+    assert gpt4o["constraint_violations"] == ["latency_too_high"]
+    assert ranked[0]["suitable"] is True
+    assert ranked[0]["constraint_violations"] == []
+
+@pytest.mark.asyncio
+async def test_scoring_context_penalty_and_weights():
+    workload = {"calls_per_day": 10, "avg_input_tokens": 15000, "avg_output_tokens": 2000, "latency_sla_ms": 1000}
+    ranked = await scoring.run(
+        {"workload": workload, "cost_table": COST_TABLE},
+        cost_weight=0.2, latency_weight=0.8, violation_penalty=100.0,
+    )
+    gpt35 = next(m for m in ranked if m["model_name"] == "gpt-3.5-turbo")
+    assert gpt35["constraint_violations"] == ["context_window_too_small"]
+    assert gpt35["composite_score"] == pytest.approx(
+        documented_score(COST_TABLE[1], workload, 2700.0, 0.2, 0.8, 100.0), abs=1e-4
+    )
+    assert ranked[-1]["model_name"] == "gpt-3.5-turbo"
+
+@pytest.mark.asyncio
+async def test_scoring_invalid():
+    with pytest.raises(InvalidInputError):
+        await scoring.run({})
+    with pytest.raises(InvalidInputError):
+        await scoring.run({"workload": {"avg_input_tokens": 1, "avg_output_tokens": 1}, "cost_table": COST_TABLE})
+    with pytest.raises(InvalidInputError):
+        await scoring.run({
+            "workload": {"avg_input_tokens": 1, "avg_output_tokens": 1, "latency_sla_ms": 100},
+            "cost_table": [],
+        })
+
+def test_pareto_frontier_keeps_only_non_dominated_rows():
+    table = COST_TABLE + [
+        # Dominated by gpt-4o-mini: dearer, slower, same context
+        {"model_name": "slow-mini", "monthly_cost": 3000.0, "p90_latency_ms": 320, "context_window_tokens": 128000},
+        # Dearest but the only 1M-token context: stays on the frontier
+        {"model_name": "long-context", "monthly_cost": 60000.0, "p90_latency_ms": 900, "context_window_tokens": 1000000},
+        # Fastest of all: stays even though it is dearer than gpt-4o-mini
+        {"model_name": "fast", "monthly_cost": 5000.0, "p90_latency_ms": 100, "context_window_tokens": 8000},
+        # Exact duplicate of a frontier row does not dominate it
+        {"model_name": "gpt-4o-mini-copy", "monthly_cost": 2700.0, "p90_latency_ms": 300, "context_window_tokens": 128000},
+    ]
+    frontier = scoring.pareto_frontier(table)
+
+    assert [row["model_name"] for row in frontier] == ["gpt-4o-mini", "gpt-4o-mini-copy", "fast", "long-context"]
+
+def test_pareto_frontier_matches_brute_force():
+    import random
+    rng = random.Random(7)
+    table = [
+        {"model_name": f"m{i}", "monthly_cost": float(rng.randint(0, 20)),
+         "p90_latency_ms": rng.randint(0, 20), "context_window_tokens": rng.randint(0, 20)}
+        for i in range(400)
+    ]
+
+    def dominates(q, p):
+        no_worse = (q["monthly_cost"] <= p["monthly_cost"] and q["p90_latency_ms"] <= p["p90_latency_ms"]
+                    and q["context_window_tokens"] >= p["context_window_tokens"])
+        key = lambda r: (r["monthly_cost"], r["p90_latency_ms"], r["context_window_tokens"])
+        return no_worse and key(q) != key(p)
+
+    expected = {p["model_name"] for p in table if not any(dominates(q, p) for q in table)}
+    assert {row["model_name"] for row in scoring.pareto_frontier(table)} == expected
@@ -0,0 +1,120 @@
+import pytest
+from fastapi.testclient import TestClient
+from app import sessions
+from app.agents.conductor import EnterpriseAICostArchitect
+
+WORKLOAD = {
+    "calls_per_day": 1000,
+    "avg_input_tokens": 100,
+    "avg_output_tokens": 50,
+    "latency_sla_ms": 1000,
+    "region": "US",
+    "compliance_constraints": [],
+    "current_model": "",
+}
+
+@pytest.fixture
+def conductor(monkeypatch):
+    conductor = EnterpriseAICostArchitect()
+
+    async def recommender(message):
+        return "Implement gpt-4o-mini"
+
+    monkeypatch.setattr(conductor.recommender, "run", recommender)
+    return conductor
+
+def test_store_evicts_least_recently_used():
+    store = sessions.SessionStore(max_entries=2)
+    first = store.create(None, WORKLOAD)
+    second = store.create(None, WORKLOAD)
+    store.get(first)
+    store.create(None, WORKLOAD)
+    assert store.get(second) is None
+    assert store.get(first) is not None
+    assert store.stats()["evicted"] == 1
+
+def test_store_expires_idle_sessions(monkeypatch):
+    store = sessions.SessionStore(ttl_s=10)
+    now = [100.0]
+    monkeypatch.setattr(sessions.time, "monotonic", lambda: now[0])
+    session_id = store.create(None, WORKLOAD)
+    now[0] += 8
+    assert store.get(session_id) is not None
+    now[0] += 8
+    assert store.get(session_id) is not None
+    now[0] += 11
+    assert store.get(session_id) is None
+    assert store.stats()["expired"] == 1
+
+@pytest.mark.asyncio
+async def test_update_with_session_sends_only_changed_fields(conductor):
+    first = await conductor.run_interactive(modified_workload=WORKLOAD, original_data={"solution_architect": {"opt_task": "x"}})
+    assert first.session_id
+
+    updated = await conductor.run_interactive(session_id=first.session_id, workload_changes={"calls_per_day": 2000})
+    assert updated.session_id == first.session_id
+    assert updated.workload_params.calls_per_day == 2000
+    assert updated.workload_params.avg_input_tokens == 100
+    assert updated.solution_architect == {"opt_task": "x"}
+    assert updated.cost_table[0].monthly_cost == pytest.approx(first.cost_table[0].monthly_cost * 2)
+
+    # Changes accumulate on the session
+    again = await conductor.run_interactive(session_id=first.session_id, workload_changes={"latency_sla_ms": 3000})
+    assert again.workload_params.calls_per_day == 2000
+    assert again.workload_params.latency_sla_ms == 3000
+
+@pytest.mark.asyncio
+async def test_unknown_session_falls_back_to_original_data(conductor):
+    with pytest.raises(sessions.SessionNotFoundError):
+        await conductor.run_interactive(session_id="missing", workload_changes={"calls_per_day": 2000})
+
+    result = await conductor.run_interactive(
+        session_id="missing", modified_workload=WORKLOAD, original_data={"solution_architect": None}
+    )
+    assert result.session_id not in (None, "missing")
+
+@pytest.mark.asyncio
+async def test_update_with_only_original_data_reuses_its_session(conductor):
+    first = await conductor.run_interactive(modified_workload=WORKLOAD, original_data={"solution_architect": None})
+    created = sessions.get_store().stats()["created"]
+
+    # An older client echoing the previous structured_data on every tick
+    updated = await conductor.run_interactive(
+        modified_workload={**WORKLOAD, "calls_per_day": 3000}, original_data=first.model_dump()
+    )
+    assert updated.session_id == first.session_id
+    assert updated.workload_params.calls_per_day == 3000
+    assert sessions.get_store().stats()["created"] == created
+
+def test_update_params_endpoint_reports_unknown_session():
+    from app.main import app
+
+    with TestClient(app) as client:
+        response = client.post("/v1/chat/update-params", json={"session_id": "missing", "workload_changes": {"calls_per_day": 5}})
+    assert response.status_code == 404
+    assert "original_data" in response.json()["detail"]
+
+@pytest.mark.asyncio
+async def test_session_update_reruns_only_affected_stages(conductor, monkeypatch):
+    from app.agents import cost_engine
+
+    runs = []
+    original = cost_engine.run
+
+    async def counting(workload):
+        runs.append(workload["calls_per_day"])
+        return await original(workload)
+
+    monkeypatch.setattr(cost_engine, "run", counting)
+    first = await conductor.run_interactive(modified_workload=WORKLOAD, original_data={"solution_architect": None})
+
+    updated = await conductor.run_interactive(session_id=first.session_id, workload_changes={"latency_sla_ms": 200})
+    assert runs == [1000]
+    assert updated.cost_table == first.cost_table
+    assert all(not model.latency_adequate for model in updated.ranked_models)
+    assert "cost_engine" not in updated.stage_timings_ms
+    assert "pareto_frontier" not in updated.stage_timings_ms
+
+    scaled = await conductor.run_interactive(session_id=first.session_id, workload_changes={"calls_per_day": 2000})
+    assert runs == [1000, 2000]
+    assert scaled.cost_table[0].monthly_cost == pytest.approx(first.cost_table[0].monthly_cost * 2)
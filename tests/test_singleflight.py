@@ -0,0 +1,84 @@
+import asyncio
+import json
+import pytest
+from app import singleflight
+from app.agents.conductor import EnterpriseAICostArchitect
+
+WORKLOAD = {
+    "calls_per_day": 1000,
+    "avg_input_tokens": 100,
+    "avg_output_tokens": 50,
+    "latency_sla_ms": 1000,
+    "region": "US",
+    "compliance_constraints": [],
+    "current_model": "",
+}
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_computation():
+    group = singleflight.SingleFlight()
+    release = asyncio.Event()
+    runs = []
+
+    async def produce():
+        runs.append(1)
+        await release.wait()
+        return "result"
+
+    callers = [asyncio.create_task(group.do("key", produce)) for _ in range(4)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*callers) == ["result"] * 4
+    assert runs == [1]
+    assert group.stats() == {"calls": 4, "executions": 1, "coalesced": 3, "coalescing_ratio": 0.75, "in_flight": 0}
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_shared_computation():
+    group = singleflight.SingleFlight()
+    release = asyncio.Event()
+
+    async def produce():
+        await release.wait()
+        return "result"
+
+    first = asyncio.create_task(group.do("key", produce))
+    second = asyncio.create_task(group.do("key", produce))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "result"
+
+def test_normalized_messages_share_a_key():
+    assert singleflight.make_key("chat", singleflight.normalize_message("  We process   500 emails ")) == \
+        singleflight.make_key("chat", singleflight.normalize_message("We process 500 emails"))
+    assert singleflight.normalize_message('{"b": 1, "a": 2}') == singleflight.normalize_message('{"a": 2,  "b": 1}')
+
+@pytest.mark.asyncio
+async def test_identical_interactive_requests_run_the_pipeline_once(monkeypatch):
+    monkeypatch.setattr(singleflight, "_group", singleflight.SingleFlight())
+    release = asyncio.Event()
+    intake_calls = []
+
+    async def intake(message):
+        intake_calls.append(message)
+        await release.wait()
+        return json.dumps(WORKLOAD)
+
+    async def recommender(message):
+        return "Implement gpt-4o-mini"
+
+    conductors = [EnterpriseAICostArchitect() for _ in range(3)]
+    for conductor in conductors:
+        monkeypatch.setattr(conductor.intake_agent, "run", intake)
+        monkeypatch.setattr(conductor.recommender, "run", recommender)
+
+    requests = [asyncio.create_task(c.run_interactive(json.dumps(WORKLOAD))) for c in conductors]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*requests)
+
+    assert len(intake_calls) == 1
+    assert all(r.final_recommendation == "Implement gpt-4o-mini" for r in results)
+    assert singleflight.get_stats()["coalesced"] == 2
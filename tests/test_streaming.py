@@ -0,0 +1,97 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.agents.conductor import EnterpriseAICostArchitect
+
+WORKLOAD = {
+    "calls_per_day": 1000,
+    "avg_input_tokens": 100,
+    "avg_output_tokens": 50,
+    "latency_sla_ms": 1000,
+    "region": "US",
+    "compliance_constraints": [],
+    "current_model": "",
+}
+
+def patch_llm_agents(monkeypatch, conductor):
+    async def intake(message):
+        return json.dumps(WORKLOAD)
+
+    async def recommender_stream(message):
+        for delta in ("Implement ", "gpt-4o-mini", "."):
+            yield delta
+
+    monkeypatch.setattr(conductor.intake_agent, "run", intake)
+    monkeypatch.setattr(conductor.recommender, "stream", recommender_stream)
+
+@pytest.mark.asyncio
+async def test_stream_interactive_emits_stages_in_order(monkeypatch):
+    conductor = EnterpriseAICostArchitect()
+    patch_llm_agents(monkeypatch, conductor)
+
+    events = [(event, data) async for event, data in conductor.stream_interactive(json.dumps(WORKLOAD))]
+    names = [event for event, _ in events]
+
+    assert names == [
+        "workload_params", "cost_table", "ranked_models", "pareto_frontier", "roi_analysis",
+        "recommendation_delta", "recommendation_delta", "recommendation_delta",
+        "final_recommendation", "done",
+    ]
+    assert dict(events)["final_recommendation"] == "Implement gpt-4o-mini."
+    assert dict(events)["roi_analysis"]["best_model"] == "gpt-4o-mini"
+
+@pytest.mark.asyncio
+async def test_stream_interactive_stops_with_guidance_on_error(monkeypatch):
+    conductor = EnterpriseAICostArchitect()
+
+    async def intake(message):
+        return "INVALID INPUT – missing calls_per_day"
+
+    monkeypatch.setattr(conductor.intake_agent, "run", intake)
+    events = [event async for event in conductor.stream_interactive(json.dumps(WORKLOAD))]
+
+    assert [name for name, _ in events] == ["error"]
+    assert "final_recommendation" in events[0][1]
+
+def test_stream_endpoint_formats_server_sent_events(monkeypatch):
+    from app import main
+
+    original = main.EnterpriseAICostArchitect
+
+    def make_conductor():
+        conductor = original()
+        patch_llm_agents(monkeypatch, conductor)
+        return conductor
+
+    monkeypatch.setattr(main, "EnterpriseAICostArchitect", make_conductor)
+    response = TestClient(main.app).post(
+        "/v1/chat/interactive/stream",
+        json={"messages": [{"role": "user", "content": json.dumps(WORKLOAD)}]},
+    )
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = [block for block in response.text.split("\n\n") if block]
+    assert blocks[0].startswith("event: workload_params\ndata: {")
+    assert blocks[-1] == "event: done\ndata: {}"
+
+@pytest.mark.asyncio
+async def test_closing_the_stream_closes_the_recommender_stream(monkeypatch):
+    conductor = EnterpriseAICostArchitect()
+    patch_llm_agents(monkeypatch, conductor)
+    closed = []
+
+    async def endless_stream(message):
+        try:
+            while True:
+                yield "token "
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(conductor.recommender, "stream", endless_stream)
+    events = conductor.stream_interactive(json.dumps(WORKLOAD))
+    async for event, _ in events:
+        if event == "recommendation_delta":
+            break
+    await events.aclose()
+
+    assert closed == [True]
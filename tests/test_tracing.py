@@ -0,0 +1,88 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app import tracing
+from app.agents.intake import IntakeAgent
+from app.agents.recommender import RecommenderAgent
+from app.config import settings
+
+WORKLOAD = {
+    "calls_per_day": 1000,
+    "avg_input_tokens": 100,
+    "avg_output_tokens": 50,
+    "latency_sla_ms": 1000,
+    "region": "US",
+    "compliance_constraints": [],
+    "current_model": "",
+}
+
+def test_spans_are_noops_without_a_trace():
+    with tracing.span("stage:x") as span:
+        span.set(a=1)
+        span.add("attempts")
+    assert span is tracing._NOOP
+    assert tracing.timeline() is None
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_tasks():
+    trace = tracing.Trace("request", debug=True)
+
+    async def child(name):
+        with tracing.span(name) as span:
+            span.add("attempts")
+            await asyncio.sleep(0)
+
+    with trace.root:
+        with tracing.span("pipeline"):
+            await asyncio.gather(asyncio.create_task(child("a")), asyncio.create_task(child("b")))
+        timeline = tracing.timeline()
+
+    pipeline = timeline["children"][0]
+    assert pipeline["name"] == "pipeline"
+    assert [c["name"] for c in pipeline["children"]] == ["a", "b"]
+    assert pipeline["children"][0]["attrs"] == {"attempts": 1}
+    assert timeline["open"] is True
+
+def patch_agents(monkeypatch):
+    async def intake(self, message):
+        return json.dumps(WORKLOAD)
+
+    async def recommend(self, message):
+        return "Implement gpt-4o-mini."
+
+    monkeypatch.setattr(IntakeAgent, "run", intake)
+    monkeypatch.setattr(RecommenderAgent, "run", recommend)
+
+def test_debug_header_returns_timeline(monkeypatch):
+    from app.main import app
+    patch_agents(monkeypatch)
+    body = {"messages": [{"role": "user", "content": json.dumps(WORKLOAD)}]}
+
+    with TestClient(app) as client:
+        plain = client.post("/v1/chat/interactive", json=body)
+        traced = client.post("/v1/chat/interactive", json=body, headers={"X-Debug-Trace": "1"})
+
+    assert "x-trace-id" not in plain.headers
+    assert plain.json()["trace"] is None
+
+    trace = traced.json()["trace"]
+    assert trace["trace_id"] == traced.headers["x-trace-id"]
+    stages = [span["name"] for span in trace["children"][0]["children"]]
+    assert "stage:cost_engine" in stages and "stage:recommender" in stages
+    intake = next(s for s in trace["children"][0]["children"] if s["name"] == "stage:intake")
+    assert intake["children"][0]["name"] == "parse_json"
+
+def test_trace_file_collects_every_request(monkeypatch, tmp_path):
+    from app.main import app
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(settings, "trace_file_path", str(path))
+
+    with TestClient(app) as client:
+        response = client.get("/healthz")
+
+    line = json.loads(path.read_text().splitlines()[0])
+    assert line["trace_id"] == response.headers["x-trace-id"]
+    assert line["attrs"]["path"] == "/healthz"
+    assert line["attrs"]["status"] == 200
+    assert "open" not in line
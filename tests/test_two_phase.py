@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from app import recommendations
+from app.agents.conductor import EnterpriseAICostArchitect
+
+WORKLOAD = {
+    "calls_per_day": 1000,
+    "avg_input_tokens": 100,
+    "avg_output_tokens": 50,
+    "latency_sla_ms": 1000,
+    "region": "US",
+    "compliance_constraints": [],
+    "current_model": "",
+}
+
+@pytest.mark.asyncio
+async def test_update_params_defers_recommendation(monkeypatch):
+    conductor = EnterpriseAICostArchitect()
+    release = asyncio.Event()
+
+    async def slow_recommender(message):
+        await release.wait()
+        return "Implement gpt-4o-mini"
+
+    monkeypatch.setattr(conductor.recommender, "run", slow_recommender)
+    result = await conductor.run_interactive(
+        modified_workload=WORKLOAD, original_data={"solution_architect": None}, defer_recommendation=True
+    )
+
+    assert result.final_recommendation is None
+    assert result.recommendation_status == "pending"
+    assert result.ranked_models[0].model_name == "gpt-4o-mini"
+    assert result.roi_analysis.best_model == "gpt-4o-mini"
+
+    store = recommendations.get_store()
+    assert store.get(result.revision_id).status == "pending"
+    release.set()
+    entry = await store.wait(result.revision_id, timeout_s=1.0)
+    assert entry.status == "ready"
+    assert entry.final_recommendation == "Implement gpt-4o-mini"
+
+@pytest.mark.asyncio
+async def test_newer_revision_cancels_superseded_recommendation():
+    store = recommendations.RecommendationStore()
+    started = asyncio.Event()
+
+    async def never_finishes():
+        started.set()
+        await asyncio.Event().wait()
+
+    async def finishes():
+        return "done"
+
+    first = store.submit(never_finishes, lambda: "fallback")
+    await started.wait()
+    second = store.submit(finishes, lambda: "fallback", supersedes=first)
+
+    assert store.get(first) is None
+    entry = await store.wait(second, timeout_s=1.0)
+    assert entry.final_recommendation == "done"
+
+@pytest.mark.asyncio
+async def test_failed_recommendation_falls_back():
+    store = recommendations.RecommendationStore()
+
+    async def broken():
+        raise RuntimeError("provider down")
+
+    revision_id = store.submit(broken, lambda: "guidance")
+    entry = await store.wait(revision_id, timeout_s=1.0)
+    assert entry.status == "failed"
+    assert entry.final_recommendation == "guidance"
+
+@pytest.mark.asyncio
+async def test_long_poll_on_superseded_revision_reports_cancelled():
+    store = recommendations.RecommendationStore()
+    started = asyncio.Event()
+
+    async def never_finishes():
+        started.set()
+        await asyncio.Event().wait()
+
+    first = store.submit(never_finishes, lambda: "fallback")
+    await started.wait()
+    poll = asyncio.create_task(store.wait(first, timeout_s=1.0))
+    await asyncio.sleep(0)
+    store.submit(never_finishes, lambda: "fallback", supersedes=first)
+
+    entry = await poll
+    assert entry.status == "cancelled"
+    store.cancel_all()